@@ -0,0 +1,242 @@
+import time
+import threading
+from collections import deque
+
+import yt_dlp
+from yt_dlp.networking.exceptions import HTTPError
+
+from progress_tracker import TransferCounter
+
+
+THROTTLE_STATUSES = (429, 503)
+THROUGHPUT_WINDOW = 3.0  # Seconds of transfer history used for the throughput figures
+MIN_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+RECOVERY_INTERVAL = 15.0  # Quiet seconds before the adaptive limits are relaxed a step
+MIN_ADAPTIVE_BYTES = 64 * 1024
+MIN_ADAPTIVE_REQUESTS = 0.5
+
+
+class TokenBucket:
+    """Blocking token bucket; a rate of 0 or None means unlimited."""
+
+    def __init__(self, rate=0, burst=None):
+        self.lock = threading.Lock()
+        self.rate = 0
+        self.burst = 0
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst=None):
+        with self.lock:
+            self.rate = rate or 0
+            # One second of traffic by default, so short bursts aren't chopped up
+            self.burst = burst or self.rate
+            self.tokens = min(self.tokens, self.burst)
+
+    def consume(self, amount=1):
+        while True:
+            with self.lock:
+                if not self.rate:
+                    return
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # Requests larger than the bucket go through once it is full,
+                # leaving it in debt, which later callers pay back
+                if self.tokens >= min(amount, self.burst):
+                    self.tokens -= amount
+                    return
+                wait = (min(amount, self.burst) - self.tokens) / self.rate
+            time.sleep(min(wait, 0.5))
+
+
+class BandwidthGovernor:
+    """Bandwidth and request-rate limits shared by every job and worker.
+
+    max_bytes_per_sec caps the combined transfer rate and max_requests_per_sec
+    the combined HTTP request rate; 0 means no limit. A 429 or 503 response
+    holds back all requests for an exponentially growing backoff (or the
+    server's Retry-After) and halves both rates. After RECOVERY_INTERVAL
+    seconds without throttling the rates are raised a step at a time, until
+    they reach the configured cap (or, with no cap, the rate measured when
+    throttling started) and the adaptive limit is lifted.
+    """
+
+    def __init__(self, max_bytes_per_sec=0, max_requests_per_sec=0):
+        self.lock = threading.Lock()
+        self.bandwidth = TokenBucket()
+        self.requests = TokenBucket()
+        self.max_bytes_per_sec = 0
+        self.max_requests_per_sec = 0
+        self.adaptive_bytes_per_sec = 0
+        self.adaptive_requests_per_sec = 0
+        self.bytes_ceiling = 0
+        self.requests_ceiling = 0
+        self.backoff = 0.0
+        self.backoff_until = 0.0
+        self.last_throttled = 0.0
+        self.throttle_count = 0
+        self.request_times = deque()
+        self.transfers = {}
+        self.set_limits(max_bytes_per_sec, max_requests_per_sec)
+
+    def set_limits(self, max_bytes_per_sec=0, max_requests_per_sec=0):
+        with self.lock:
+            self.max_bytes_per_sec = max_bytes_per_sec or 0
+            self.max_requests_per_sec = max_requests_per_sec or 0
+            self.apply_rates()
+
+    def apply_rates(self):
+        # Caller holds self.lock
+        self.bandwidth.set_rate(effective_limit(self.max_bytes_per_sec, self.adaptive_bytes_per_sec))
+        requests_per_sec = effective_limit(self.max_requests_per_sec, self.adaptive_requests_per_sec)
+        self.requests.set_rate(requests_per_sec, max(1, requests_per_sec))
+
+    def acquire_request(self):
+        self.relax()
+        while True:
+            with self.lock:
+                wait = self.backoff_until - time.monotonic()
+            if wait <= 0:
+                break
+            time.sleep(min(wait, 0.5))
+        self.requests.consume(1)
+        with self.lock:
+            now = time.monotonic()
+            self.request_times.append(now)
+            while self.request_times and now - self.request_times[0] > THROUGHPUT_WINDOW:
+                self.request_times.popleft()
+
+    def acquire_bytes(self, amount):
+        if amount > 0:
+            self.bandwidth.consume(amount)
+
+    def record_transfer(self, amount, job_key=None):
+        if amount <= 0:
+            return
+        with self.lock:
+            history = self.transfers.setdefault(job_key, deque())
+            history.append((time.monotonic(), amount))
+
+    def report_throttled(self, retry_after=None):
+        with self.lock:
+            now = time.monotonic()
+            self.throttle_count += 1
+            self.last_throttled = now
+            self.backoff = min(MAX_BACKOFF, max(MIN_BACKOFF, self.backoff * 2))
+            self.backoff_until = max(self.backoff_until, now + max(self.backoff, retry_after or 0))
+            # Halve from whatever is in force now: the current limit, or the
+            # measured rate when nothing was limiting
+            current_bytes = effective_limit(self.max_bytes_per_sec, self.adaptive_bytes_per_sec)
+            current_bytes = current_bytes or self.total_throughput()
+            if current_bytes:
+                self.bytes_ceiling = self.bytes_ceiling or self.max_bytes_per_sec or current_bytes
+                self.adaptive_bytes_per_sec = max(MIN_ADAPTIVE_BYTES, current_bytes / 2)
+            current_requests = effective_limit(self.max_requests_per_sec, self.adaptive_requests_per_sec)
+            current_requests = current_requests or len(self.request_times) / THROUGHPUT_WINDOW
+            self.requests_ceiling = self.requests_ceiling or self.max_requests_per_sec or current_requests
+            self.adaptive_requests_per_sec = max(MIN_ADAPTIVE_REQUESTS, current_requests / 2)
+            self.apply_rates()
+
+    def relax(self):
+        with self.lock:
+            if not (self.adaptive_bytes_per_sec or self.adaptive_requests_per_sec or self.backoff):
+                return
+            now = time.monotonic()
+            if now - self.last_throttled < RECOVERY_INTERVAL:
+                return
+            self.last_throttled = now
+            self.backoff /= 2
+            if self.backoff < MIN_BACKOFF:
+                self.backoff = 0.0
+            self.adaptive_bytes_per_sec = relax_limit(self.adaptive_bytes_per_sec, self.bytes_ceiling)
+            self.adaptive_requests_per_sec = relax_limit(self.adaptive_requests_per_sec, self.requests_ceiling)
+            if not self.adaptive_bytes_per_sec:
+                self.bytes_ceiling = 0
+            if not self.adaptive_requests_per_sec:
+                self.requests_ceiling = 0
+            self.apply_rates()
+
+    def total_throughput(self):
+        # Caller holds self.lock
+        return sum(self.job_throughput(job_key) for job_key in list(self.transfers))
+
+    def job_throughput(self, job_key):
+        # Caller holds self.lock
+        history = self.transfers.get(job_key)
+        if not history:
+            return 0.0
+        cutoff = time.monotonic() - THROUGHPUT_WINDOW
+        while history and history[0][0] < cutoff:
+            history.popleft()
+        if not history:
+            del self.transfers[job_key]
+            return 0.0
+        return sum(amount for _, amount in history) / THROUGHPUT_WINDOW
+
+    def throughput(self):
+        """Current bytes/second per job key and in total, averaged over THROUGHPUT_WINDOW."""
+        with self.lock:
+            jobs = {job_key: self.job_throughput(job_key) for job_key in list(self.transfers)}
+            return {
+                'total': sum(jobs.values()),
+                'jobs': {job_key: rate for job_key, rate in jobs.items() if rate},
+                'requests_per_sec': len(self.request_times) / THROUGHPUT_WINDOW,
+                'bandwidth_limit': self.bandwidth.rate,
+                'request_limit': self.requests.rate,
+                'backing_off': max(0.0, self.backoff_until - time.monotonic()),
+                'throttle_count': self.throttle_count,
+            }
+
+    def progress_hook(self, job_key):
+        # Progress hooks run on the thread that is reading the data, so
+        # blocking here slows that transfer down to the shared rate
+        counter = TransferCounter()
+
+        def hook(d):
+            if d['status'] != 'downloading':
+                return
+            delta = counter.delta(d)
+            # Segmented downloads charge the bucket from their connection threads
+            if not d.get('governed'):
+                self.acquire_bytes(delta)
+            self.record_transfer(delta, job_key)
+        return hook
+
+
+def effective_limit(configured, adaptive):
+    limits = [limit for limit in (configured, adaptive) if limit]
+    return min(limits) if limits else 0
+
+
+def relax_limit(adaptive, ceiling):
+    if not adaptive:
+        return 0
+    adaptive *= 1.5
+    return 0 if adaptive >= ceiling else adaptive
+
+
+def retry_after_seconds(response):
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class GovernedYoutubeDL(yt_dlp.YoutubeDL):
+    """YoutubeDL whose HTTP requests (extraction and downloads) go through
+    the bandwidth_governor option, when one is set."""
+
+    def urlopen(self, req):
+        governor = self.params.get('bandwidth_governor')
+        if governor is None:
+            return super().urlopen(req)
+        governor.acquire_request()
+        try:
+            return super().urlopen(req)
+        except HTTPError as e:
+            if e.status in THROTTLE_STATUSES:
+                governor.report_throttled(retry_after_seconds(e.response))
+            raise
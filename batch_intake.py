@@ -0,0 +1,144 @@
+import io
+import re
+import csv
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from metadata_cache import normalize_url, cache_key, VIDEO_ID_RE
+
+
+DEFAULT_EXTRACTORS = 8
+URL_RE = re.compile(r'https?://[^\s,;"\'<>]+')
+# Non-http inputs yt-dlp understands: search prefixes and other schemes ("ytsearch:...")
+PREFIXED_RE = re.compile(r'^[a-z][\w+.-]*:\S+$', re.IGNORECASE)
+
+
+def parse_urls(text):
+    """URLs from a multi-line paste, a text file or a CSV file, in order.
+
+    Every http(s) URL in a line or CSV cell is taken, so CSV exports with
+    title or note columns work as they are. Lines starting with '#' are
+    comments. A cell holding nothing but a bare video id or a prefixed
+    query such as "ytsearch:..." is taken too.
+    """
+    urls = []
+    for row in csv.reader(io.StringIO(text)):
+        if row and row[0].lstrip().startswith('#'):
+            continue
+        for cell in row:
+            cell = cell.strip()
+            found = URL_RE.findall(cell)
+            if found:
+                urls.extend(found)
+            elif VIDEO_ID_RE.match(cell) or PREFIXED_RE.match(cell):
+                urls.append(cell)
+    return urls
+
+
+def dedupe_urls(urls, playlist=False, known=()):
+    """URLs with duplicates removed, comparing normalized forms, first one kept.
+
+    known holds URLs already queued; anything matching one of them is dropped too.
+    """
+    seen = {normalize_url(url, playlist) for url in known}
+    unique = []
+    for url in urls:
+        key = normalize_url(url, playlist)
+        if key not in seen:
+            seen.add(key)
+            unique.append(url)
+    return unique
+
+
+class BatchResolver:
+    """Resolves the metadata of many URLs at once on a bounded thread pool.
+
+    Results land in the metadata cache under the keys DownloadJob looks up,
+    so the jobs created from them start downloading without extracting
+    again. on_resolved(url, info) is called on the calling thread as each
+    URL finishes, in completion order, so downloads can start while the
+    rest of the batch is still resolving. A URL that fails to resolve is
+    logged and reported with info None, to be queued anyway.
+    Playlist URLs are only opened (first page, for the title and to catch
+    bad links); pass their info to the job as resolved_info, which lists
+    the entries without opening the playlist again.
+    """
+
+    def __init__(self, settings, metadata_cache=None, max_workers=DEFAULT_EXTRACTORS, governor=None):
+        # yt-dlp is only loaded once a batch is resolved, so parse_urls stays cheap to import
+        from downloader_core import build_options, YTDLLogger
+
+        self.settings = settings
+        self.metadata_cache = metadata_cache
+        self.max_workers = max(1, max_workers)
+        self.options = build_options(settings, ".", logger=YTDLLogger(lambda msg: None))
+        self.options['quiet'] = True
+        if governor is not None:
+            self.options['bandwidth_governor'] = governor
+        self.local = threading.local()
+        self.instances = []
+        self.instances_lock = threading.Lock()
+        self.cancelled = threading.Event()
+
+    def ydl(self):
+        # YoutubeDL isn't thread-safe: one instance per extractor thread
+        ydl = getattr(self.local, 'ydl', None)
+        if ydl is None:
+            from postprocess_pipeline import PipelinedYoutubeDL
+
+            ydl = self.local.ydl = PipelinedYoutubeDL(self.options)
+            with self.instances_lock:
+                self.instances.append(ydl)
+        return ydl
+
+    def resolve_one(self, url):
+        if self.cancelled.is_set():
+            return None
+        playlist = self.settings.is_playlist
+        key = cache_key(url, playlist, self.settings.cookies_file)
+        info = self.metadata_cache.get(key) if self.metadata_cache else None
+        if info is not None:
+            return info
+        info = self.ydl().extract_info(url, download=False, process=False)
+        if not playlist and info.get('_type', 'video') == 'video' and self.metadata_cache:
+            self.metadata_cache.set(key, info)
+        return info
+
+    def resolve(self, urls, on_resolved, on_log=None):
+        """Resolve urls, reporting each as it completes; returns (resolved, failed) counts."""
+        resolved = failed = 0
+        pool = ThreadPoolExecutor(max_workers=min(self.max_workers, max(1, len(urls))))
+        try:
+            futures = {pool.submit(self.resolve_one, url): url for url in urls}
+            for future in as_completed(futures):
+                if self.cancelled.is_set():
+                    break
+                url = futures[future]
+                try:
+                    info = future.result()
+                except Exception as e:
+                    # Often transient (timeouts, rate limits): the job extracts it again
+                    failed += 1
+                    if on_log is not None:
+                        on_log(f"WARNING: could not resolve {url}: {e}; queued anyway")
+                    on_resolved(url, None)
+                    continue
+                resolved += 1
+                on_resolved(url, info)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            with self.instances_lock:
+                instances, self.instances = self.instances, []
+            for ydl in instances:
+                ydl.close()
+        return resolved, failed
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+def describe_info(info):
+    title = info.get('title') or info.get('id') or ''
+    if 'entries' in info or info.get('_type') == 'playlist':
+        return f"playlist: {title}"
+    return title
@@ -0,0 +1,348 @@
+import os
+import sys
+import json
+import time
+import shutil
+import pstats
+import cProfile
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import subprocess
+import tracemalloc
+from types import SimpleNamespace
+from datetime import datetime, timezone
+
+from fake_media_server import FakeMediaServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+SCENARIOS = ("single", "playlist", "hls", "segmented")
+MEDIA_EXTENSIONS = (".mp4", ".webm", ".mkv", ".m4a", ".mp3", ".ts")
+
+
+def media_files(folder):
+    found = []
+    for root, _, files in os.walk(folder):
+        found += [os.path.join(root, f) for f in files if f.endswith(MEDIA_EXTENSIONS)]
+    return found
+
+
+def max_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class ProfiledJob:
+    """Runs a job's run() and each playlist worker's download_entry() under
+    cProfile and merges the per-thread profiles."""
+
+    def __init__(self, job):
+        self.job = job
+        self.profiles = []
+        self.lock = threading.Lock()
+        download_entry = job.download_entry
+        job.download_entry = lambda *args: self.profiled(download_entry, *args)
+
+    def profiled(self, func, *args):
+        profile = cProfile.Profile()
+        with self.lock:
+            self.profiles.append(profile)
+        return profile.runcall(func, *args)
+
+    def run(self):
+        return self.profiled(self.job.run)
+
+    def stats(self):
+        stats = pstats.Stats(self.profiles[0])
+        for profile in self.profiles[1:]:
+            stats.add(profile)
+        return stats
+
+
+def top_functions(stats, limit):
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {"function": f"{os.path.basename(filename)}:{line}({name})", "calls": calls, "cumulative_s": round(cumulative, 4)}
+        for (filename, line, name), (_, calls, _, cumulative, _) in rows
+    ]
+
+
+def scenario_request(name, server, args):
+    from download_settings import DownloadSettings
+
+    size = int(args.size * 1024 * 1024)
+    base = dict(skip_archived=False)
+    if name == "single":
+        return f"{server.base_url}/media/single.mp4?size={size}", DownloadSettings(**base)
+    if name == "playlist":
+        return (f"{server.base_url}/playlist.xml?count={args.items}&size={size // args.items}",
+                DownloadSettings(is_playlist=True, max_workers=args.workers, **base))
+    if name == "hls":
+        segment = 256 * 1024
+        return (f"{server.base_url}/hls/stream.m3u8?segments={max(1, size // segment)}&size={segment}",
+                DownloadSettings(**base))
+    if name == "segmented":
+        return (f"{server.base_url}/media/segmented.mp4?size={size}",
+                DownloadSettings(connections=args.connections, chunk_size_mb=1, **base))
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+def run_once(name, server, args, workdir):
+    from downloader_core import DownloadJob
+
+    url, settings = scenario_request(name, server, args)
+    output_dir = tempfile.mkdtemp(prefix=f"{name}-", dir=workdir)
+    counters = {"progress": 0, "log": 0, "first_byte": None, "gui_seconds": 0.0}
+    started = time.perf_counter()
+
+    def first_byte_hook(d):
+        if counters["first_byte"] is None and d.get("downloaded_bytes"):
+            counters["first_byte"] = time.perf_counter() - started
+
+    def on_progress(snapshot):
+        counters["progress"] += 1
+
+    def on_log(msg):
+        counters["log"] += 1
+
+    server.reset_counters()
+    if args.trace_memory:
+        tracemalloc.reset_peak()
+    if args.gui:
+        job, success, message = run_in_gui(url, settings, output_dir, first_byte_hook, counters)
+        profiled = None
+    else:
+        job = DownloadJob(url, settings, output_dir, on_progress=on_progress, on_log=on_log,
+                          progress_hooks=[first_byte_hook])
+        # Synthetic segments aren't real MPEG-TS; don't hand them to ffmpeg
+        job.options['fixup'] = 'never'
+        profiled = ProfiledJob(job) if args.profile else None
+        success, message = profiled.run() if profiled else job.run()
+    elapsed = time.perf_counter() - started
+
+    files = media_files(output_dir)
+    total_bytes = sum(os.path.getsize(f) for f in files)
+    result = {
+        "success": success,
+        "message": message,
+        "seconds": elapsed,
+        "items": len(files),
+        "bytes": total_bytes,
+        "items_per_sec": len(files) / elapsed,
+        "mb_per_sec": total_bytes / 1024 / 1024 / elapsed,
+        "time_to_first_byte_s": counters["first_byte"],
+        "ui_signals": counters["progress"] + counters["log"],
+        "ui_signals_per_sec": (counters["progress"] + counters["log"]) / elapsed,
+        "server_requests": server.requests,
+        "max_rss_mb": max_rss_mb(),
+        "stages": job.stage_stats.summary(),
+    }
+    if args.gui:
+        result["gui_thread_s"] = counters["gui_seconds"]
+        result["gui_thread_share"] = counters["gui_seconds"] / elapsed
+    if args.trace_memory:
+        result["peak_python_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    if profiled:
+        stats = profiled.stats()
+        os.makedirs(args.profile, exist_ok=True)
+        stats.dump_stats(os.path.join(args.profile, f"{name}.prof"))
+        result["top_functions"] = top_functions(stats, args.profile_top)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    return result
+
+
+def run_in_gui(url, settings, output_dir, first_byte_hook, counters):
+    # Drive the real DownloadThread and the window's own update/flush slots
+    # against stand-in widgets, timing everything the GUI thread does
+    from PyQt5.QtWidgets import QApplication, QProgressBar, QLabel, QPlainTextEdit
+    from PyQt5.QtCore import QEventLoop, QTimer
+    from youtube_downloader import DownloadThread, YouTubeDownloader, LOG_FLUSH_INTERVAL_MS, LOG_MAX_LINES
+    from log_buffer import LogBuffer
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    view = SimpleNamespace(
+        progress_bar=QProgressBar(), status_label=QLabel(), transfer_label=QLabel(),
+        log_console=QPlainTextEdit(), log_buffer=LogBuffer(log_dir=None)
+    )
+    view.log_console.setMaximumBlockCount(LOG_MAX_LINES)
+
+    def timed(func):
+        def wrapper(*args):
+            started = time.perf_counter()
+            try:
+                func(*args)
+            finally:
+                counters["gui_seconds"] += time.perf_counter() - started
+        return wrapper
+
+    def on_progress(snapshot):
+        counters["progress"] += 1
+        YouTubeDownloader.update_progress(view, snapshot)
+
+    def on_log(msg):
+        counters["log"] += 1
+        view.log_buffer.append(msg)
+
+    outcome = {}
+    loop = QEventLoop()
+    thread = DownloadThread(url, settings, output_dir, log_callback=on_log, progress_hooks=[first_byte_hook])
+    thread.job.options['fixup'] = 'never'
+    thread.progress_signal.connect(timed(on_progress))
+    thread.finished_signal.connect(lambda success, message: outcome.update(success=success, message=message))
+    thread.error_signal.connect(lambda error: outcome.update(success=False, message=error))
+    thread.finished.connect(loop.quit)
+    flush_timer = QTimer()
+    flush_timer.timeout.connect(timed(lambda: YouTubeDownloader.flush_log(view)))
+    flush_timer.start(LOG_FLUSH_INTERVAL_MS)
+    thread.start()
+    loop.exec_()
+    flush_timer.stop()
+    timed(lambda: YouTubeDownloader.flush_log(view))()
+    view.log_buffer.close()
+    app.processEvents()
+    return thread.job, outcome.get("success", False), outcome.get("message", "")
+
+
+def summarize(runs):
+    # Median of each numeric metric across repeats; the rest from the first run
+    summary = dict(runs[0])
+    for key, value in runs[0].items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            values = [run[key] for run in runs if run.get(key) is not None]
+            summary[key] = statistics.median(values) if values else None
+    summary["runs"] = len(runs)
+    return summary
+
+
+def environment():
+    import yt_dlp
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "yt_dlp": yt_dlp.version.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def format_row(name, result):
+    ttfb = result["time_to_first_byte_s"]
+    text = (f"{name:<10} {'ok' if result['success'] else 'FAIL':<4} {result['seconds']:7.2f}s "
+            f"{result['items_per_sec']:7.2f} items/s {result['mb_per_sec']:8.2f} MB/s "
+            f"TTFB {ttfb * 1000 if ttfb is not None else float('nan'):7.1f} ms "
+            f"{result['ui_signals_per_sec']:6.1f} signals/s")
+    if "gui_thread_s" in result:
+        text += f" GUI {result['gui_thread_s'] * 1000:.1f} ms ({result['gui_thread_share']:.1%})"
+    if result.get("max_rss_mb") is not None:
+        text += f" RSS {result['max_rss_mb']:.0f} MB"
+    return text
+
+
+COMPARED_METRICS = ("seconds", "items_per_sec", "mb_per_sec", "time_to_first_byte_s", "ui_signals_per_sec",
+                    "gui_thread_s", "max_rss_mb", "peak_python_mb")
+
+
+def compare(baseline, current):
+    lines = [f"Compared with {baseline.get('commit') or 'baseline'} ({baseline.get('created')}):"]
+    for name, result in current["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        changes = []
+        for metric in COMPARED_METRICS:
+            if result.get(metric) is None or not old.get(metric):
+                continue
+            changes.append(f"{metric} {(result[metric] - old[metric]) / old[metric]:+.1%}")
+        lines.append(f"  {name}: " + ", ".join(changes))
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the download path against a local fake media server."
+    )
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios to run ({', '.join(SCENARIOS)})")
+    parser.add_argument("--size", type=float, default=8, help="Total media size per scenario in MB")
+    parser.add_argument("--items", type=int, default=8, help="Playlist length for the playlist scenario")
+    parser.add_argument("--workers", type=int, default=3, help="Playlist workers for the playlist scenario")
+    parser.add_argument("--connections", type=int, default=4, help="Connections for the segmented scenario")
+    parser.add_argument("--rate", type=int, default=0, help="Per-connection server throttle in KB/s (0 = unlimited)")
+    parser.add_argument("--latency", type=float, default=0, help="Server delay before the first byte, in ms")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario; metrics are medians")
+    parser.add_argument("--no-warmup", action="store_true", help="Don't do an untimed warm-up download first")
+    parser.add_argument("--gui", action="store_true",
+                        help="Run jobs through DownloadThread and the window's slots, timing the GUI thread")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also report peak Python heap via tracemalloc (slows downloads)")
+    parser.add_argument("--profile", metavar="DIR", help="Write cProfile stats per scenario to DIR")
+    parser.add_argument("--profile-top", type=int, default=15, help="Functions to list per profile in the JSON")
+    parser.add_argument("--json", metavar="FILE", help="Write results as JSON ('-' for stdout)")
+    parser.add_argument("--compare", metavar="FILE", help="Earlier JSON results to compare against")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        build_parser().error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    if args.gui:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    if args.trace_memory:
+        tracemalloc.start()
+
+    server = FakeMediaServer(rate=args.rate * 1024, latency=args.latency / 1000).start()
+    workdir = tempfile.mkdtemp(prefix="ytdl-bench-")
+    results = {
+        **environment(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+        "scenarios": {},
+    }
+    try:
+        if not args.no_warmup:
+            # yt-dlp loads its extractors on first use; keep that out of the first scenario
+            run_once("single", server, argparse.Namespace(**{**vars(args), "size": 0.1, "profile": None}), workdir)
+        for name in scenarios:
+            runs = [run_once(name, server, args, workdir) for _ in range(max(1, args.repeat))]
+            results["scenarios"][name] = summarize(runs)
+            print(format_row(name, results["scenarios"][name]), file=sys.stderr)
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print(compare(json.load(f), results), file=sys.stderr)
+    if args.json == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0 if all(result["success"] for result in results["scenarios"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
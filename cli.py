@@ -0,0 +1,315 @@
+import os
+import sys
+import time
+import argparse
+
+
+QUALITY_CHOICES = {
+    "best": "Best Available",
+    "8k": "8K",
+    "4k": "4K",
+    "2k": "2K",
+    "1080p": "1080p",
+    "720p": "720p",
+    "480p": "480p",
+    "360p": "360p",
+}
+CONTENT_CHOICES = {
+    "video+audio": "Video+Audio",
+    "video": "Video Only",
+    "audio": "Audio Only",
+}
+FORMAT_CHOICES = ["mp4", "mkv", "webm", "mp3", "aac", "m4a", "opus", "best"]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Download YouTube videos and playlists without a display. "
+                    "Run with --gui (or no URLs) to open the desktop window."
+    )
+    parser.add_argument("urls", nargs="*", help="Video or playlist URLs")
+    parser.add_argument("-a", "--batch-file",
+                        help="Text or CSV file of URLs ('#' starts a comment line, '-' reads stdin)")
+    parser.add_argument("--extractors", type=int, default=8,
+                        help="URLs of a batch resolved at once; downloads start as each one resolves")
+    parser.add_argument("-o", "--output", default=os.path.expanduser("~/Downloads"), help="Download directory")
+    parser.add_argument("-q", "--quality", choices=QUALITY_CHOICES, default="best", help="Maximum resolution")
+    parser.add_argument("-c", "--content", choices=CONTENT_CHOICES, default="video+audio", help="Content type")
+    parser.add_argument("-f", "--format", choices=FORMAT_CHOICES, default="best", help="Output format")
+    parser.add_argument("--playlist", action="store_true", help="Download URLs as playlists")
+    parser.add_argument("--items", default="", help="Playlist range, e.g. 1-10 or 1,3,5")
+    parser.add_argument("--workers", type=int, default=3, help="Parallel downloads per playlist")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per playlist item")
+    parser.add_argument("--connections", type=int, default=1,
+                        help="Connections per file; above 1, plain HTTP files are fetched in parallel byte ranges")
+    parser.add_argument("--chunk-size", type=int, default=4, help="Byte-range chunk size in MB for --connections")
+    parser.add_argument("--no-dedupe", action="store_true",
+                        help="Download videos again even when another folder already has them in the same format")
+    parser.add_argument("--reclaim-space", nargs="+", metavar="DIR",
+                        help="Replace identical files under these folders with hardlinks to one copy, then exit")
+    parser.add_argument("--dry-run", action="store_true", help="With --reclaim-space, only list what would be linked")
+    parser.add_argument("--no-archive", action="store_true", help="Re-download playlist items already in the archive")
+    parser.add_argument("--subtitles", action="store_true", help="Download subtitles")
+    parser.add_argument("--sub-langs", default="en.*",
+                        help="Subtitle languages: comma-separated regexes, 'all', '-LANG' to exclude (default: en.*)")
+    parser.add_argument("--thumbnail", action="store_true", help="Download thumbnail")
+    parser.add_argument("--assets-only", action="store_true",
+                        help="Fetch only the --subtitles/--thumbnail files, without downloading the media again")
+    parser.add_argument("--refresh-assets", action="store_true",
+                        help="Fetch subtitles/thumbnails again instead of using cached or existing files")
+    parser.add_argument("--embed-thumbnail", action="store_true", help="Embed thumbnail in video files")
+    parser.add_argument("--no-metadata", action="store_true", help="Don't add metadata")
+    parser.add_argument("--cookies", default="", help="Path to cookies file (Netscape format)")
+    parser.add_argument("--max-bandwidth", type=int, default=0,
+                        help="Combined download rate cap for all jobs in KB/s (0 = unlimited)")
+    parser.add_argument("--max-requests", type=float, default=0,
+                        help="Combined HTTP request rate cap for all jobs per second (0 = unlimited)")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="Serve session metrics on http://127.0.0.1:PORT/metrics (Prometheus) and /metrics.json")
+    parser.add_argument("--metrics-file", default="",
+                        help="Write a JSON metrics snapshot to this file every --metrics-interval seconds")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between metrics snapshots")
+    parser.add_argument("--jobs", type=int, default=2, help="Number of queued jobs to run at once")
+    parser.add_argument("--priority", type=int, default=0, help="Queue priority for the given URLs (higher runs first)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Also run the jobs earlier sessions left in the shared queue")
+    parser.add_argument("--gui", action="store_true", help="Open the desktop window")
+    return parser
+
+
+def read_batch_file(path):
+    from batch_intake import parse_urls
+
+    if path == "-":
+        return parse_urls(sys.stdin.read())
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return parse_urls(f.read())
+
+
+def settings_from_args(args):
+    from download_settings import DownloadSettings
+
+    return DownloadSettings(
+        quality=QUALITY_CHOICES[args.quality],
+        content_type=CONTENT_CHOICES[args.content],
+        output_format=args.format,
+        subtitles=args.subtitles,
+        subtitle_langs=args.sub_langs,
+        thumbnail=args.thumbnail,
+        metadata=not args.no_metadata,
+        embed_thumbnail=args.embed_thumbnail,
+        cookies_file=args.cookies,
+        is_playlist=args.playlist,
+        playlist_items=args.items,
+        max_workers=args.workers,
+        retries=args.retries,
+        skip_archived=not args.no_archive,
+        link_duplicates=not args.no_dedupe,
+        connections=args.connections,
+        chunk_size_mb=args.chunk_size,
+        assets_only=args.assets_only,
+        refresh_assets=args.refresh_assets
+    )
+
+
+def print_progress(snapshot, prefix="", throughput=None):
+    from progress_tracker import describe_progress, format_bytes
+
+    line = f"{prefix} {snapshot['status']}  {describe_progress(snapshot)}".strip()
+    if throughput and len(throughput['jobs']) > 1:
+        line += f" | all jobs {format_bytes(throughput['total'])}/s"
+
+    sys.stderr.write(f"\r[{snapshot['percent']:3d}%] {line[:90]:<90}")
+    sys.stderr.flush()
+
+
+def print_log(msg):
+    sys.stderr.write(f"\r{msg.strip()}\n")
+
+
+def print_playlist_info(prefix, title, total, final):
+    # The growing count of a playlist still being listed shows in the progress line
+    if final:
+        print_log(f"{prefix} Playlist: {title} ({total} items)")
+    elif total == 1:
+        print_log(f"{prefix} Playlist: {title} (listing items, downloads start as they are found)")
+
+
+def reclaim_space(args):
+    from media_store import MediaStore, reclaim_space
+    from progress_tracker import format_bytes
+
+    pruned = MediaStore().prune()
+    if pruned:
+        print_log(f"Forgot {pruned} deleted or changed file(s) in the media store")
+    summary = reclaim_space(args.reclaim_space, dry_run=args.dry_run, on_log=print_log)
+    verb = "Would reclaim" if args.dry_run else "Reclaimed"
+    print_log(f"{verb} {format_bytes(summary['bytes_reclaimed'])} from {summary['files_relinked']} duplicate file(s)")
+    return 0
+
+
+def run_gui():
+    from metrics import StartupTimer
+
+    # Timed from before PyQt5 and the window module are imported
+    startup = StartupTimer()
+    # PyQt5 is only imported when the window is actually requested
+    from PyQt5.QtWidgets import QApplication
+    from youtube_downloader import YouTubeDownloader
+
+    app = QApplication(sys.argv[:1])
+    downloader = YouTubeDownloader(startup)
+    downloader.show()
+    return app.exec_()
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.assets_only and not (args.subtitles or args.thumbnail):
+        parser.error("--assets-only needs --subtitles and/or --thumbnail")
+    urls = list(args.urls)
+    if args.batch_file:
+        urls.extend(read_batch_file(args.batch_file))
+
+    if args.reclaim_space:
+        return reclaim_space(args)
+    if args.gui or not (urls or args.resume):
+        return run_gui()
+
+    from downloader_core import DownloadJob, JobPaused, JobCancelled
+    from metadata_cache import MetadataCache
+    from download_archive import DownloadArchive
+    from media_store import MediaStore
+    from batch_intake import BatchResolver, dedupe_urls, describe_info
+    from download_queue import DownloadQueue, Scheduler, partial_file_hook, resumable_bytes
+    from postprocess_pipeline import PostProcessPool
+    from bandwidth_governor import BandwidthGovernor
+    from side_assets import SideFetcher
+    from metrics import MetricsRegistry, MetricsServer, SnapshotWriter, session_collector
+
+    settings = settings_from_args(args)
+    metadata_cache = MetadataCache()
+    download_archive = DownloadArchive()
+    media_store = MediaStore()
+    download_queue = DownloadQueue()
+    postprocess_pool = PostProcessPool()
+    governor = BandwidthGovernor(args.max_bandwidth * 1024, args.max_requests)
+    side_fetcher = SideFetcher(governor=governor)
+    metrics = MetricsRegistry()
+    metrics.set_capacity(args.jobs)
+    metrics.add_collector(session_collector(download_queue, governor, postprocess_pool, side_fetcher))
+    exporters = []
+    if args.metrics_port:
+        exporters.append(MetricsServer(metrics, args.metrics_port).start())
+        print_log(f"Metrics at http://127.0.0.1:{args.metrics_port}/metrics")
+    if args.metrics_file:
+        exporters.append(SnapshotWriter(metrics, args.metrics_file, args.metrics_interval).start())
+    active_jobs = {}
+    resolved_infos = {}
+    failures = []
+
+    if download_queue.recovered_jobs:
+        print_log(f"Requeued {download_queue.recovered_jobs} job(s) interrupted in an earlier session")
+    # Jobs the window or other runs still have open are theirs; this counts only what earlier sessions left
+    pending = download_queue.pending_count()
+    if pending and args.resume:
+        print_log(f"Resuming {pending} queued job(s) from an earlier session")
+    elif pending:
+        print_log(f"Leaving {pending} queued job(s) from an earlier session for --resume or the window")
+    unique_urls = dedupe_urls(urls, settings.is_playlist)
+    if len(unique_urls) < len(urls):
+        print_log(f"Ignoring {len(urls) - len(unique_urls)} duplicate URL(s)")
+
+    def queue_url(url, info=None):
+        if info is not None:
+            print_log(f"Resolved {describe_info(info)}")
+        job_id = download_queue.add(url, settings, args.output, args.priority)
+        if info is not None:
+            resolved_infos[job_id] = info
+        scheduler.track(job_id)
+
+    def intake():
+        if len(unique_urls) == 1:
+            queue_url(unique_urls[0])
+        elif unique_urls:
+            # Resolve the batch concurrently; each URL is queued as soon as it resolves
+            print_log(f"Resolving {len(unique_urls)} URLs with {args.extractors} extractors")
+            resolver = BatchResolver(settings, metadata_cache, args.extractors, governor)
+            started = time.monotonic()
+            resolved, failed = resolver.resolve(unique_urls, queue_url, print_log)
+            print_log(f"Resolved {resolved} URL(s) in {time.monotonic() - started:.1f}s"
+                      + (f", {failed} queued unresolved" if failed else ""))
+
+    def run_job(queued):
+        partial_bytes = resumable_bytes(queued)
+        prefix = f"#{queued.job_id}"
+        if partial_bytes:
+            print_log(f"{prefix} resuming with {partial_bytes / 1024 / 1024:.1f} MB already downloaded")
+        print_log(f"{prefix} ==> {queued.url}")
+        job = DownloadJob(
+            queued.url, queued.settings, queued.output_dir,
+            metadata_cache=metadata_cache,
+            download_archive=download_archive,
+            media_store=media_store,
+            on_progress=lambda snapshot: print_progress(snapshot, prefix, governor.throughput()),
+            on_playlist_info=lambda title, total, final: print_playlist_info(prefix, title, total, final),
+            on_log=print_log,
+            progress_hooks=[partial_file_hook(download_queue, queued.job_id)],
+            postprocess_pool=postprocess_pool,
+            governor=governor,
+            job_key=queued.job_id,
+            metrics=metrics,
+            side_fetcher=side_fetcher,
+            resolved_info=resolved_infos.pop(queued.job_id, None)
+        )
+        active_jobs[queued.job_id] = job
+        try:
+            success, message = job.run()
+        except JobPaused:
+            print_log(f"{prefix} paused, partial files kept for --resume")
+            raise
+        except JobCancelled:
+            # The scheduler discards the partial files; there is nothing left to resume
+            print_log(f"{prefix} cancelled, partial files discarded")
+            raise
+        except Exception as e:
+            success, message = False, f"Download failed: {e}"
+        finally:
+            active_jobs.pop(queued.job_id, None)
+        print_log(f"{prefix} {message}")
+        if not success:
+            failures.append(queued.job_id)
+        return success, message
+
+    # Without --resume, only the jobs this run adds (tracked by queue_url) are run
+    scheduler = Scheduler(download_queue, run_job, max_workers=args.jobs, job_ids=None if args.resume else ())
+    scheduler.start()
+    try:
+        try:
+            intake()
+            scheduler.wait_until_idle()
+        except KeyboardInterrupt:
+            # Pause rather than kill, so .part files are intact for the next run
+            scheduler.stop()
+            for job in list(active_jobs.values()):
+                job.pause()
+            scheduler.join(timeout=10)
+            postprocess_pool.close(wait=False)
+            side_fetcher.close(wait=False)
+            print_log("Interrupted; unfinished jobs will resume on the next run")
+            return 130
+        scheduler.stop()
+        postprocess_pool.close()
+        side_fetcher.close()
+    finally:
+        # The last snapshot is written on close, so the file covers the whole session
+        for exporter in exporters:
+            exporter.close()
+        download_queue.close()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import os
+import time
+import sqlite3
+import threading
+
+
+DEFAULT_ARCHIVE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "youtube_downloader", "archive.sqlite3")
+
+
+class DownloadArchive:
+    """Persistent index of completed downloads keyed by (video id, format, output folder).
+
+    The table is loaded into a dict once, so membership checks during a
+    playlist sync are hash lookups rather than queries or filesystem scans.
+    """
+
+    def __init__(self, path=DEFAULT_ARCHIVE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS downloads ("
+            " video_id TEXT NOT NULL,"
+            " format TEXT NOT NULL,"
+            " output_dir TEXT NOT NULL,"
+            " filepath TEXT,"
+            " completed_at REAL,"
+            " PRIMARY KEY (video_id, format, output_dir))"
+        )
+        self.conn.commit()
+        self.index = {
+            (video_id, fmt, output_dir): filepath
+            for video_id, fmt, output_dir, filepath in self.conn.execute(
+                "SELECT video_id, format, output_dir, filepath FROM downloads"
+            )
+        }
+
+    @staticmethod
+    def make_key(video_id, fmt, output_dir):
+        return (str(video_id), str(fmt), os.path.abspath(output_dir))
+
+    def contains(self, video_id, fmt, output_dir):
+        filepath = self.index.get(self.make_key(video_id, fmt, output_dir))
+        # A file deleted by the user should be fetched again
+        return filepath is not None and (not filepath or os.path.exists(filepath))
+
+    def add(self, video_id, fmt, output_dir, filepath=None):
+        key = self.make_key(video_id, fmt, output_dir)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?)",
+                (*key, filepath or "", time.time())
+            )
+            self.conn.commit()
+            self.index[key] = filepath or ""
+
+    def remove(self, video_id, fmt, output_dir):
+        key = self.make_key(video_id, fmt, output_dir)
+        with self.lock:
+            self.conn.execute(
+                "DELETE FROM downloads WHERE video_id = ? AND format = ? AND output_dir = ?", key
+            )
+            self.conn.commit()
+            self.index.pop(key, None)
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
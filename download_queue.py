@@ -0,0 +1,476 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+
+from download_settings import DownloadSettings
+
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "youtube_downloader", "queue.sqlite3")
+HEARTBEAT_INTERVAL = 10.0  # Seconds between refreshes of updated_at on the jobs this process runs
+STALE_AFTER = 60.0  # A running job whose owner hasn't refreshed it for this long is taken back
+
+QUEUED = "queued"
+RUNNING = "running"
+PAUSED = "paused"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+@dataclass
+class QueuedJob:
+    job_id: int
+    url: str
+    output_dir: str
+    settings: DownloadSettings
+    priority: int = 0
+    state: str = QUEUED
+    message: str = ""
+    partial_files: list = field(default_factory=list)
+
+
+def pid_alive(pid):
+    """Whether a local process exists; None where that can't be checked safely."""
+    if os.name == 'nt':
+        # os.kill would terminate the process on Windows; rely on the heartbeat
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return None
+    return True
+
+
+class DownloadQueue:
+    """SQLite-backed job queue that survives restarts.
+
+    Several processes (the window and any number of cli.py runs) may share
+    the file. Each open queue is a session with a heartbeat in the sessions
+    table, and every job records the session that added it. next_job()
+    only claims the session's own jobs and those whose session has ended
+    (earlier runs, crashed processes), so one process never runs jobs
+    another live one is waiting for.
+
+    A claimed job also records its owner (host and pid), and the owner
+    refreshes updated_at every HEARTBEAT_INTERVAL while the job runs. Jobs
+    whose owner died are put back in the queue on open: the owner process
+    is gone, or its heartbeat is older than STALE_AFTER. Their .part files
+    are still on disk, so yt-dlp continues them from the last byte written
+    instead of starting over. Jobs another live process is running are left
+    alone. close() ends the session.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " url TEXT NOT NULL,"
+            " output_dir TEXT NOT NULL,"
+            " settings TEXT NOT NULL,"
+            " priority INTEGER NOT NULL DEFAULT 0,"
+            " state TEXT NOT NULL,"
+            " message TEXT NOT NULL DEFAULT '',"
+            " partial_files TEXT NOT NULL DEFAULT '[]',"
+            " created_at REAL,"
+            " updated_at REAL)"
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        if 'owner_host' not in columns:
+            # Queues from before jobs had owners
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN owner_host TEXT")
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN owner_pid INTEGER")
+        if 'added_session' not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN added_session TEXT")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session TEXT PRIMARY KEY,"
+            " host TEXT NOT NULL,"
+            " pid INTEGER NOT NULL,"
+            " heartbeat_at REAL)"
+        )
+        self.conn.commit()
+        self.host = socket.gethostname()
+        self.pid = os.getpid()
+        self.session = uuid.uuid4().hex
+        self.heartbeat_stopped = threading.Event()
+        self.heartbeat_thread = None
+        self.recovered_jobs = self.recover_interrupted()  # Reported by the front ends on startup
+        self.execute(
+            "INSERT INTO sessions (session, host, pid, heartbeat_at) VALUES (?, ?, ?, ?)",
+            (self.session, self.host, self.pid, time.time())
+        )
+        self.start_heartbeat()
+
+    def row_to_job(self, row):
+        job_id, url, output_dir, settings, priority, state, message, partial_files = row
+        return QueuedJob(
+            job_id=job_id,
+            url=url,
+            output_dir=output_dir,
+            settings=DownloadSettings.from_dict(json.loads(settings)),
+            priority=priority,
+            state=state,
+            message=message,
+            partial_files=json.loads(partial_files)
+        )
+
+    def execute(self, query, params=()):
+        with self.lock:
+            cursor = self.conn.execute(query, params)
+            self.conn.commit()
+            return cursor
+
+    def owner_is_dead(self, host, pid, updated_at):
+        if host is None or pid is None or updated_at is None:
+            return True
+        if time.time() - updated_at > STALE_AFTER:
+            return True
+        if host != self.host:
+            return False
+        if pid == self.pid:
+            # Claimed by an earlier process that had this pid; recovery runs before this queue claims anything
+            return True
+        return pid_alive(pid) is False
+
+    def session_is_live(self, host, pid, heartbeat_at):
+        if heartbeat_at is None or time.time() - heartbeat_at > STALE_AFTER:
+            return False
+        return host != self.host or pid_alive(pid) is not False
+
+    def live_sessions(self):
+        """Sessions, other than this one, whose queued jobs aren't up for grabs."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT session, host, pid, heartbeat_at FROM sessions WHERE session != ?", (self.session,)
+            ).fetchall()
+        return [session for session, host, pid, heartbeat_at in rows if self.session_is_live(host, pid, heartbeat_at)]
+
+    def recover_interrupted(self):
+        """Requeue running jobs whose owner is gone; returns how many."""
+        with self.lock:
+            sessions = self.conn.execute("SELECT session, host, pid, heartbeat_at FROM sessions").fetchall()
+            for session, host, pid, heartbeat_at in sessions:
+                if not self.session_is_live(host, pid, heartbeat_at):
+                    # Crashed without close(); its jobs are orphans either way
+                    self.conn.execute("DELETE FROM sessions WHERE session = ?", (session,))
+            rows = self.conn.execute(
+                "SELECT job_id, owner_host, owner_pid, updated_at FROM jobs WHERE state = ?", (RUNNING,)
+            ).fetchall()
+            recovered = 0
+            for job_id, host, pid, updated_at in rows:
+                if not self.owner_is_dead(host, pid, updated_at):
+                    continue
+                # Conditional on the same owner and heartbeat, in case it was refreshed meanwhile
+                recovered += self.conn.execute(
+                    "UPDATE jobs SET state = ?, updated_at = ? WHERE job_id = ? AND state = ?"
+                    " AND updated_at IS ?",
+                    (QUEUED, time.time(), job_id, RUNNING, updated_at)
+                ).rowcount
+            self.conn.commit()
+        return recovered
+
+    def start_heartbeat(self):
+        with self.lock:
+            if self.heartbeat_thread is not None:
+                return
+            self.heartbeat_thread = threading.Thread(target=self.heartbeat_loop, daemon=True)
+        self.heartbeat_thread.start()
+
+    def heartbeat_loop(self):
+        while not self.heartbeat_stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.heartbeat()
+            except sqlite3.Error:
+                pass
+
+    def heartbeat(self):
+        # Tells other processes sharing the file that this session and its running jobs are alive
+        now = time.time()
+        self.execute("UPDATE sessions SET heartbeat_at = ? WHERE session = ?", (now, self.session))
+        self.execute(
+            "UPDATE jobs SET updated_at = ? WHERE state = ? AND owner_host = ? AND owner_pid = ?",
+            (now, RUNNING, self.host, self.pid)
+        )
+
+    def add(self, url, settings, output_dir, priority=0):
+        now = time.time()
+        cursor = self.execute(
+            "INSERT INTO jobs (url, output_dir, settings, priority, state, created_at, updated_at, added_session)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, output_dir, json.dumps(settings.to_dict()), priority, QUEUED, now, now, self.session)
+        )
+        return cursor.lastrowid
+
+    def scope_filter(self, job_ids):
+        # SQL condition limiting a query to job_ids, or with None to the jobs
+        # this session may take: its own and those of sessions that ended
+        if job_ids is not None:
+            job_ids = tuple(job_ids)
+            return f" AND job_id IN ({', '.join('?' * len(job_ids))})", job_ids
+        live = tuple(self.live_sessions())
+        return (f" AND (added_session IS NULL OR added_session = ?"
+                f" OR added_session NOT IN ({', '.join('?' * len(live))}))"), (self.session, *live)
+
+    def next_job(self, job_ids=None):
+        """Claim the highest-priority queued job this session may take, only among job_ids if given."""
+        if job_ids is not None and not job_ids:
+            return None
+        condition, params = self.scope_filter(job_ids)
+        # Claim with a conditional UPDATE so two workers (or two processes
+        # sharing the file) never get the same job
+        while True:
+            with self.lock:
+                row = self.conn.execute(
+                    "SELECT job_id, url, output_dir, settings, priority, state, message, partial_files"
+                    " FROM jobs WHERE state = ?" + condition + " ORDER BY priority DESC, job_id ASC LIMIT 1",
+                    (QUEUED, *params)
+                ).fetchone()
+                if row is None:
+                    return None
+                claimed = self.conn.execute(
+                    "UPDATE jobs SET state = ?, updated_at = ?, owner_host = ?, owner_pid = ?"
+                    " WHERE job_id = ? AND state = ?",
+                    (RUNNING, time.time(), self.host, self.pid, row[0], QUEUED)
+                ).rowcount
+                self.conn.commit()
+            if claimed:
+                job = self.row_to_job(row)
+                job.state = RUNNING
+                return job
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT job_id, url, output_dir, settings, priority, state, message, partial_files"
+                " FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self.row_to_job(row) if row else None
+
+    def jobs(self, include_finished=True):
+        query = ("SELECT job_id, url, output_dir, settings, priority, state, message, partial_files"
+                 " FROM jobs")
+        params = ()
+        if not include_finished:
+            query += " WHERE state NOT IN (?, ?, ?)"
+            params = FINISHED_STATES
+        query += " ORDER BY priority DESC, job_id ASC"
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [self.row_to_job(row) for row in rows]
+
+    def pending_count(self, job_ids=None):
+        """Queued jobs next_job() would claim with the same job_ids."""
+        if job_ids is not None and not job_ids:
+            return 0
+        condition, params = self.scope_filter(job_ids)
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = ?" + condition, (QUEUED, *params)
+            ).fetchone()[0]
+
+    def unfinished_count(self, job_ids):
+        """Jobs among job_ids not yet completed, failed or cancelled, wherever they run."""
+        if not job_ids:
+            return 0
+        condition, params = self.scope_filter(job_ids)
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state NOT IN (?, ?, ?)" + condition, (*FINISHED_STATES, *params)
+            ).fetchone()[0]
+
+    def set_state(self, job_id, state, message=""):
+        self.execute(
+            "UPDATE jobs SET state = ?, message = ?, updated_at = ? WHERE job_id = ?",
+            (state, message, time.time(), job_id)
+        )
+        if state in (COMPLETED, CANCELLED):
+            self.execute("UPDATE jobs SET partial_files = '[]' WHERE job_id = ?", (job_id,))
+
+    def requeue(self, job_id):
+        self.set_state(job_id, QUEUED)
+
+    def add_partial_file(self, job_id, path):
+        with self.lock:
+            row = self.conn.execute("SELECT partial_files FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            partial_files = json.loads(row[0])
+            if path in partial_files:
+                return
+            partial_files.append(path)
+            self.conn.execute(
+                "UPDATE jobs SET partial_files = ? WHERE job_id = ?", (json.dumps(partial_files), job_id)
+            )
+            self.conn.commit()
+
+    def remove(self, job_id):
+        self.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def clear_finished(self):
+        self.execute("DELETE FROM jobs WHERE state IN (?, ?, ?)", FINISHED_STATES)
+
+    def close(self):
+        # Ends the session: its queued jobs are left for the next one to take
+        self.heartbeat_stopped.set()
+        with self.lock:
+            self.conn.execute("DELETE FROM sessions WHERE session = ?", (self.session,))
+            self.conn.commit()
+            self.conn.close()
+
+
+def partial_file_hook(queue, job_id):
+    # Record each .part path once, not on every progress callback
+    seen = set()
+
+    def hook(d):
+        tmpfilename = d.get('tmpfilename')
+        if d['status'] == 'downloading' and tmpfilename and tmpfilename not in seen:
+            seen.add(tmpfilename)
+            queue.add_partial_file(job_id, tmpfilename)
+    return hook
+
+
+def discard_partial_files(job):
+    for path in job.partial_files:
+        candidates = [path]
+        if path.endswith('.part'):
+            # Fragment downloads keep their resume state next to the final filename,
+            # segmented downloads next to the .part file
+            candidates.append(path[:-len('.part')] + '.ytdl')
+            candidates.append(path + '.segments')
+        for candidate in candidates:
+            try:
+                os.remove(candidate)
+            except OSError:
+                pass
+
+
+def resumable_bytes(job):
+    total = 0
+    for path in job.partial_files:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+class Scheduler:
+    """Dispatches queued jobs to at most max_workers worker threads.
+
+    run_job(job) must return (success, message) or raise; the outcome is
+    written back to the queue. With job_ids (a set, which track() adds to),
+    only those jobs are run and other queued jobs are left alone.
+    """
+
+    def __init__(self, queue, run_job, max_workers=2, poll_interval=1.0, job_ids=None):
+        self.queue = queue
+        self.job_ids = None if job_ids is None else set(job_ids)
+        self.job_ids_lock = threading.Lock()
+        self.run_job = run_job
+        self.max_workers = max(1, max_workers)
+        self.poll_interval = poll_interval
+        self.slots = threading.BoundedSemaphore(self.max_workers)
+        self.wakeup = threading.Event()
+        self.running = False
+        self.active = {}
+        self.active_lock = threading.Lock()
+        self.dispatcher = None
+
+    def start(self):
+        self.running = True
+        self.dispatcher = threading.Thread(target=self.dispatch_loop, daemon=True)
+        self.dispatcher.start()
+
+    def notify(self):
+        self.wakeup.set()
+
+    def track(self, job_id):
+        if self.job_ids is not None:
+            with self.job_ids_lock:
+                self.job_ids.add(job_id)
+        self.notify()
+
+    def tracked_ids(self):
+        if self.job_ids is None:
+            return None
+        with self.job_ids_lock:
+            return frozenset(self.job_ids)
+
+    def dispatch_loop(self):
+        while self.running:
+            self.slots.acquire()
+            # Claim and register together so is_idle never sees a job in neither place
+            with self.active_lock:
+                job = self.queue.next_job(self.tracked_ids()) if self.running else None
+                if job is not None:
+                    worker = threading.Thread(target=self.run_worker, args=(job,), daemon=True)
+                    self.active[job.job_id] = worker
+            if job is None:
+                self.slots.release()
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+                continue
+            worker.start()
+
+    def run_worker(self, job):
+        from downloader_core import JobCancelled, JobPaused  # Imports yt-dlp; the queue itself doesn't need it
+
+        try:
+            success, message = self.run_job(job)
+            self.queue.set_state(job.job_id, COMPLETED if success else FAILED, message)
+        except JobPaused:
+            # Paused by the user stays paused; paused for shutdown resumes next run
+            self.queue.set_state(job.job_id, PAUSED if self.running else QUEUED)
+        except JobCancelled:
+            discard_partial_files(self.queue.get(job.job_id) or job)
+            self.queue.set_state(job.job_id, CANCELLED)
+        except Exception as e:
+            if self.running:
+                self.queue.set_state(job.job_id, FAILED, str(e))
+            else:
+                # Shutting down: leave the job for the next run to resume
+                self.queue.requeue(job.job_id)
+        finally:
+            with self.active_lock:
+                self.active.pop(job.job_id, None)
+            self.slots.release()
+            self.wakeup.set()
+
+    def is_idle(self):
+        # With job_ids, idle only once every tracked job is finished, not merely claimed
+        job_ids = self.tracked_ids()
+        with self.active_lock:
+            if self.active:
+                return False
+            if job_ids is None:
+                return self.queue.pending_count() == 0
+            return self.queue.unfinished_count(job_ids) == 0
+
+    def wait_until_idle(self, poll_interval=0.5):
+        while not self.is_idle():
+            time.sleep(poll_interval)
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+
+    def join(self, timeout=None):
+        with self.active_lock:
+            workers = list(self.active.values())
+        for worker in workers:
+            worker.join(timeout)
@@ -0,0 +1,71 @@
+from dataclasses import dataclass, asdict
+
+
+# Nothing here imports yt-dlp, so the window can be built before it is loaded
+QUALITY_OPTIONS = ["Best Available", "8K", "4K", "2K", "1080p", "720p", "480p", "360p"]
+CONTENT_TYPES = ["Video+Audio", "Video Only", "Audio Only"]
+OUTPUT_FORMATS = {
+    "Video+Audio": ["MP4", "MKV", "WEBM", "Best Available"],
+    "Video Only": ["MP4", "MKV", "WEBM", "Best Available"],
+    "Audio Only": ["MP3", "AAC", "M4A", "OPUS", "Best Available"],
+}
+
+
+def get_quality_options(quality):
+    quality_map = {
+        "Best Available": "best",
+        "8K": "4320",
+        "4K": "2160",
+        "2K": "1440",
+        "1080p": "1080",
+        "720p": "720",
+        "480p": "480",
+        "360p": "360"
+    }
+    return quality_map.get(quality, "best")
+
+
+def get_format_extension(output_format):
+    format_map = {
+        "MP4": "mp4",
+        "MKV": "mkv",
+        "WEBM": "webm",
+        "MP3": "mp3",
+        "AAC": "aac",
+        "M4A": "m4a",
+        "OPUS": "opus",
+        "Best Available": "best"
+    }
+    return format_map.get(output_format, "best")
+
+
+@dataclass
+class DownloadSettings:
+    """Everything needed to rebuild the yt-dlp options for a job, independent of any UI."""
+    quality: str = "Best Available"
+    content_type: str = "Video+Audio"
+    output_format: str = "best"
+    subtitles: bool = False
+    subtitle_langs: str = "en.*"  # yt-dlp style patterns, comma separated; empty for all
+    thumbnail: bool = False
+    metadata: bool = True
+    embed_thumbnail: bool = False
+    cookies_file: str = ""
+    is_playlist: bool = False
+    playlist_items: str = ""
+    max_workers: int = 3
+    retries: int = 3
+    skip_archived: bool = True
+    link_duplicates: bool = True
+    connections: int = 1
+    chunk_size_mb: int = 4
+    assets_only: bool = False  # Fetch only the subtitles/thumbnail, not the media
+    refresh_assets: bool = False  # Fetch subtitles/thumbnails again even if cached or already present
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        known = cls.__dataclass_fields__
+        return cls(**{k: v for k, v in data.items() if k in known})
@@ -0,0 +1,749 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError, wait, FIRST_COMPLETED
+
+from yt_dlp.extractor import gen_extractor_classes
+from yt_dlp.utils import PlaylistEntries, PagedList, DownloadCancelled
+
+from download_settings import get_quality_options
+from metadata_cache import normalize_url, cache_key
+from progress_tracker import ProgressTracker, DEFAULT_PROGRESS_INTERVAL
+from segmented_download import accelerated_options
+from postprocess_pipeline import PipelinedYoutubeDL, PostprocessorTimer, StageStats
+from format_ranking import FormatSelector
+from side_assets import SideFetcher, split_langs
+
+
+ENTRY_LOOKAHEAD = 4  # Playlist entries queued per worker ahead of the downloads
+PLAYLIST_INFO_INTERVAL = 1.0  # Seconds between growing-total reports while a playlist is listed
+MEDIA_KEY_IGNORED_ARGS = ('key', 'when', 'already_have_thumbnail')  # Postprocessor args that don't change the file
+MAX_CACHED_ENTRIES = 5000  # Longer playlists aren't cached, so listing them doesn't hold every entry
+WARM_UP_URL = "https://example.invalid/warm-up"  # Matches no extractor, so each pattern is tried
+
+
+def get_format_string(quality, format_choice, output_format):
+    quality_code = get_quality_options(quality)
+
+    if format_choice == "Video+Audio":
+        if quality == "Best Available":
+            if output_format == "best":
+                return "bestvideo+bestaudio"
+            else:
+                return f"bestvideo[ext={output_format}]+bestaudio[ext={output_format}]/bestvideo+bestaudio"
+        else:
+            return f"bestvideo[height<={quality_code}][ext={output_format}]+bestaudio[ext={output_format}]/best[height<={quality_code}]"
+    elif format_choice == "Video Only":
+        if quality == "Best Available":
+            if output_format == "best":
+                return "bestvideo"
+            else:
+                return f"bestvideo[ext={output_format}]"
+        else:
+            return f"bestvideo[height<={quality_code}][ext={output_format}]"
+    elif format_choice == "Audio Only":
+        if output_format == "best":
+            return "bestaudio"
+        else:
+            return f"bestaudio[ext={output_format}]"
+    return "best"
+
+
+def get_format_selector(quality, format_choice, output_format):
+    # Ranked locally against each video's formats; str() is the equivalent selector string
+    quality_code = get_quality_options(quality)
+    return FormatSelector(
+        int(quality_code) if quality_code.isdigit() else None,
+        format_choice,
+        output_format,
+        get_format_string(quality, format_choice, output_format)
+    )
+
+
+def safe_folder_name(title):
+    # Clean the playlist title to make it filesystem-safe
+    return "".join(c if c.isalnum() or c in (' ', '_') else '_' for c in title)
+
+
+def embeds_thumbnail(settings):
+    return settings.embed_thumbnail and settings.content_type != "Audio Only"
+
+
+def build_options(settings, output_path, progress_hooks=None, logger=None):
+    # Subtitles and standalone thumbnails are fetched by DownloadJob's side
+    # fetcher; only a thumbnail that gets embedded is written inline
+    options = {
+        'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s'),
+        'progress_hooks': list(progress_hooks or []),
+        'quiet': False,
+        # ProgressTracker reports progress; yt-dlp's per-chunk lines would flood the log
+        'noprogress': True,
+        'no_warnings': False,
+        'restrictfilenames': True,
+        'writethumbnail': embeds_thumbnail(settings),
+        'addmetadata': settings.metadata,
+        'format': get_format_selector(settings.quality, settings.content_type, settings.output_format),
+        'postprocessors': [],
+        'cookiefile': settings.cookies_file or None
+    }
+
+    # Set output format options
+    if settings.output_format in ["mp4", "mkv", "webm"]:
+        options['merge_output_format'] = settings.output_format
+
+    # Add thumbnail embedding if requested
+    if embeds_thumbnail(settings):
+        options['postprocessors'].append({
+            'key': 'EmbedThumbnail',
+            # Keep the image file too when the thumbnail was asked for
+            'already_have_thumbnail': settings.thumbnail
+        })
+
+    # Add metadata postprocessor for audio files
+    if settings.content_type == "Audio Only" and settings.metadata:
+        options['postprocessors'].append({
+            'key': 'FFmpegMetadata'
+        })
+
+    if settings.is_playlist and settings.playlist_items:
+        options['playlist_items'] = settings.playlist_items
+
+    if settings.connections > 1:
+        options.update(accelerated_options(settings.connections, settings.chunk_size_mb * 1024 * 1024))
+
+    if logger is not None:
+        options['logger'] = logger
+
+    return options
+
+
+def warm_up():
+    """Load and compile every extractor's URL pattern ahead of the first job.
+
+    yt-dlp does this on the first extraction, which otherwise adds most of
+    a second to it. Returns how many extractors were loaded.
+    """
+    extractors = list(gen_extractor_classes())
+    for ie in extractors:
+        ie.suitable(WARM_UP_URL)
+    return len(extractors)
+
+
+class YTDLLogger:
+    def __init__(self, log_callback):
+        self.log_callback = log_callback
+
+    def debug(self, msg):
+        if msg.startswith('[debug] '):
+            pass
+        else:
+            self.log_callback(msg)
+
+    def info(self, msg):
+        self.log_callback(msg)
+
+    def warning(self, msg):
+        self.log_callback(f"WARNING: {msg}")
+
+    def error(self, msg):
+        self.log_callback(f"ERROR: {msg}")
+
+
+def _ignore(*args):
+    pass
+
+
+class JobCancelled(DownloadCancelled):
+    msg = 'The download was cancelled'
+
+
+class JobPaused(DownloadCancelled):
+    msg = 'The download was paused; partial files were kept for resuming'
+
+
+class DownloadJob:
+    """Runs one URL (single video or playlist) to completion on the calling thread.
+
+    Progress, playlist info and log lines are reported through plain callbacks
+    so the same job can drive the Qt window or the command line. on_progress
+    receives a ProgressTracker snapshot dict, at most once per progress_interval.
+    Playlists are downloaded while they are still being listed;
+    on_playlist_info(title, total, final) reports the growing item count and
+    is called with final=True once the count is complete.
+
+    cancel() and pause() may be called from any thread. The job notices at
+    the next progress or postprocessor callback (every downloaded block) and
+    run() raises JobCancelled or JobPaused. A paused job leaves its .part
+    files in place, so running it again continues from the same byte offset.
+
+    With a postprocess_pool, ffmpeg work for each item runs in that pool
+    while the download workers move on to the next item; an item counts as
+    finished once its post-processing is done. Per-stage timings are kept in
+    stage_stats.
+
+    A governor (BandwidthGovernor) shared between jobs paces every request
+    and transferred byte; the job's throughput is reported under job_key
+    (the URL by default).
+
+    A metrics registry (MetricsRegistry), also shared, gets the job's stage
+    timings, bytes, retries and warning/error counts under the same key.
+
+    With a media_store (MediaStore), a video already downloaded in the same
+    format into another folder is linked in instead of downloaded again,
+    and every finished file is recorded there for later jobs.
+
+    Subtitles (filtered by settings.subtitle_langs) and thumbnails are
+    handed to a side_fetcher (SideFetcher) as soon as each video's info is
+    extracted, and fetched on its pool while the media downloads; the job
+    waits for them before it returns. Without a shared one, the job uses a
+    fetcher of its own. With settings.assets_only, only these are fetched
+    and no media is downloaded.
+    """
+
+    def __init__(self, url, settings, output_dir, metadata_cache=None, download_archive=None,
+                 on_progress=None, on_playlist_info=None, on_log=None, progress_hooks=None,
+                 progress_interval=DEFAULT_PROGRESS_INTERVAL, postprocess_pool=None, governor=None,
+                 job_key=None, metrics=None, media_store=None, side_fetcher=None, resolved_info=None):
+        self.url = url
+        # Unprocessed info BatchResolver already extracted for url; used once, instead of extracting again
+        self.resolved_info = resolved_info
+        self.settings = settings
+        self.output_dir = output_dir
+        self.metadata_cache = metadata_cache
+        # Fetching only subtitles/thumbnails must not skip or link videos that already have their media
+        self.download_archive = download_archive if settings.skip_archived and not settings.assets_only else None
+        self.media_store = media_store if settings.link_duplicates and not settings.assets_only else None
+        self.on_progress = on_progress or _ignore
+        self.on_playlist_info = on_playlist_info or _ignore
+        self.on_log = on_log or _ignore
+        self.job_key = job_key or url
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.job_started(self.job_key, url)
+            self.on_log = metrics.log_hook(self.job_key, self.on_log)
+        self.is_playlist = settings.is_playlist
+        self.max_workers = max(1, settings.max_workers)
+        self.retries = max(0, settings.retries)
+        self.tracker = ProgressTracker(self.on_progress, progress_interval, playlist=self.is_playlist)
+        self.cancel_requested = False
+        self.pause_requested = False
+        # Playlist workers add their own per-entry tracker hook
+        hooks = [self.check_interrupt] + list(progress_hooks or [])
+        if governor is not None:
+            hooks.append(governor.progress_hook(self.job_key))
+        if metrics is not None:
+            hooks.append(metrics.progress_hook(self.job_key))
+        if not self.is_playlist:
+            hooks.append(lambda d: self.tracker.hook(0, d))
+        self.options = build_options(settings, output_dir, hooks, YTDLLogger(self.on_log))
+        self.options['postprocessor_hooks'] = [self.check_interrupt]
+        if metrics is not None:
+            # Inline post-processing; deferred files are timed in the pool worker
+            self.options['postprocessor_hooks'].append(PostprocessorTimer(lambda stage, seconds: self.stage_stats.record(stage, seconds)))
+        if governor is not None:
+            self.options['bandwidth_governor'] = governor
+        self.postprocess_pool = postprocess_pool
+        if postprocess_pool is not None:
+            self.options['defer_postprocessing'] = True
+        self.stage_stats = StageStats(
+            on_record=None if metrics is None else lambda stage, seconds: metrics.observe(stage, seconds, self.job_key)
+        )
+        self.postprocess_futures = []
+        self.postprocess_done = threading.Condition()
+        self.postprocessing_items = 0
+        self.playlist_folder = ""
+        self.running = True
+        self.failed_items = []
+        self.total_items = 0
+        self.side_langs = split_langs(settings.subtitle_langs) if settings.subtitles else None
+        # An embedded thumbnail is written inline, for the EmbedThumbnail postprocessor
+        self.side_thumbnail = settings.thumbnail and (settings.assets_only or not embeds_thumbnail(settings))
+        self.owns_side_fetcher = False
+        if side_fetcher is None and (self.side_langs or self.side_thumbnail):
+            side_fetcher = SideFetcher(governor=governor)
+            self.owns_side_fetcher = True
+        self.side_fetcher = side_fetcher if self.side_langs or self.side_thumbnail else None
+        self.side_futures = []
+        self.side_totals = {'fetched': 0, 'cached': 0, 'existing': 0, 'failed': 0}
+
+    def run(self):
+        state = 'failed'
+        try:
+            try:
+                if self.is_playlist:
+                    self.download_playlist()
+                else:
+                    with PipelinedYoutubeDL(self.options) as ydl:
+                        info = self.resolve_entry(ydl, self.take_resolved_info() or {'_type': 'url', 'url': self.url})
+                        video_id = info.get('id') if info.get('_type', 'video') == 'video' else None
+                        linked = self.link_duplicate(0, None, video_id, "Download complete", info)
+                        if not linked:
+                            result, tasks = self.download_item(ydl, info)
+                    if not linked:
+                        self.hand_off(0, None, result, tasks, "Download complete")
+            finally:
+                self.wait_for_postprocessing()
+                self.wait_for_side_assets()
+            if any(future.cancelled() for future in self.postprocess_futures + self.side_futures):
+                # Paused or cancelled while items were waiting for post-processing
+                self.check_interrupt()
+            if self.stage_stats.stages:
+                self.on_log(self.stage_stats.describe())
+            if self.failed_items and not self.is_playlist:
+                return False, "Post-processing failed"
+            if self.failed_items:
+                return False, f"{len(self.failed_items)} of {self.total_items} playlist items failed to download"
+            if self.settings.assets_only and self.side_totals['failed']:
+                return False, f"{self.side_totals['failed']} subtitle/thumbnail file(s) could not be fetched"
+            state = 'completed'
+            return True, "Download completed successfully!"
+        except JobPaused:
+            state = 'paused'
+            raise
+        except JobCancelled:
+            state = 'cancelled'
+            raise
+        finally:
+            self.running = False
+            if self.owns_side_fetcher:
+                self.side_fetcher.close(wait=False)
+            if self.metrics is not None:
+                self.metrics.job_finished(self.job_key, state)
+
+    def open_playlist(self, ydl):
+        # Single unprocessed extraction of the first page: entries stay as
+        # references and are resolved exactly once, by the worker that
+        # downloads them. Later pages are fetched as the entries are consumed
+        key = cache_key(self.url, playlist=True, cookies_file=self.settings.cookies_file)
+        info = self.metadata_cache.get(key) if self.metadata_cache else None
+        if info is not None:
+            self.on_log(f"Using cached playlist info for {self.url}")
+            return info
+        info = self.take_resolved_info() or ydl.extract_info(self.url, download=False, process=False)
+        while info.get('_type') in ('url', 'url_transparent'):
+            info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+        if self.metadata_cache and 'entries' in info:
+            if isinstance(info['entries'], list):
+                self.metadata_cache.set(key, dict(info, entries=list(info['entries'])))
+            elif not isinstance(info['entries'], PagedList):
+                # Paged lists are fetched by index, so a partial range never reads them all
+                info['entries'] = self.cache_when_listed(key, info, info['entries'])
+        return info
+
+    def take_resolved_info(self):
+        # Its entries may be a generator, so it can only be used by the first attempt
+        info, self.resolved_info = self.resolved_info, None
+        return info
+
+    def cache_when_listed(self, key, info, entries):
+        # The playlist is cached only once every entry has been seen
+        listed = []
+        for entry in entries:
+            if listed is not None:
+                listed.append(entry)
+                if len(listed) > MAX_CACHED_ENTRIES:
+                    self.on_log(f"Playlist has over {MAX_CACHED_ENTRIES} entries; its listing won't be cached")
+                    listed = None
+            yield entry
+        if listed is not None:
+            self.metadata_cache.set(key, dict(info, entries=listed))
+
+    def stream_entries(self, ydl, info):
+        if 'entries' not in info:
+            yield info
+            return
+        for _, entry in PlaylistEntries(ydl, info).get_requested_items():
+            # Listing a long playlist fetches page after page
+            self.check_interrupt()
+            if entry:
+                yield entry
+
+    def resolve_entry(self, ydl, entry):
+        if entry.get('_type', 'video') not in ('url', 'url_transparent'):
+            return entry
+
+        key = cache_key(entry['url'], cookies_file=self.settings.cookies_file)
+        info = self.metadata_cache.get(key) if self.metadata_cache else None
+        if info is None:
+            info = ydl.extract_info(entry['url'], download=False, process=False, ie_key=entry.get('ie_key'))
+            if info.get('_type') in ('url', 'url_transparent'):
+                # Short links and embeds point at the video; side assets and the media store need its info
+                info = self.resolve_entry(ydl, info)
+            if info.get('_type', 'video') == 'video' and self.metadata_cache:
+                self.metadata_cache.set(key, info)
+
+        if entry.get('_type') == 'url_transparent':
+            # Playlist-level fields take precedence, as in yt-dlp's own url_transparent handling
+            info = dict(info)
+            info.update({
+                k: v for k, v in entry.items()
+                if v is not None and k not in ('_type', 'url', 'ie_key')
+            })
+        return info
+
+    def download_playlist(self):
+        started = time.monotonic()
+        with PipelinedYoutubeDL(self.options) as ydl:
+            info = self.open_playlist(ydl)
+            self.stage_stats.record('extract', time.monotonic() - started)
+            playlist_title = info.get('title') or 'playlist'
+            if 'entries' in info:
+                self.playlist_folder = os.path.join(self.output_dir, safe_folder_name(playlist_title))
+                os.makedirs(self.playlist_folder, exist_ok=True)
+                self.options['outtmpl'] = os.path.join(self.playlist_folder, '%(title)s.%(ext)s')
+            else:
+                # Not actually a playlist: download next to other single videos
+                self.playlist_folder = self.output_dir
+
+            # Entries are handed to the workers as they are listed, so the first
+            # items download while later pages are still being fetched. The
+            # total grows as entries turn up and is final once listing ends
+            pool = ThreadPoolExecutor(max_workers=self.max_workers)
+            pending = {}
+            skipped = 0
+            from_cache = 0
+            last_report = 0.0
+            try:
+                for entry in self.stream_entries(ydl, info):
+                    if self.download_archive is not None and self.in_archive(entry):
+                        # Dropped before any per-item extraction happens
+                        skipped += 1
+                        continue
+                    if self.settings.assets_only and self.fetch_cached_assets(ydl, entry):
+                        # Everything asked for is in the asset cache: no extraction needed
+                        from_cache += 1
+                        continue
+                    index = self.total_items
+                    self.total_items += 1
+                    self.tracker.set_total(self.total_items, final=False)
+                    if time.monotonic() - last_report >= PLAYLIST_INFO_INTERVAL:
+                        last_report = time.monotonic()
+                        self.on_playlist_info(playlist_title, self.total_items, False)
+                    pending[pool.submit(self.download_entry, index, entry)] = entry
+                    if len(pending) >= self.max_workers * ENTRY_LOOKAHEAD:
+                        # Keep listing only as far ahead of the downloads as needed
+                        self.collect_entries(pending)
+                self.stage_stats.record('list_entries', time.monotonic() - started)
+                if skipped:
+                    self.on_log(f"Skipped {skipped} item(s) already in the download archive")
+                if from_cache:
+                    self.on_log(f"Copied subtitles/thumbnails of {from_cache} item(s) from the asset cache")
+                self.tracker.set_total(self.total_items)
+                self.on_playlist_info(playlist_title, self.total_items, True)
+                while pending:
+                    self.collect_entries(pending)
+            finally:
+                # On cancel/pause, drop items that haven't started; running ones
+                # stop at their next progress callback
+                pool.shutdown(wait=True, cancel_futures=True)
+
+    def collect_entries(self, pending):
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            entry = pending.pop(future)
+            if not future.result():
+                self.add_failed_item(entry)
+
+    def download_entry(self, index, entry):
+        options = dict(self.options)
+        options.pop('playlist_items', None)
+        options['noplaylist'] = True
+        options['progress_hooks'] = list(options.get('progress_hooks', [])) + [
+            lambda d: self.tracker.hook(index, d)
+        ]
+        if self.link_duplicate(index, entry, self.entry_archive_id(entry)):
+            return True
+
+        for attempt in range(self.retries + 1):
+            self.check_interrupt()
+            try:
+                # Each worker gets its own YoutubeDL instance and resolves the
+                # entry reference from the playlist extraction
+                with PipelinedYoutubeDL(options) as ydl:
+                    result, tasks = self.download_item(ydl, self.resolve_entry(ydl, entry))
+                break
+            except DownloadCancelled:
+                raise
+            except Exception as e:
+                self.on_log(
+                    f"ERROR: item {index + 1} failed (attempt {attempt + 1}/{self.retries + 1}): {e}"
+                )
+                if self.metrics is not None and attempt < self.retries:
+                    self.metrics.increment('retries', 1, self.job_key)
+        else:
+            self.tracker.finish_item(index)
+            return False
+
+        self.hand_off(index, entry, result, tasks)
+        return True
+
+    def download_item(self, ydl, info):
+        self.fetch_side_assets(ydl, info)
+        if self.settings.assets_only:
+            return info, []
+        started = time.monotonic()
+        result = ydl.process_ie_result(info, download=True)
+        self.stage_stats.record('download', time.monotonic() - started)
+        return result, ydl.deferred_postprocessing
+
+    def hand_off(self, index, entry, result, tasks, status=None):
+        # Second pipeline stage: the calling download worker returns at once
+        # and the item is finished from the pool's callback
+        if not tasks:
+            self.finish_entry(index, entry, result, None, status)
+            return
+
+        futures = {}
+        try:
+            for task in tasks:
+                self.on_log(f"[pipeline] Post-processing {os.path.basename(task.filename)} in the background")
+                futures[self.postprocess_pool.submit(self.options, task)] = task
+        except Exception as e:
+            for future in futures:
+                future.cancel()
+            self.on_log(f"ERROR: could not start post-processing: {e}")
+            self.add_failed_item(entry or result)
+            self.tracker.finish_item(index)
+            return
+
+        outcome = {'pending': len(futures), 'filepath': None, 'ok': True}
+
+        def done(future):
+            task = futures[future]
+            try:
+                output = future.result()
+            except CancelledError:
+                outcome['ok'] = False
+            except Exception as e:
+                outcome['ok'] = False
+                self.on_log(f"ERROR: post-processing failed for {os.path.basename(task.filename)}: {e}")
+            else:
+                for line in output['log']:
+                    self.on_log(line)
+                self.stage_stats.record('postprocess_wait', output['started_at'] - task.submitted_at)
+                self.stage_stats.record('postprocess', output['seconds'])
+                for stage, seconds in output.get('stages', []):
+                    self.stage_stats.record(stage, seconds)
+                outcome['filepath'] = outcome['filepath'] or output['filepath']
+            with self.postprocess_done:
+                outcome['pending'] -= 1
+                if outcome['pending']:
+                    return
+            try:
+                if outcome['ok']:
+                    self.finish_entry(index, entry, result, outcome['filepath'], status)
+                else:
+                    self.add_failed_item(entry or result)
+                    self.tracker.finish_item(index)
+            finally:
+                with self.postprocess_done:
+                    self.postprocessing_items -= 1
+                    self.postprocess_done.notify_all()
+
+        with self.postprocess_done:
+            self.postprocessing_items += 1
+            self.postprocess_futures.extend(futures)
+        for future in futures:
+            future.add_done_callback(done)
+
+    def asset_base(self, ydl, info):
+        # The media path without its extension; subtitles and thumbnails are named after it
+        outtmpl = self.options['outtmpl']
+        if isinstance(outtmpl, dict):
+            # YoutubeDL expands a string template into a dict when it reads the options
+            outtmpl = outtmpl['default']
+        filename = ydl.prepare_filename(dict(info, ext='tmp'), outtmpl=outtmpl)
+        return os.path.splitext(filename)[0]
+
+    def fetch_side_assets(self, ydl, info):
+        # Queued on the side fetcher's own pool; the media download starts right away
+        if self.side_fetcher is None:
+            return
+        if info.get('_type', 'video') != 'video':
+            # A playlist given as a single URL; yt-dlp downloads its entries without them
+            self.on_log(f"WARNING: subtitles and thumbnails are skipped for {info.get('title') or self.url}; "
+                        "download it as a playlist to fetch them")
+            return
+        future = self.side_fetcher.submit(
+            info, self.asset_base(ydl, info), self.side_langs, self.side_thumbnail, self.settings.cookies_file,
+            self.settings.refresh_assets
+        )
+        self.side_futures.append(future)
+
+    def fetch_cached_assets(self, ydl, entry):
+        if self.side_fetcher is None or self.settings.refresh_assets or not entry.get('id') or not entry.get('title'):
+            return False
+        summary = self.side_fetcher.fetch_cached(
+            entry['id'], self.asset_base(ydl, entry), self.side_langs, self.side_thumbnail
+        )
+        if summary is None:
+            return False
+        self.record_side_assets(summary)
+        return True
+
+    def record_side_assets(self, summary):
+        for key in ('fetched', 'cached', 'existing'):
+            self.side_totals[key] += summary[key]
+        self.side_totals['failed'] += len(summary['failed'])
+        for failure in summary['failed']:
+            self.on_log(f"WARNING: could not fetch {failure}")
+        if summary['seconds']:
+            self.stage_stats.record('side_fetch', summary['seconds'])
+        if self.metrics is not None:
+            for key in ('fetched', 'cached'):
+                if summary[key]:
+                    self.metrics.increment(f"side_assets_{key}", summary[key], self.job_key)
+            if summary['failed']:
+                self.metrics.increment('side_assets_failed', len(summary['failed']), self.job_key)
+
+    def wait_for_side_assets(self):
+        pending = list(self.side_futures)
+        while pending:
+            if self.pause_requested or self.cancel_requested:
+                for future in pending:
+                    future.cancel()
+                break
+            done, pending = wait(pending, timeout=0.2)
+            for future in done:
+                if future.cancelled():
+                    continue
+                try:
+                    self.record_side_assets(future.result())
+                except Exception as e:
+                    self.side_totals['failed'] += 1
+                    self.on_log(f"WARNING: subtitle/thumbnail fetch failed: {e}")
+        totals = self.side_totals
+        if totals['fetched'] or totals['cached']:
+            self.on_log(
+                f"[side] Subtitles/thumbnails: {totals['fetched']} fetched, {totals['cached']} from the asset cache"
+                + (f", {totals['existing']} already present" if totals['existing'] else "")
+            )
+
+    def link_duplicate(self, index, entry, video_id, status=None, info=None):
+        # Checked before any download: another folder may hold this video in this format.
+        # info is the resolved video if the caller has it, else entry is resolved if needed
+        if self.media_store is None or not video_id:
+            return False
+        try:
+            linked = self.media_store.link_into(video_id, self.media_format(), self.playlist_folder or self.output_dir)
+        except OSError as e:
+            self.on_log(f"WARNING: could not reuse the stored copy of {video_id}: {e}")
+            return False
+        if linked is None:
+            return False
+        filepath, method = linked
+        self.on_log(f"[dedupe] {os.path.basename(filepath)}: {method} of an earlier download")
+        if self.metrics is not None:
+            self.metrics.increment('duplicates_linked', 1, self.job_key)
+        self.fetch_linked_assets(info or entry, video_id, filepath)
+        self.finish_entry(index, entry, {'id': video_id}, filepath, status or f"{os.path.basename(filepath)} (linked)")
+        return True
+
+    def fetch_linked_assets(self, item, video_id, filepath):
+        # A linked file skipped download_item, so its subtitles/thumbnail are
+        # queued here: from the asset cache if it has them all, else from the
+        # video's info (extracted now, unless cached) like any other item
+        if self.side_fetcher is None or item is None:
+            return
+        base = os.path.splitext(filepath)[0]
+        if not self.settings.refresh_assets:
+            summary = self.side_fetcher.fetch_cached(video_id, base, self.side_langs, self.side_thumbnail)
+            if summary is not None:
+                self.record_side_assets(summary)
+                return
+        options = dict(self.options, noplaylist=True, progress_hooks=[self.check_interrupt])
+        options.pop('playlist_items', None)
+        try:
+            with PipelinedYoutubeDL(options) as ydl:
+                info = self.resolve_entry(ydl, item)
+        except DownloadCancelled:
+            raise
+        except Exception as e:
+            self.on_log(f"WARNING: could not fetch subtitles/thumbnail for {video_id}: {e}")
+            self.side_totals['failed'] += 1
+            return
+        self.side_futures.append(self.side_fetcher.submit(
+            info, base, self.side_langs, self.side_thumbnail, self.settings.cookies_file, self.settings.refresh_assets
+        ))
+
+    def finish_entry(self, index, entry, result, filepath, status=None):
+        if entry is not None:
+            self.record_download(entry, result, filepath)
+        self.record_media(entry, result, filepath)
+        if self.metrics is not None:
+            self.metrics.increment('items_completed', 1, self.job_key)
+        self.tracker.finish_item(index, status)
+
+    def add_failed_item(self, entry):
+        self.failed_items.append(entry.get('title') or entry.get('id'))
+        if self.metrics is not None:
+            self.metrics.increment('items_failed', 1, self.job_key)
+
+    def wait_for_postprocessing(self):
+        with self.postprocess_done:
+            while self.postprocessing_items:
+                if self.pause_requested or self.cancel_requested:
+                    # Files that were not merged yet are merged when the job is resumed
+                    for future in self.postprocess_futures:
+                        future.cancel()
+                self.postprocess_done.wait(0.2)
+
+    def archive_format(self):
+        return f"{self.options.get('format')}|{self.options.get('merge_output_format') or ''}"
+
+    def media_format(self):
+        # A linked file is shared as is, without running postprocessors, so the
+        # media store key covers everything that changes the file's bytes
+        postprocessors = ",".join(sorted(
+            pp['key'] + "".join(f";{k}={v}" for k, v in sorted(pp.items()) if k not in MEDIA_KEY_IGNORED_ARGS)
+            for pp in self.options.get('postprocessors', [])
+        ))
+        return f"{self.archive_format()}|{postprocessors}|addmetadata={bool(self.options.get('addmetadata'))}"
+
+    @staticmethod
+    def entry_archive_id(entry):
+        # Flat entries from some extractors carry only a URL, not an id
+        if entry.get('id'):
+            return entry['id']
+        return normalize_url(entry['url']) if entry.get('url') else None
+
+    def in_archive(self, entry):
+        video_id = self.entry_archive_id(entry)
+        return bool(video_id) and self.download_archive.contains(
+            video_id, self.archive_format(), self.playlist_folder
+        )
+
+    @staticmethod
+    def final_filepath(result, filepath=None):
+        downloads = result.get('requested_downloads') or [{}]
+        return filepath or downloads[0].get('filepath') or result.get('filepath')
+
+    def record_download(self, entry, result, filepath=None):
+        if self.download_archive is None or not result:
+            return
+        video_id = self.entry_archive_id(entry) or result.get('id')
+        if not video_id:
+            return
+        self.download_archive.add(video_id, self.archive_format(), self.playlist_folder,
+                                  self.final_filepath(result, filepath))
+
+    def record_media(self, entry, result, filepath=None):
+        if self.media_store is None or not result or result.get('_type', 'video') != 'video':
+            return
+        # Keyed like the lookups: flat playlist entries by their own id
+        video_id = (self.entry_archive_id(entry) if entry is not None else None) or result.get('id')
+        filepath = self.final_filepath(result, filepath)
+        if video_id and filepath:
+            self.media_store.add(video_id, self.media_format(), filepath)
+
+    def check_interrupt(self, d=None):
+        if self.pause_requested:
+            raise JobPaused()
+        if self.cancel_requested:
+            raise JobCancelled()
+
+    def cancel(self):
+        self.cancel_requested = True
+
+    def pause(self):
+        self.pause_requested = True
@@ -0,0 +1,171 @@
+import time
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+PATTERN = bytes(range(256)) * 256  # 64 KB of synthetic media, repeated
+SEND_BLOCK = 16 * 1024
+
+
+def synthetic_bytes(start, end):
+    # Bytes start..end inclusive of the endless PATTERN stream, in send-sized blocks
+    pos = start
+    while pos <= end:
+        offset = pos % len(PATTERN)
+        block = PATTERN[offset:offset + min(SEND_BLOCK, end - pos + 1)]
+        yield block
+        pos += len(block)
+
+
+class FakeMediaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self.server.count_request()
+        parts = url.path.strip("/").split("/")
+        if parts[0] == "media":
+            return self.send_media(int(query.get("size", 2 * 1024 * 1024)), head)
+        if parts[0] == "playlist.xml":
+            return self.send_text(self.server.playlist_feed(int(query.get("count", 10)), int(query.get("size", 1024 * 1024))),
+                                  "application/rss+xml", head)
+        if parts[0] == "hls" and len(parts) == 2:
+            return self.send_text(self.server.hls_master(parts[1][:-len(".m3u8")], query), "application/vnd.apple.mpegurl", head)
+        if parts[0] == "hls" and len(parts) == 3:
+            return self.send_text(self.server.hls_variant(parts[1], parts[2][:-len(".m3u8")], query),
+                                  "application/vnd.apple.mpegurl", head)
+        if parts[0] == "hls" and len(parts) == 4:
+            return self.send_media(int(query.get("size", 256 * 1024)), head, content_type="video/mp2t")
+        self.send_error(404)
+
+    def send_text(self, text, content_type, head):
+        body = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def send_media(self, size, head, content_type="video/mp4"):
+        if self.server.latency:
+            # Before the status line, like a real server's think time; extractors see it too
+            time.sleep(self.server.latency)
+        start, end = 0, size - 1
+        range_header = self.headers.get("Range", "")
+        if range_header.startswith("bytes="):
+            first, _, last = range_header[len("bytes="):].partition("-")
+            start = int(first or 0)
+            end = min(int(last), size - 1) if last else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if head:
+            return
+        started = time.monotonic()
+        sent = 0
+        try:
+            for block in synthetic_bytes(start, end):
+                self.wfile.write(block)
+                sent += len(block)
+                if self.server.rate:
+                    # Per-connection throttle, like a server that caps each stream
+                    delay = sent / self.server.rate - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.server.count_bytes(sent)
+
+
+class FakeMediaServer(ThreadingHTTPServer):
+    """Local stand-in for a video site: ranged media files, an RSS playlist
+    and HLS manifests with two variants, all made of synthetic bytes.
+
+    rate throttles each connection (bytes/second, 0 = unlimited) and latency
+    delays the first byte of every media response.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, rate=0, latency=0.0):
+        super().__init__(("127.0.0.1", port), FakeMediaHandler)
+        self.rate = rate
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def count_bytes(self, sent):
+        with self.lock:
+            self.bytes_sent += sent
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes_sent = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def playlist_feed(self, count, size):
+        items = "".join(
+            f'<item><title>Item {i}</title><guid>item-{i}</guid>'
+            f'<enclosure url="{self.base_url}/media/item{i}.mp4?size={size}" type="video/mp4" length="{size}"/></item>'
+            for i in range(1, count + 1)
+        )
+        return (f'<?xml version="1.0"?><rss version="2.0"><channel><title>Benchmark Playlist</title>'
+                f'<link>{self.base_url}/</link><description>synthetic</description>{items}</channel></rss>')
+
+    def hls_master(self, name, query):
+        suffix = f"?segments={query.get('segments', 10)}&size={query.get('size', 256 * 1024)}"
+        return (
+            "#EXTM3U\n"
+            '#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,CODECS="avc1.4d401e,mp4a.40.2"\n'
+            f"{name}/low.m3u8{suffix}\n"
+            '#EXT-X-STREAM-INF:BANDWIDTH=2500000,RESOLUTION=1280x720,CODECS="avc1.64001f,mp4a.40.2"\n'
+            f"{name}/high.m3u8{suffix}\n"
+        )
+
+    def hls_variant(self, name, variant, query):
+        segments = int(query.get("segments", 10))
+        size = int(query.get("size", 256 * 1024))
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:4", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for i in range(segments):
+            lines += ["#EXTINF:4.0,", f"{self.base_url}/hls/{name}/{variant}/{i}.ts?size={size}"]
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,24 @@
+import os
+import tempfile
+
+
+def atomic_write(path, data):
+    """Write str (as UTF-8) or bytes to path through a temporary file in the same folder.
+
+    os.replace is atomic on both POSIX and Windows, so readers see either the
+    old file or the new one, never a partial write. The temporary file is
+    removed if anything fails, and the error is raised.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,277 @@
+from dataclasses import dataclass, field
+
+from yt_dlp.utils import determine_protocol, get_compatible_ext
+
+from progress_tracker import format_bytes
+from segmented_download import AcceleratedYoutubeDL
+
+
+# Rough compression efficiency: at the same resolution a higher value
+# needs fewer bytes for the same picture or sound
+VIDEO_CODEC_EFFICIENCY = {'av01': 4, 'vp09': 3, 'vp9': 3, 'hev1': 3, 'hvc1': 3, 'h265': 3, 'avc1': 2, 'h264': 2, 'vp8': 1}
+AUDIO_CODEC_EFFICIENCY = {'opus': 3, 'mp4a': 2, 'aac': 2, 'vorbis': 2, 'mp3': 1}
+
+# Codecs each output container takes without re-encoding
+VIDEO_CODECS_FOR = {
+    'mp4': ('avc1', 'h264', 'av01', 'hev1', 'hvc1', 'h265'),
+    'webm': ('vp09', 'vp9', 'vp8', 'av01'),
+}
+AUDIO_CODECS_FOR = {
+    'mp4': ('mp4a', 'aac', 'mp3'),
+    'webm': ('opus', 'vorbis'),
+    'm4a': ('mp4a', 'aac'),
+    'aac': ('mp4a', 'aac'),
+    'opus': ('opus',),
+    'mp3': ('mp3',),
+}
+
+
+def codec_family(codec):
+    if not codec or codec == 'none':
+        return None
+    return codec.split('.')[0].lower()
+
+
+def has_video(f):
+    return f.get('vcodec') != 'none'
+
+
+def has_audio(f):
+    return f.get('acodec') != 'none'
+
+
+def is_usable(f):
+    return (
+        not f.get('has_drm')
+        and f.get('ext') != 'mhtml'  # Storyboard images
+        and (f.get('url') or f.get('fragments') or f.get('manifest_url'))
+    )
+
+
+def codec_fits(codec, container, table):
+    allowed = table.get(container)
+    family = codec_family(codec)
+    # Unknown codecs (plain files) and unconstrained containers always fit
+    return allowed is None or family is None or family in allowed
+
+
+def estimated_size(f, duration=None):
+    size = f.get('filesize') or f.get('filesize_approx')
+    # Audio-only formats often carry only abr, video-only ones vbr
+    bitrate = f.get('tbr') or (f.get('vbr') or 0) + (f.get('abr') or 0)
+    if not size and bitrate and duration:
+        size = bitrate * 1000 / 8 * duration
+    return size or None
+
+
+def video_rank(f, max_height, container):
+    height = f.get('height') or 0
+    return (
+        height <= max_height,
+        height if height <= max_height else -height,  # Over the cap: the smallest overshoot first
+        codec_fits(f.get('vcodec'), container, VIDEO_CODECS_FOR),
+        VIDEO_CODEC_EFFICIENCY.get(codec_family(f.get('vcodec')), 0),
+        f.get('fps') or 0,
+        f.get('vbr') or f.get('tbr') or 0,
+    )
+
+
+def audio_rank(f, container):
+    return (
+        codec_fits(f.get('acodec'), container, AUDIO_CODECS_FOR),
+        f.get('language_preference') or 0,
+        AUDIO_CODEC_EFFICIENCY.get(codec_family(f.get('acodec')), 0),
+        f.get('abr') or f.get('tbr') or 0,
+    )
+
+
+def merged_format(video, audio, merge_output_format=None):
+    """The format dict yt-dlp's own 'video+audio' selector yields for a pair,
+    so a callable 'format' option gets them downloaded and merged as usual."""
+    preferences = merge_output_format.split('/') if merge_output_format else None
+    return {
+        'requested_formats': [video, audio],
+        'format': '+'.join(filter(None, (video.get('format'), audio.get('format')))),
+        'format_id': f"{video['format_id']}+{audio['format_id']}",
+        'ext': get_compatible_ext(vcodecs=[video.get('vcodec')], acodecs=[audio.get('acodec')],
+                                  vexts=[video['ext']], aexts=[audio['ext']], preferences=preferences),
+        'protocol': f"{determine_protocol(video)}+{determine_protocol(audio)}",
+        'filesize_approx': sum(filter(None, (estimated_size(video), estimated_size(audio)))) or None,
+        'tbr': (video.get('tbr') or video.get('vbr') or 0) + (audio.get('tbr') or audio.get('abr') or 0),
+        'width': video.get('width'),
+        'height': video.get('height'),
+        'fps': video.get('fps'),
+        'dynamic_range': video.get('dynamic_range'),
+        'vcodec': video.get('vcodec'),
+        'vbr': video.get('vbr'),
+        'acodec': audio.get('acodec'),
+        'abr': audio.get('abr'),
+        'asr': audio.get('asr'),
+        'audio_channels': audio.get('audio_channels'),
+    }
+
+
+@dataclass
+class FormatChoice:
+    """The formats picked for one video: a single format, or video + audio to merge.
+
+    over_cap is set when nothing at or below the quality cap could be used.
+    """
+    formats: list
+    notes: list = field(default_factory=list)
+    over_cap: bool = False
+
+    @property
+    def format_spec(self):
+        return '+'.join(f['format_id'] for f in self.formats)
+
+    def expected_size(self, duration=None):
+        sizes = [estimated_size(f, duration) for f in self.formats]
+        return sum(sizes) if all(sizes) else None
+
+    def describe(self, duration=None):
+        parts = []
+        for f in self.formats:
+            if has_video(f) and f.get('height'):
+                parts.append(f"{f['height']}p {codec_family(f.get('vcodec')) or f.get('ext')}")
+            elif has_video(f):
+                parts.append(f.get('ext') or f['format_id'])
+            else:
+                parts.append(f"audio {codec_family(f.get('acodec')) or f.get('ext')}")
+        text = f"{self.format_spec} ({' + '.join(parts)})"
+        size = self.expected_size(duration)
+        text += f", about {format_bytes(size)}" if size else ", size unknown"
+        if self.notes:
+            text += f"; {'; '.join(self.notes)}"
+        return text
+
+
+def choose_formats(formats, max_height=None, content_type="Video+Audio", output_format="best"):
+    """Pick the formats to download from an extracted formats list, in one pass.
+
+    Video is ranked by resolution (up to the quality cap), whether its codec
+    fits the output container without re-encoding, codec efficiency, frame
+    rate and bitrate; audio by container fit, language, codec efficiency and
+    bitrate. For Video+Audio a single muxed format wins when it is at least
+    as tall as the best video-only format and fits the container as well,
+    which saves a merge. A format over the cap is only taken when no
+    format of the wanted kind is at or below it. Returns None when nothing fits.
+    """
+    max_height = max_height or float('inf')
+    container = None if output_format in ('best', 'mkv') else output_format
+    formats = [f for f in formats if is_usable(f)]
+    video_only = [f for f in formats if has_video(f) and not has_audio(f)]
+    audio_only = [f for f in formats if has_audio(f) and not has_video(f)]
+    muxed = [f for f in formats if has_video(f) and has_audio(f)]
+
+    def best_video(candidates):
+        return max(candidates, key=lambda f: video_rank(f, max_height, container), default=None)
+
+    def best_audio(candidates, audio_container):
+        return max(candidates, key=lambda f: audio_rank(f, audio_container), default=None)
+
+    def over_cap(f):
+        return (f.get('height') or 0) > max_height
+
+    if content_type == "Audio Only":
+        audio = best_audio(audio_only, container)
+        if audio is None:
+            # Muxed formats only: take the one with the best audio
+            audio = best_audio(muxed, container)
+        if audio is None:
+            return None
+        notes = [] if codec_fits(audio.get('acodec'), container, AUDIO_CODECS_FOR) else [
+            f"no {output_format} audio, using {codec_family(audio.get('acodec')) or audio.get('ext')}"
+        ]
+        return FormatChoice([audio], notes)
+
+    if content_type == "Video Only":
+        # A muxed format within the cap beats a video-only one over it; at the
+        # same height video-only wins, as it doesn't carry unwanted audio
+        video = max(video_only + muxed, default=None, key=lambda f: (
+            video_rank(f, max_height, container)[:2], not has_audio(f), video_rank(f, max_height, container)[2:]
+        ))
+        if video is None:
+            return None
+        choice = FormatChoice([video])
+    else:
+        video = best_video(video_only)
+        single = best_video(muxed)
+        if video is not None and audio_only and (
+                single is None
+                or video_rank(video, max_height, container)[:3] > video_rank(single, max_height, container)[:3]):
+            # Match the audio to the container the video will be merged into
+            video_container = container or ('webm' if codec_family(video.get('vcodec')) in ('vp09', 'vp9', 'vp8') else 'mp4')
+            audio = best_audio(audio_only, video_container)
+            choice = FormatChoice([video, audio])
+        elif single is not None:
+            choice = FormatChoice([single])
+        elif audio_only:
+            return FormatChoice([best_audio(audio_only, container)], ["no video formats"])
+        else:
+            return None
+    if over_cap(choice.formats[0]):
+        choice.over_cap = True
+        choice.notes.append(f"nothing at or below {max_height}p")
+    return choice
+
+
+class FormatSelector:
+    """Callable 'format' option that ranks formats locally with choose_formats.
+
+    A video + audio choice is yielded as the merged format dict yt-dlp's own
+    selectors build (merged_format), so it is downloaded and merged as usual
+    by any YoutubeDL. RankedYoutubeDL binds a copy to each instance so the
+    choice is reported in its log. str() gives the equivalent selector
+    string, so download archive keys are the same as with get_format_string.
+    """
+
+    def __init__(self, max_height, content_type, output_format, legacy_spec, ydl=None):
+        self.max_height = max_height
+        self.content_type = content_type
+        self.output_format = output_format
+        self.legacy_spec = legacy_spec
+        self.ydl = ydl
+        self.duration = None  # Of the video being selected for, to estimate sizes
+
+    def bind(self, ydl):
+        return FormatSelector(self.max_height, self.content_type, self.output_format, self.legacy_spec, ydl)
+
+    def choose(self, formats):
+        return choose_formats(formats, self.max_height, self.content_type, self.output_format)
+
+    def __call__(self, ctx):
+        choice = self.choose(ctx['formats'])
+        if choice is None:
+            return
+        if self.ydl is not None:
+            self.ydl.to_screen(f"[format] Selected {choice.describe(self.duration)}")
+            if choice.over_cap:
+                self.ydl.report_warning(
+                    f"Nothing at or below {self.max_height}p can be used; downloading {choice.formats[0].get('height')}p"
+                )
+        if len(choice.formats) == 1:
+            yield choice.formats[0]
+        else:
+            merge_output_format = self.ydl.params.get('merge_output_format') if self.ydl is not None else None
+            yield merged_format(*choice.formats, merge_output_format)
+
+    def __str__(self):
+        return self.legacy_spec
+
+
+class RankedYoutubeDL(AcceleratedYoutubeDL):
+    """YoutubeDL that reports the choice of a FormatSelector 'format' option,
+    with its expected size, before any download starts."""
+
+    def __init__(self, params=None, auto_init=True):
+        super().__init__(params, auto_init)
+        if isinstance(self.format_selector, FormatSelector):
+            # The options (and the selector in them) are shared by every worker's instance
+            self.format_selector = self.format_selector.bind(self)
+
+    def process_video_result(self, info_dict, download=True):
+        # Sizes of formats without filesize are estimated from bitrate and duration
+        if isinstance(self.format_selector, FormatSelector):
+            self.format_selector.duration = info_dict.get('duration')
+        return super().process_video_result(info_dict, download)
@@ -0,0 +1,64 @@
+import os
+import logging
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+
+DEFAULT_LOG_DIR = os.path.join(os.path.expanduser("~"), ".cache", "youtube_downloader", "logs")
+DEFAULT_CAPACITY = 2000
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 3
+
+
+class LogBuffer:
+    """Fixed-size ring of pending log lines, drained in batches by the UI.
+
+    Worker threads only append to the deque, which never grows past
+    capacity; when the UI falls behind, the oldest unseen lines are dropped
+    from the buffer. Every line is also streamed to a rotating log file, so
+    the file always has the complete log.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, log_dir=DEFAULT_LOG_DIR,
+                 max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+        self.lines = deque(maxlen=capacity)
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.log_path = None
+        self.file_logger = None
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+            self.log_path = os.path.join(log_dir, "downloader.log")
+            handler = RotatingFileHandler(
+                self.log_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.file_logger = logging.getLogger(f"youtube_downloader.console.{id(self)}")
+            self.file_logger.propagate = False
+            self.file_logger.setLevel(logging.INFO)
+            self.file_logger.addHandler(handler)
+
+    def append(self, msg):
+        msg = msg.strip()
+        if not msg:
+            return
+        with self.lock:
+            if len(self.lines) == self.lines.maxlen:
+                self.dropped += 1
+            self.lines.append(msg)
+        if self.file_logger is not None:
+            self.file_logger.info(msg)
+
+    def drain(self):
+        with self.lock:
+            batch = list(self.lines)
+            self.lines.clear()
+            dropped, self.dropped = self.dropped, 0
+        return batch, dropped
+
+    def close(self):
+        if self.file_logger is not None:
+            for handler in list(self.file_logger.handlers):
+                handler.close()
+                self.file_logger.removeHandler(handler)
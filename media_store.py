@@ -0,0 +1,266 @@
+import os
+import time
+import errno
+import shutil
+import sqlite3
+import hashlib
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no reflinks, hardlinks and copies still work
+    fcntl = None
+
+
+DEFAULT_STORE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "youtube_downloader", "media.sqlite3")
+FICLONE = 0x40049409  # Linux ioctl for copy-on-write clones (btrfs, XFS)
+HASH_BLOCK_SIZE = 1024 * 1024
+HEAD_HASH_SIZE = 64 * 1024
+MIN_RECLAIM_SIZE = 1024 * 1024  # Smaller files aren't worth relinking
+PARTIAL_SUFFIXES = ('.part', '.ytdl', '.segments', '.tmp')
+
+
+def reflink(source, target):
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflinks are not supported here")
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(target)
+            raise
+
+
+def link_file(source, target):
+    """Make target share source's content; returns 'hardlink', 'reflink' or 'copy'.
+
+    Hardlinks need the same filesystem and reflinks a copy-on-write one;
+    anything else falls back to a plain copy, which still saves the download.
+    """
+    try:
+        os.link(source, target)
+        return 'hardlink'
+    except OSError:
+        pass
+    try:
+        reflink(source, target)
+        shutil.copystat(source, target)
+        return 'reflink'
+    except OSError:
+        pass
+    shutil.copy2(source, target)
+    return 'copy'
+
+
+class MediaStore:
+    """Global index of downloaded media keyed by (video id, format).
+
+    Every finished file is recorded here wherever it was written. A later
+    job that wants the same video in the same format, in any folder, gets a
+    link to one of the recorded copies instead of downloading it again.
+    Like DownloadArchive, the table is loaded into a dict once.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS media ("
+            " video_id TEXT NOT NULL,"
+            " format TEXT NOT NULL,"
+            " filepath TEXT NOT NULL,"
+            " size INTEGER,"
+            " added_at REAL,"
+            " PRIMARY KEY (video_id, format, filepath))"
+        )
+        self.conn.commit()
+        self.index = {}
+        for video_id, fmt, filepath, size in self.conn.execute(
+                "SELECT video_id, format, filepath, size FROM media ORDER BY added_at"):
+            self.index.setdefault((video_id, fmt), {})[filepath] = size
+
+    @staticmethod
+    def make_key(video_id, fmt):
+        return (str(video_id), str(fmt))
+
+    def find(self, video_id, fmt):
+        """Path of an intact recorded copy, or None. Missing or changed copies are forgotten."""
+        key = self.make_key(video_id, fmt)
+        with self.lock:
+            copies = list(self.index.get(key, {}).items())
+        for filepath, size in copies:
+            try:
+                if os.path.getsize(filepath) == size:
+                    return filepath
+            except OSError:
+                pass
+            self.remove(video_id, fmt, filepath)
+        return None
+
+    def add(self, video_id, fmt, filepath):
+        try:
+            size = os.path.getsize(filepath)
+        except OSError:
+            return
+        key = self.make_key(video_id, fmt)
+        filepath = os.path.abspath(filepath)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?)",
+                (*key, filepath, size, time.time())
+            )
+            self.conn.commit()
+            self.index.setdefault(key, {})[filepath] = size
+
+    def remove(self, video_id, fmt, filepath):
+        key = self.make_key(video_id, fmt)
+        with self.lock:
+            self.conn.execute(
+                "DELETE FROM media WHERE video_id = ? AND format = ? AND filepath = ?", (*key, filepath)
+            )
+            self.conn.commit()
+            copies = self.index.get(key, {})
+            copies.pop(filepath, None)
+            if not copies:
+                self.index.pop(key, None)
+
+    def link_into(self, video_id, fmt, target_dir):
+        """Fill target_dir with a recorded copy; returns (path, method) or None.
+
+        The file keeps the recorded copy's name. If target_dir already has a
+        file of that name, it is used as is (yt-dlp would skip it too).
+        """
+        source = self.find(video_id, fmt)
+        if source is None:
+            return None
+        target = os.path.join(target_dir, os.path.basename(source))
+        if os.path.exists(target):
+            method = 'existing'
+        else:
+            os.makedirs(target_dir, exist_ok=True)
+            method = link_file(source, target)
+        self.add(video_id, fmt, target)
+        return target, method
+
+    def prune(self):
+        """Forget copies that were deleted or changed; returns how many."""
+        with self.lock:
+            records = [
+                (key, filepath, size)
+                for key, copies in self.index.items()
+                for filepath, size in copies.items()
+            ]
+        pruned = 0
+        for (video_id, fmt), filepath, size in records:
+            try:
+                intact = os.path.getsize(filepath) == size
+            except OSError:
+                intact = False
+            if not intact:
+                self.remove(video_id, fmt, filepath)
+                pruned += 1
+        return pruned
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def file_digest(path, limit=None):
+    digest = hashlib.sha256()
+    remaining = limit
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            block = f.read(HASH_BLOCK_SIZE if remaining is None else min(HASH_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+def group_by(paths, key):
+    groups = {}
+    for path in paths:
+        try:
+            groups.setdefault(key(path), []).append(path)
+        except OSError:
+            pass
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def find_duplicates(roots, min_size=MIN_RECLAIM_SIZE):
+    """Groups of identical files under roots, oldest first in each group.
+
+    Files are grouped by size, then by a hash of their first block, and only
+    then hashed in full, so unique files are rarely read at all. Paths that
+    are already hardlinks of each other count once.
+    """
+    by_size = {}
+    seen_inodes = set()
+    for root in roots:
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                if name.endswith(PARTIAL_SUFFIXES):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path, follow_symlinks=False)
+                except OSError:
+                    continue
+                if not os.path.isfile(path) or os.path.islink(path) or stat.st_size < min_size:
+                    continue
+                inode = (stat.st_dev, stat.st_ino)
+                if inode in seen_inodes:
+                    continue
+                seen_inodes.add(inode)
+                by_size.setdefault(stat.st_size, []).append(path)
+
+    duplicates = []
+    for paths in by_size.values():
+        if len(paths) < 2:
+            continue
+        for candidates in group_by(paths, lambda path: file_digest(path, HEAD_HASH_SIZE)):
+            for group in group_by(candidates, file_digest):
+                duplicates.append(sorted(group, key=os.path.getmtime))
+    return duplicates
+
+
+def reclaim_space(roots, dry_run=False, min_size=MIN_RECLAIM_SIZE, on_log=None):
+    """Replace duplicate files under roots with hardlinks to one copy.
+
+    Each duplicate is swapped atomically (link to a temp name, then rename
+    over it), so a crash never leaves a file missing. Duplicates on another
+    filesystem than their group's first copy are left alone. Returns a
+    summary dict with the files relinked and bytes reclaimed.
+    """
+    on_log = on_log or (lambda msg: None)
+    relinked = 0
+    reclaimed = 0
+    for group in find_duplicates(roots, min_size):
+        keeper = group[0]
+        size = os.path.getsize(keeper)
+        for duplicate in group[1:]:
+            if dry_run:
+                on_log(f"Would link {duplicate} -> {keeper}")
+            else:
+                temp_path = f"{duplicate}.{os.getpid()}.tmp"
+                try:
+                    os.link(keeper, temp_path)
+                    os.replace(temp_path, duplicate)
+                except OSError as e:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    on_log(f"Skipped {duplicate}: {e}")
+                    continue
+                on_log(f"Linked {duplicate} -> {keeper}")
+            relinked += 1
+            reclaimed += size
+    return {'files_relinked': relinked, 'bytes_reclaimed': reclaimed, 'dry_run': dry_run}
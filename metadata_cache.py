@@ -0,0 +1,146 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlparse, parse_qs, urlencode
+
+from file_utils import atomic_write
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "youtube_downloader", "metadata")
+DEFAULT_TTL = 3600  # Stream URLs inside format lists expire after a few hours
+DEFAULT_MAX_ENTRIES = 500
+
+YOUTUBE_HOSTS = ('youtube.com', 'music.youtube.com', 'youtube-nocookie.com')
+VIDEO_ID_RE = re.compile(r'^[\w-]{11}$')
+VIDEO_PATH_RE = re.compile(r'^/(?:shorts|embed|live|v)/([\w-]{11})')
+
+
+def normalize_url(url, playlist=False):
+    """Map equivalent URLs (tracking params, short links, mobile hosts) to one cache key."""
+    url = url.strip()
+    if VIDEO_ID_RE.match(url):
+        return f"youtube:video:{url}"
+
+    parsed = urlparse(url if '://' in url else f"https://{url}")
+    host = parsed.netloc.lower()
+    for prefix in ('www.', 'm.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    query = parse_qs(parsed.query)
+
+    if host in YOUTUBE_HOSTS:
+        if playlist and 'list' in query:
+            return f"youtube:playlist:{query['list'][0]}"
+        if 'v' in query:
+            return f"youtube:video:{query['v'][0]}"
+        match = VIDEO_PATH_RE.match(parsed.path)
+        if match:
+            return f"youtube:video:{match.group(1)}"
+        if 'list' in query:
+            return f"youtube:playlist:{query['list'][0]}"
+    elif host == 'youtu.be':
+        video_id = parsed.path.strip('/')
+        if playlist and 'list' in query:
+            return f"youtube:playlist:{query['list'][0]}"
+        return f"youtube:video:{video_id}"
+
+    query = {k: v for k, v in query.items() if not k.startswith('utm_')}
+    return f"url:{host}{parsed.path.rstrip('/')}?{urlencode(sorted(query.items()), doseq=True)}"
+
+
+def cache_key(url, playlist=False, cookies_file=""):
+    """normalize_url scoped to the cookie file, since logged-in extraction
+    can see formats and private entries that an anonymous one can't.
+
+    The file's path is hashed rather than its contents: yt-dlp writes the
+    jar back on close, which would otherwise change the key after every run.
+    """
+    key = normalize_url(url, playlist)
+    if not cookies_file:
+        return key
+    path = os.path.normcase(os.path.abspath(os.path.expanduser(cookies_file)))
+    return f"{key}|cookies:{hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]}"
+
+
+def sanitize_info(info):
+    import yt_dlp  # Only needed once something was extracted, so not at window startup
+
+    # Private keys hold callables (e.g. __post_extractor) that can't be stored
+    info = {k: v for k, v in info.items() if not k.startswith('__')}
+    return yt_dlp.YoutubeDL.sanitize_info(info)
+
+
+class MetadataCache:
+    """On-disk cache of extract_info results with TTL expiry and LRU eviction.
+
+    Each entry is one JSON file; its mtime is bumped on every hit so the
+    least recently used files are the first to go once max_entries is exceeded.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path_for(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, key):
+        path = self.path_for(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if record.get('key') != key or time.time() - record.get('stored_at', 0) > self.ttl:
+            self.delete(key)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return record['info']
+
+    def set(self, key, info):
+        record = {'key': key, 'stored_at': time.time(), 'info': sanitize_info(info)}
+        atomic_write(self.path_for(key), json.dumps(record))
+        self.evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self.path_for(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        with self.lock:
+            try:
+                entries = [
+                    entry for entry in os.scandir(self.cache_dir)
+                    if entry.is_file() and entry.name.endswith('.json')
+                ]
+            except OSError:
+                return
+            excess = len(entries) - self.max_entries
+            if excess <= 0:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:excess]:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self.lock:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.json'):
+                    os.remove(entry.path)
@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from file_utils import atomic_write
+from progress_tracker import TransferCounter
+
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "youtube_downloader", "metrics.json")
+DEFAULT_SNAPSHOT_INTERVAL = 10.0
+MAX_FINISHED_JOBS = 100  # Finished jobs kept in snapshots; totals still count all of them
+LOG_LEVELS = (("ERROR:", "error"), ("WARNING:", "warning"))
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and timing summaries for a whole session.
+
+    Jobs report through the hooks returned by progress_hook() and
+    log_hook() and through the observe/increment calls DownloadJob makes.
+    Collectors registered with add_collector() are called at snapshot time
+    for values owned elsewhere, such as the queue depth.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.timings = {}
+        self.jobs = OrderedDict()
+        self.collectors = []
+        self.capacity = 1
+        self.busy_seconds = 0.0
+        self.active_jobs = 0
+        self.busy_since = time.monotonic()
+
+    def increment(self, name, amount=1, job_key=None):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+            if job_key is not None and job_key in self.jobs:
+                job = self.jobs[job_key]
+                job[name] = job.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def observe(self, name, seconds, job_key=None):
+        with self.lock:
+            summaries = [self.timings]
+            if job_key in self.jobs:
+                summaries.append(self.jobs[job_key].setdefault('stages', {}))
+            for timings in summaries:
+                stats = timings.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+                stats['count'] += 1
+                stats['total'] += seconds
+                stats['max'] = max(stats['max'], seconds)
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def set_capacity(self, workers):
+        with self.lock:
+            self.update_busy()
+            self.capacity = max(1, workers)
+
+    def update_busy(self):
+        # Caller holds self.lock; integrates running jobs over time for utilization
+        now = time.monotonic()
+        self.busy_seconds += self.active_jobs * (now - self.busy_since)
+        self.busy_since = now
+
+    def job_started(self, job_key, url):
+        with self.lock:
+            self.update_busy()
+            self.active_jobs += 1
+            self.jobs[job_key] = {'url': url, 'state': 'running', 'started': time.time()}
+            self.jobs.move_to_end(job_key)
+
+    def job_finished(self, job_key, state):
+        with self.lock:
+            self.update_busy()
+            self.active_jobs = max(0, self.active_jobs - 1)
+            self.counters[f"jobs_{state}"] = self.counters.get(f"jobs_{state}", 0) + 1
+            job = self.jobs.get(job_key)
+            if job is not None:
+                job['state'] = state
+                job['finished'] = time.time()
+                job['seconds'] = job['finished'] - job['started']
+            finished = [key for key, job in self.jobs.items() if job['state'] != 'running']
+            for key in finished[:-MAX_FINISHED_JOBS]:
+                del self.jobs[key]
+
+    def progress_hook(self, job_key):
+        counter = TransferCounter()
+
+        def hook(d):
+            if d['status'] not in ('downloading', 'finished'):
+                return
+            delta = counter.delta(d)
+            if delta > 0:
+                self.increment('bytes_transferred', delta, job_key)
+            if d['status'] == 'finished':
+                self.increment('files_downloaded', 1, job_key)
+        return hook
+
+    def log_hook(self, job_key, on_log):
+        # Wraps the log callback YTDLLogger writes to, counting warnings and errors
+        def hook(msg):
+            for prefix, level in LOG_LEVELS:
+                if msg.startswith(prefix):
+                    self.increment(f"log_{level}s", 1, job_key)
+                    break
+            on_log(msg)
+        return hook
+
+    def snapshot(self):
+        collected = {}
+        for collector in list(self.collectors):
+            try:
+                collected.update(collector())
+            except Exception:
+                pass
+        with self.lock:
+            self.update_busy()
+            uptime = time.time() - self.started
+            return {
+                'timestamp': time.time(),
+                'uptime_seconds': uptime,
+                'counters': dict(self.counters),
+                'gauges': {
+                    **self.gauges,
+                    **collected,
+                    'active_jobs': self.active_jobs,
+                    'worker_capacity': self.capacity,
+                    'worker_utilization': self.busy_seconds / (self.capacity * uptime) if uptime else 0.0,
+                },
+                'stages': {name: dict(stats) for name, stats in self.timings.items()},
+                'jobs': {str(key): dict(job) for key, job in self.jobs.items()},
+            }
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"ytdl_{name}_total {value}")
+        for name, value in sorted(snapshot['gauges'].items()):
+            if isinstance(value, (int, float)):
+                lines.append(f"ytdl_{name} {value}")
+        for stage, stats in sorted(snapshot['stages'].items()):
+            lines.append(f'ytdl_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+            lines.append(f'ytdl_stage_seconds_sum{{stage="{stage}"}} {stats["total"]:.6f}')
+            lines.append(f'ytdl_stage_seconds_max{{stage="{stage}"}} {stats["max"]:.6f}')
+        return "\n".join(lines) + "\n"
+
+
+def session_collector(download_queue=None, governor=None, postprocess_pool=None, side_fetcher=None):
+    """Collector for the services a session shares between its jobs."""
+    def collect():
+        gauges = {}
+        if download_queue is not None:
+            gauges['queue_depth'] = download_queue.pending_count()
+        if governor is not None:
+            throughput = governor.throughput()
+            gauges['throughput_bytes_per_sec'] = throughput['total']
+            gauges['requests_per_sec'] = throughput['requests_per_sec']
+            gauges['throttle_count'] = throughput['throttle_count']
+        if postprocess_pool is not None:
+            gauges['postprocess_in_flight'] = postprocess_pool.in_flight
+            gauges['postprocess_workers'] = postprocess_pool.max_workers
+        if side_fetcher is not None:
+            gauges['side_fetch_in_flight'] = side_fetcher.in_flight
+        return gauges
+    return collect
+
+
+class StartupTimer:
+    """Named marks along the startup path, in seconds since the timer was created.
+
+    Create it as early as possible (before the heavy imports) and pass it
+    along; record() copies the marks into a registry as startup_* gauges.
+    """
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.marks = OrderedDict()
+
+    def mark(self, name):
+        self.marks[name] = time.perf_counter() - self.started
+        return self.marks[name]
+
+    def since(self, name):
+        # Seconds between the mark before name and name itself
+        previous = 0.0
+        for mark, seconds in self.marks.items():
+            if mark == name:
+                return seconds - previous
+            previous = seconds
+        return None
+
+    def describe(self):
+        return ", ".join(f"{name.replace('_', ' ')} {self.since(name):.2f}s" for name in self.marks)
+
+    def record(self, registry):
+        for name, seconds in self.marks.items():
+            registry.set_gauge(f"startup_{name}_seconds", round(seconds, 4))
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        registry = self.server.registry
+        if self.path.rstrip("/") in ("", "/metrics.json"):
+            body = json.dumps(registry.snapshot(), indent=2).encode("utf-8")
+            content_type = "application/json"
+        elif self.path == "/metrics":
+            body = registry.to_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Serves /metrics (Prometheus text) and /metrics.json on localhost."""
+
+    daemon_threads = True
+
+    def __init__(self, registry, port, host="127.0.0.1"):
+        super().__init__((host, port), MetricsHandler)
+        self.registry = registry
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class SnapshotWriter:
+    """Writes registry snapshots to a JSON file every interval seconds."""
+
+    def __init__(self, registry, path=DEFAULT_SNAPSHOT_PATH, interval=DEFAULT_SNAPSHOT_INTERVAL):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            atomic_write(self.path, json.dumps(self.registry.snapshot(), indent=2))
+        except OSError:
+            pass
+
+    def close(self):
+        self.stopped.set()
+        self.write()
@@ -0,0 +1,190 @@
+import os
+import time
+import threading
+import multiprocessing
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+
+import yt_dlp
+from yt_dlp import postprocessor
+
+from format_ranking import RankedYoutubeDL
+
+
+# Options that hold callables or locks from the parent process, or that would make
+# the worker defer its own post-processing again
+PARENT_ONLY_OPTIONS = ('progress_hooks', 'postprocessor_hooks', 'post_hooks', 'logger', 'defer_postprocessing',
+                       'bandwidth_governor')
+
+# Stage names for yt-dlp postprocessor keys, so merge and embed time show up separately
+POSTPROCESSOR_STAGES = {
+    'Merger': 'merge',
+    'EmbedThumbnail': 'embed',
+    'FFmpegEmbedSubtitle': 'embed',
+    'FFmpegMetadata': 'metadata',
+    'FFmpegExtractAudio': 'extract_audio',
+    'FFmpegVideoConvertor': 'convert',
+    'FFmpegVideoRemuxer': 'convert',
+    'MoveFiles': 'move',
+}
+
+
+def postprocessor_stage(pp_key):
+    if pp_key.startswith('FFmpegFixup'):
+        return 'fixup'
+    return POSTPROCESSOR_STAGES.get(pp_key, pp_key.lower())
+
+
+class PostprocessorTimer:
+    """postprocessor_hooks entry that times each postprocessor run and
+    passes (stage, seconds) to record."""
+
+    def __init__(self, record):
+        self.record = record
+        self.started = {}
+
+    def __call__(self, d):
+        # One YoutubeDL per worker thread, but the hook list is shared between them
+        key = (threading.get_ident(), d.get('postprocessor'))
+        if d['status'] == 'started':
+            self.started[key] = time.monotonic()
+        elif d['status'] == 'finished' and key in self.started:
+            self.record(postprocessor_stage(key[1] or ''), time.monotonic() - self.started.pop(key))
+
+
+@dataclass
+class PostProcessTask:
+    """One downloaded file's deferred post_process() call, in a picklable form."""
+    filename: str
+    info: dict
+    files_to_move: dict = field(default_factory=dict)
+    postprocessors: list = field(default_factory=list)  # Class names of yt-dlp's per-file PPs (merger, fixups)
+    submitted_at: float = 0.0
+
+
+def run_postprocessing(options, task):
+    # Runs in a pool process: rebuild the YoutubeDL (and with it the
+    # configured postprocessors) from plain options, then finish the file
+    from downloader_core import YTDLLogger
+
+    started_at = time.time()
+    lines = []
+    stages = []
+    timer = PostprocessorTimer(lambda stage, seconds: stages.append((stage, seconds)))
+    with yt_dlp.YoutubeDL(dict(options, logger=YTDLLogger(lines.append), postprocessor_hooks=[timer])) as ydl:
+        info = dict(task.info)
+        info['__postprocessors'] = [getattr(postprocessor, name)(ydl) for name in task.postprocessors]
+        info = ydl.post_process(task.filename, info, task.files_to_move)
+    return {
+        'filepath': info.get('filepath'),
+        'log': lines,
+        'stages': stages,
+        'started_at': started_at,
+        'seconds': time.time() - started_at,
+    }
+
+
+def worker_options(options):
+    return {k: v for k, v in options.items() if k not in PARENT_ONLY_OPTIONS}
+
+
+class PipelinedYoutubeDL(RankedYoutubeDL):
+    """YoutubeDL that can hand post-processing off instead of running it inline.
+
+    With the defer_postprocessing option set, a downloaded file that needs
+    ffmpeg work (format merging, fixups, embedding, tagging) is recorded in
+    deferred_postprocessing and process_info() returns right away, leaving
+    the file where it was downloaded. Files without any such work are
+    finished inline as usual.
+    """
+
+    def __init__(self, params=None, auto_init=True):
+        super().__init__(params, auto_init)
+        self.deferred_postprocessing = []
+
+    def post_process(self, filename, info, files_to_move=None):
+        file_pps = info.get('__postprocessors') or []
+        if not self.params.get('defer_postprocessing') or not (file_pps or self._pps['post_process']):
+            return super().post_process(filename, info, files_to_move)
+
+        self.deferred_postprocessing.append(PostProcessTask(
+            filename=filename,
+            # Callables and other unpicklable values may sit at any depth (e.g. in
+            # requested_formats); sanitize_info turns them into plain JSON types
+            info=self.sanitize_info({k: v for k, v in info.items() if k != '__postprocessors'}),
+            files_to_move=dict(files_to_move or {}),
+            postprocessors=[type(pp).__name__ for pp in file_pps],
+        ))
+        info['filepath'] = filename
+        return info
+
+
+class PostProcessPool:
+    """Process pool shared by all jobs for CPU-bound post-processing.
+
+    Sized to the CPU count by default. Worker processes are spawned (not
+    forked, since the parent runs download threads) on the first submit.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = None
+        self.lock = threading.Lock()
+        self.in_flight = 0  # Submitted tasks not finished yet, queued or running
+
+    def submit(self, options, task):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            task.submitted_at = time.time()
+            future = self.executor.submit(run_postprocessing, worker_options(options), task)
+            self.in_flight += 1
+        future.add_done_callback(self.task_done)
+        return future
+
+    def task_done(self, future):
+        with self.lock:
+            self.in_flight -= 1
+
+    def close(self, wait=True):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class StageStats:
+    """Per-stage timing totals for one job, safe to record from any thread.
+
+    on_record, if given, is called with every (stage, seconds) as well.
+    """
+
+    def __init__(self, on_record=None):
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.on_record = on_record
+
+    def record(self, stage, seconds):
+        with self.lock:
+            stats = self.stages.setdefault(stage, {'count': 0, 'total': 0.0, 'max': 0.0})
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+        if self.on_record is not None:
+            self.on_record(stage, seconds)
+
+    def summary(self):
+        with self.lock:
+            return {
+                stage: dict(stats, mean=stats['total'] / stats['count'])
+                for stage, stats in self.stages.items()
+            }
+
+    def describe(self):
+        parts = [
+            f"{stage} {stats['count']}x {stats['total']:.1f}s (max {stats['max']:.1f}s)"
+            for stage, stats in self.summary().items()
+        ]
+        return "Stage timing: " + ", ".join(parts) if parts else ""
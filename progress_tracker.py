@@ -0,0 +1,173 @@
+import os
+import time
+import threading
+
+
+DEFAULT_PROGRESS_INTERVAL = 0.2  # Seconds between reports, i.e. at most 5 updates per second
+
+
+def format_bytes(num_bytes):
+    num_bytes = float(num_bytes or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def describe_progress(snapshot):
+    text = format_bytes(snapshot['downloaded_bytes'])
+    if snapshot['total_bytes']:
+        text += f" / {format_bytes(snapshot['total_bytes'])}"
+    if snapshot['speed']:
+        text += f" at {format_bytes(snapshot['speed'])}/s"
+    if snapshot['eta'] is not None:
+        text += f", ETA {format_eta(snapshot['eta'])}"
+    if snapshot.get('speedup'):
+        text += f" (x{snapshot['speedup']:.1f} over {snapshot['connections']} connections)"
+    return text
+
+
+class ProgressTracker:
+    """Merges yt-dlp progress callbacks from any number of items into one rate-limited report.
+
+    yt-dlp calls progress hooks for every chunk it writes. The tracker only
+    records the latest state per item and calls on_update at most once per
+    interval, except for item completion, which is always reported.
+    """
+
+    def __init__(self, on_update, interval=DEFAULT_PROGRESS_INTERVAL, total_items=1, playlist=False):
+        self.on_update = on_update
+        self.interval = interval
+        self.total_items = total_items
+        self.total_final = True
+        self.playlist = playlist
+        self.items = {}
+        self.completed_items = 0
+        self.completed_bytes = 0
+        self.last_report = 0.0
+        self.last_status = ""
+        self.lock = threading.Lock()
+
+    def set_total(self, total_items, final=True):
+        # A playlist that is still being listed shows its total as "N+"
+        with self.lock:
+            self.total_items = total_items
+            self.total_final = final
+
+    def hook(self, key, d):
+        status = d['status']
+        if status not in ('downloading', 'finished'):
+            return
+        filename = os.path.basename(d.get('filename', ''))
+        with self.lock:
+            # Merged formats download several files per item; track each one
+            stats = self.items.setdefault(key, {}).setdefault(filename, {})
+            if status == 'downloading':
+                stats.update(
+                    downloaded=d.get('downloaded_bytes') or 0,
+                    total=d.get('total_bytes') or d.get('total_bytes_estimate') or 0,
+                    speed=d.get('speed') or 0,
+                    eta=d.get('eta'),
+                    connections=d.get('connections') or 1,
+                    speedup=d.get('speedup'),
+                )
+                self.last_status = filename
+                now = time.monotonic()
+                if now - self.last_report < self.interval:
+                    return
+            else:
+                downloaded = stats.get('total') or d.get('downloaded_bytes') or d.get('total_bytes') or 0
+                stats.update(downloaded=downloaded, total=downloaded, speed=0, eta=None, speedup=None)
+                self.last_status = filename if self.playlist else "Download complete"
+                now = time.monotonic()
+            self.last_report = now
+            snapshot = self.snapshot()
+        self.on_update(snapshot)
+
+    def finish_item(self, key, status=None):
+        with self.lock:
+            files = self.items.pop(key, {})
+            self.completed_items += 1
+            self.completed_bytes += sum(stats.get('downloaded', 0) for stats in files.values())
+            if status:
+                self.last_status = status
+            self.last_report = time.monotonic()
+            snapshot = self.snapshot()
+        self.on_update(snapshot)
+
+    def snapshot(self):
+        # Caller holds self.lock
+        in_flight = 0.0
+        downloaded = self.completed_bytes
+        total = self.completed_bytes
+        speed = 0
+        eta = None
+        connections = 0
+        speedups = []
+        for files in self.items.values():
+            item_downloaded = sum(stats.get('downloaded', 0) for stats in files.values())
+            item_total = sum(stats.get('total', 0) for stats in files.values())
+            downloaded += item_downloaded
+            total += item_total
+            if item_total:
+                in_flight += min(item_downloaded / item_total, 1.0)
+            for stats in files.values():
+                speed += stats.get('speed', 0)
+                if stats.get('eta') is not None:
+                    eta = max(eta or 0, stats['eta'])
+                if stats.get('speedup'):
+                    connections += stats.get('connections', 1)
+                    speedups.append(stats['speedup'])
+
+        percent = 0
+        if self.total_items:
+            percent = int((self.completed_items + in_flight) * 100 / self.total_items)
+        status = self.last_status
+        if self.playlist:
+            status = f"[{self.completed_items}/{self.total_items}{'' if self.total_final else '+'}] {status}"
+
+        return {
+            'percent': min(percent, 100 if self.total_final else 99),
+            'status': status,
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'speed': speed,
+            'eta': eta,
+            'completed_items': self.completed_items,
+            'total_items': self.total_items,
+            'total_final': self.total_final,
+            'active_items': len(self.items),
+            # Measured against each segmented download's own single-connection baseline
+            'connections': connections,
+            'speedup': sum(speedups) / len(speedups) if speedups else None,
+        }
+
+
+class TransferCounter:
+    """Bytes each yt-dlp progress report adds over the previous one for the same file.
+
+    Used by the hooks that meter transfers (the bandwidth governor, the
+    metrics). The first report for a file is the baseline, so bytes a resumed
+    download already had aren't counted.
+    """
+
+    def __init__(self):
+        self.last_bytes = {}
+
+    def delta(self, d):
+        filename = d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        if d['status'] == 'finished':
+            return downloaded - self.last_bytes.pop(filename, downloaded)
+        previous = self.last_bytes.get(filename, downloaded)
+        self.last_bytes[filename] = downloaded
+        return downloaded - previous
@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+from yt_dlp.utils import ContentTooShortError, DownloadError, determine_protocol, parse_http_range
+from yt_dlp.utils.networking import HTTPHeaderDict
+
+from bandwidth_governor import GovernedYoutubeDL
+
+
+DEFAULT_CONNECTIONS = 4
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+READ_BLOCK_SIZE = 64 * 1024
+CHUNK_RETRIES = 3
+REPORT_INTERVAL = 0.2
+
+
+class SegmentedHttpFD(HttpFD):
+    """Downloads a progressive HTTP format as byte ranges over several connections.
+
+    The first chunk is fetched on a single connection to measure a baseline
+    speed, then the remaining chunks are spread over the connection pool.
+    Finished chunk indices are saved next to the .part file, so a paused or
+    interrupted download only refetches unfinished chunks. Progress hooks
+    run on the calling thread only, so a cancel raised from a hook stops
+    every connection. With a bandwidth_governor option, each connection
+    draws from the shared byte budget as it reads.
+
+    Servers that ignore Range requests, and files too small to split, go
+    through the regular HttpFD.
+    """
+
+    FD_NAME = 'segmented'
+
+    def real_download(self, filename, info_dict):
+        connections = self.params.get('segmented_connections') or DEFAULT_CONNECTIONS
+        chunk_size = self.params.get('segmented_chunk_size') or DEFAULT_CHUNK_SIZE
+        headers = HTTPHeaderDict({'Accept-Encoding': 'identity'}, info_dict.get('http_headers'))
+        if connections < 2 or 'Range' in headers or info_dict.get('request_data'):
+            return super().real_download(filename, info_dict)
+
+        url = info_dict['url']
+        total_bytes = self.probe_size(url, headers)
+        if not total_bytes or total_bytes < 2 * chunk_size:
+            return super().real_download(filename, info_dict)
+
+        tmpfilename = self.temp_name(filename)
+        state_path = tmpfilename + '.segments'
+        chunks = [
+            (index, start, min(start + chunk_size, total_bytes) - 1)
+            for index, start in enumerate(range(0, total_bytes, chunk_size))
+        ]
+        done = self.load_state(state_path, tmpfilename, total_bytes, chunks)
+        if not os.path.exists(tmpfilename):
+            open(tmpfilename, 'wb').close()
+
+        governor = self.params.get('bandwidth_governor')
+        self.report_destination(filename)
+        if done:
+            self.to_screen(f'[download] Resuming segmented download, {len(done)}/{len(chunks)} chunks on disk')
+
+        self.ctx = {
+            'lock': threading.Lock(),
+            'stop': threading.Event(),
+            'downloaded': sum(end - start + 1 for index, start, end in chunks if index in done),
+            'session_bytes': 0,
+            'start_time': time.time(),
+            'baseline_speed': None,
+        }
+        pending = [chunk for chunk in chunks if chunk[0] not in done]
+
+        def report(status='downloading'):
+            with self.ctx['lock']:
+                downloaded = self.ctx['downloaded']
+                session_bytes = self.ctx['session_bytes']
+            now = time.time()
+            speed = self.calc_speed(self.ctx['start_time'], now, session_bytes)
+            baseline = self.ctx['baseline_speed']
+            self._hook_progress({
+                'status': status,
+                'filename': filename,
+                'tmpfilename': tmpfilename,
+                'downloaded_bytes': downloaded,
+                'total_bytes': total_bytes,
+                'elapsed': now - self.ctx['start_time'],
+                'speed': speed,
+                'eta': self.calc_eta(speed, total_bytes - downloaded),
+                'connections': connections,
+                'speedup': speed / baseline if speed and baseline else None,
+                'governed': governor is not None,
+            }, info_dict)
+
+        def chunk_done(chunk):
+            done.add(chunk[0])
+            self.save_state(state_path, total_bytes, done)
+
+        try:
+            if pending:
+                # Baseline: one chunk over one connection
+                first = pending.pop(0)
+                chunk_start = time.time()
+                self.run_chunks([first], 1, url, headers, tmpfilename, report, chunk_done)
+                self.ctx['baseline_speed'] = self.calc_speed(chunk_start, time.time(), first[2] - first[1] + 1)
+            if pending:
+                self.run_chunks(pending, connections, url, headers, tmpfilename, report, chunk_done)
+        finally:
+            self.ctx['stop'].set()
+
+        self.try_rename(tmpfilename, filename)
+        try:
+            os.remove(state_path)
+        except OSError:
+            pass
+        with self.ctx['lock']:
+            self.ctx['downloaded'] = total_bytes
+        report('finished')
+        return True
+
+    def run_chunks(self, chunks, connections, url, headers, tmpfilename, report, chunk_done):
+        pool = ThreadPoolExecutor(max_workers=connections)
+        remaining = set()
+        try:
+            futures = {
+                pool.submit(self.fetch_chunk, url, headers, tmpfilename, start, end): (index, start, end)
+                for index, start, end in chunks
+            }
+            remaining = set(futures)
+            last_report = 0
+            while remaining:
+                completed, remaining = wait(remaining, timeout=REPORT_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    future.result()
+                    chunk_done(futures[future])
+                if time.time() - last_report >= REPORT_INTERVAL:
+                    # Hooks may raise (cancel/pause); that unwinds through the finally below
+                    report()
+                    last_report = time.time()
+        finally:
+            if remaining:
+                self.ctx['stop'].set()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def fetch_chunk(self, url, headers, tmpfilename, start, end):
+        governor = self.params.get('bandwidth_governor')
+        expected = end - start + 1
+        # Returns without raising when stopped; run_chunks only counts futures it
+        # collected before the stop, so a partial chunk is never marked done
+        for attempt in range(CHUNK_RETRIES):
+            written = 0
+            try:
+                request = Request(url, headers=HTTPHeaderDict(headers, {'Range': f'bytes={start}-{end}'}))
+                with self.ydl.urlopen(request) as response, open(tmpfilename, 'r+b') as f:
+                    if response.status != 206:
+                        raise DownloadError(f'Server ignored the range request (HTTP {response.status})')
+                    f.seek(start)
+                    while written < expected:
+                        if self.ctx['stop'].is_set():
+                            return
+                        block = response.read(min(READ_BLOCK_SIZE, expected - written))
+                        if not block:
+                            break
+                        if governor is not None:
+                            governor.acquire_bytes(len(block))
+                        f.write(block)
+                        written += len(block)
+                        with self.ctx['lock']:
+                            self.ctx['downloaded'] += len(block)
+                            self.ctx['session_bytes'] += len(block)
+                if written == expected:
+                    return
+                raise ContentTooShortError(written, expected)
+            except Exception:
+                # Undo this attempt's byte count; the chunk is fetched again from its start
+                with self.ctx['lock']:
+                    self.ctx['downloaded'] -= written
+                    self.ctx['session_bytes'] -= written
+                if attempt == CHUNK_RETRIES - 1 or self.ctx['stop'].is_set():
+                    raise
+
+    def probe_size(self, url, headers):
+        try:
+            request = Request(url, headers=HTTPHeaderDict(headers, {'Range': 'bytes=0-0'}))
+            with self.ydl.urlopen(request) as response:
+                if response.status != 206:
+                    return None
+                _, _, total = parse_http_range(response.headers.get('Content-Range'))
+                return total
+        except Exception as e:
+            self.report_warning(f'Range probe failed, using a single connection: {e}')
+            return None
+
+    def load_state(self, state_path, tmpfilename, total_bytes, chunks):
+        if not self.params.get('continuedl', True) or not os.path.exists(tmpfilename):
+            return set()
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('total_bytes') == total_bytes:
+                return set(state.get('done', []))
+        except (OSError, ValueError):
+            pass
+        # A .part left by the single-connection downloader is a contiguous prefix
+        prefix = os.path.getsize(tmpfilename)
+        return {index for index, start, end in chunks if end < prefix}
+
+    @staticmethod
+    def save_state(state_path, total_bytes, done):
+        temp_path = state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'total_bytes': total_bytes, 'done': sorted(done)}, f)
+        os.replace(temp_path, state_path)
+
+
+class AcceleratedYoutubeDL(GovernedYoutubeDL):
+    """YoutubeDL that routes plain HTTP(S) formats through SegmentedHttpFD
+    when the segmented_connections option is above one.
+
+    Everything else, such as DASH/HLS fragments (parallelised with
+    concurrent_fragment_downloads), subtitles and stdout, goes through
+    yt-dlp's own downloader selection.
+    """
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if (self.params.get('segmented_connections') or 1) < 2:
+            return super().dl(name, info, subtitle, test)
+        if subtitle or test or name == '-' or not info.get('url'):
+            return super().dl(name, info, subtitle, test)
+        if determine_protocol(info) not in ('http', 'https'):
+            return super().dl(name, info, subtitle, test)
+
+        fd = SegmentedHttpFD(self, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        new_info = self._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info, subtitle)
+
+
+def accelerated_options(connections, chunk_size):
+    return {
+        'segmented_connections': connections,
+        'segmented_chunk_size': chunk_size,
+        # DASH/HLS formats: fetch fragments in parallel too
+        'concurrent_fragment_downloads': connections,
+    }
@@ -0,0 +1,356 @@
+import os
+import re
+import json
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from yt_dlp.networking import Request
+from yt_dlp.utils import determine_ext, orderedSet_from_options
+
+from bandwidth_governor import GovernedYoutubeDL
+from file_utils import atomic_write
+
+
+DEFAULT_ASSET_DIR = os.path.join(os.path.expanduser("~"), ".cache", "youtube_downloader", "assets")
+DEFAULT_MAX_AGE = 7 * 24 * 3600  # Captions get corrected and thumbnails replaced, if rarely
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+EVICT_TARGET = 0.9  # Eviction frees space down to this share of max_bytes
+DEFAULT_FETCHERS = 4
+SUBTITLE_FORMATS = ('vtt', 'srt', 'ass')  # Preferred in this order, else the extractor's last (best) one
+MANIFEST_NAME = "manifest.json"
+
+
+def split_langs(text):
+    """Language patterns from a comma or space separated string; empty means all languages."""
+    patterns = [part for part in re.split(r'[\s,]+', text or '') if part]
+    return patterns or ['all']
+
+
+def is_fetchable(fmt):
+    # Live chat replays and other fragment-only formats need a real downloader
+    return 'data' in fmt or (fmt.get('url') and fmt.get('protocol', 'https') in ('http', 'https'))
+
+
+def available_subtitles(info):
+    """Fetchable subtitle formats by language; manual subtitles win over
+    automatic captions in the same language, as in yt-dlp."""
+    subtitles = dict(info.get('automatic_captions') or {})
+    subtitles.update(info.get('subtitles') or {})
+    available = {}
+    for lang, formats in subtitles.items():
+        formats = [f for f in formats or [] if is_fetchable(f)]
+        if formats:
+            available[lang] = formats
+    return available
+
+
+def select_languages(languages, patterns):
+    """The languages matching yt-dlp style patterns ('en.*', 'all', '-live_chat'), in order."""
+    return list(orderedSet_from_options(patterns, {'all': list(languages)}, use_regex=True))
+
+
+def pick_subtitle_format(formats):
+    for ext in SUBTITLE_FORMATS:
+        matches = [f for f in formats if f.get('ext') == ext]
+        if matches:
+            return matches[-1]
+    return formats[-1]
+
+
+def best_thumbnail(info):
+    thumbnails = [t for t in info.get('thumbnails') or [] if t.get('url')]
+    if not thumbnails:
+        return {'url': info['thumbnail']} if info.get('thumbnail') else None
+    return max(thumbnails, key=lambda t: (t.get('preference') or 0, t.get('width') or 0, t.get('height') or 0))
+
+
+def safe_key(video_id):
+    return re.sub(r'[^\w.-]', '_', str(video_id))
+
+
+class AssetCache:
+    """Subtitles and thumbnails already fetched, one folder per video ID.
+
+    Next to the files, each folder has a manifest of the subtitle languages
+    the video offered, so a later request can be matched against the
+    language filter without extracting the video again.
+
+    Files (and manifests) older than max_age count as missing, so they are
+    fetched again. Each hit bumps the folder's mtime, and once the cache
+    holds more than max_bytes the least recently used folders are removed.
+    """
+
+    def __init__(self, path=DEFAULT_ASSET_DIR, max_age=DEFAULT_MAX_AGE, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.size_lock = threading.Lock()
+        self.total_bytes = None  # Counted on the first write, then kept up to date
+        os.makedirs(path, exist_ok=True)
+
+    def folder(self, video_id):
+        return os.path.join(self.path, safe_key(video_id))
+
+    def is_fresh(self, path):
+        try:
+            return time.time() - os.path.getmtime(path) <= self.max_age
+        except OSError:
+            return False
+
+    def manifest(self, video_id):
+        path = os.path.join(self.folder(video_id), MANIFEST_NAME)
+        if not self.is_fresh(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def update_manifest(self, video_id, languages, subtitles, thumbnail=False):
+        """Merge what one fetch learned into the manifest; thumbnail=False leaves it unchanged."""
+        with self.lock:
+            manifest = self.manifest(video_id) or {'subtitles': {}}
+            manifest['languages'] = list(languages)
+            manifest['subtitles'].update(subtitles)
+            if thumbnail is not False:
+                manifest['thumbnail'] = thumbnail
+            manifest['updated'] = time.time()
+            self.write(video_id, MANIFEST_NAME, json.dumps(manifest).encode("utf-8"))
+
+    def path_of(self, video_id, name):
+        path = os.path.join(self.folder(video_id), name)
+        if not os.path.isfile(path) or not self.is_fresh(path):
+            return None
+        try:
+            os.utime(self.folder(video_id))
+        except OSError:
+            pass
+        return path
+
+    def write(self, video_id, name, data):
+        # Atomic, so a concurrent reader never copies a half-written file
+        folder = self.folder(video_id)
+        os.makedirs(folder, exist_ok=True)
+        atomic_write(os.path.join(folder, name), data)
+        self.account(len(data))
+        return os.path.join(folder, name)
+
+    def account(self, written):
+        with self.size_lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(size for _, size, _ in self.folders())
+            else:
+                self.total_bytes += written
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def folders(self):
+        # (last used, bytes, path) for each video folder
+        folders = []
+        try:
+            entries = [entry for entry in os.scandir(self.path) if entry.is_dir()]
+        except OSError:
+            return folders
+        for entry in entries:
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                folders.append((entry.stat().st_mtime, size, entry.path))
+            except OSError:
+                pass
+        return folders
+
+    def evict(self):
+        # Caller holds self.size_lock; other processes may have written too, so recount first
+        folders = sorted(self.folders())
+        total = sum(size for _, size, _ in folders)
+        for _, size, path in folders:
+            if total <= self.max_bytes * EVICT_TARGET:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+        self.total_bytes = total
+
+    def clear(self):
+        with self.size_lock:
+            for _, _, path in self.folders():
+                shutil.rmtree(path, ignore_errors=True)
+            self.total_bytes = 0
+
+
+class SideFetcher:
+    """Fetches subtitles and thumbnails on a small thread pool of its own.
+
+    Shared by all jobs, like PostProcessPool. A job submits each video's
+    info as soon as it is extracted and the media download goes ahead
+    without waiting for these small requests. Every file is kept in the
+    AssetCache, so fetching the same video's subtitles again (for another
+    folder, or a refresh of a whole playlist) makes no requests at all.
+    Requests go through the governor like the media downloads. With
+    refresh, cached and already placed files are fetched again.
+    """
+
+    def __init__(self, cache=None, max_workers=DEFAULT_FETCHERS, governor=None):
+        self.cache = cache if cache is not None else AssetCache()
+        self.max_workers = max(1, max_workers)
+        self.governor = governor
+        self.executor = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.instances = []
+        self.in_flight = 0
+
+    def submit(self, info, base, langs=None, thumbnail=False, cookies_file="", refresh=False):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="side-fetch")
+            future = self.executor.submit(self.fetch, info, base, langs, thumbnail, cookies_file, refresh)
+            self.in_flight += 1
+        future.add_done_callback(self.task_done)
+        return future
+
+    def task_done(self, future):
+        with self.lock:
+            self.in_flight -= 1
+
+    def ydl(self, cookies_file):
+        # YoutubeDL isn't thread-safe: one instance per fetch thread and cookie file
+        instances = getattr(self.local, 'instances', None)
+        if instances is None:
+            instances = self.local.instances = {}
+        ydl = instances.get(cookies_file)
+        if ydl is None:
+            options = {'quiet': True, 'no_warnings': True, 'cookiefile': cookies_file or None}
+            if self.governor is not None:
+                options['bandwidth_governor'] = self.governor
+            ydl = instances[cookies_file] = GovernedYoutubeDL(options)
+            with self.lock:
+                self.instances.append(ydl)
+        return ydl
+
+    def download(self, fmt, info, cookies_file):
+        if 'data' in fmt:
+            return fmt['data'].encode("utf-8")
+        headers = fmt.get('http_headers') or info.get('http_headers') or {}
+        with self.ydl(cookies_file).urlopen(Request(fmt['url'], headers=headers)) as response:
+            return response.read()
+
+    def place(self, video_id, name, target, fetch, summary, refresh=False):
+        # Copies the cached file to target, fetching it into the cache first if needed
+        if os.path.exists(target) and not refresh:
+            summary['existing'] += 1
+            return True
+        try:
+            cached = self.cache.path_of(video_id, name) if video_id and not refresh else None
+            if cached is None:
+                data = fetch()
+                summary['fetched'] += 1
+                if video_id:
+                    cached = self.cache.write(video_id, name, data)
+            else:
+                summary['cached'] += 1
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            if cached is None:
+                with open(target, "wb") as f:
+                    f.write(data)
+            else:
+                shutil.copyfile(cached, target)
+            return True
+        except Exception as e:
+            summary['failed'].append(f"{os.path.basename(target)}: {e}")
+            return False
+
+    def fetch(self, info, base, langs=None, thumbnail=False, cookies_file="", refresh=False):
+        """Write the requested subtitles and thumbnail next to base (the media
+        path without extension), named as yt-dlp names them. Returns a
+        summary dict; runs on the pool."""
+        started = time.monotonic()
+        summary = new_summary()
+        video_id = info.get('id')
+        subtitles = available_subtitles(info)
+        placed = {}
+        if langs:
+            try:
+                selected = select_languages(subtitles, langs)
+            except (ValueError, re.error) as e:
+                summary['failed'].append(f"bad subtitle language pattern: {e}")
+                selected = []
+            for lang in selected:
+                fmt = pick_subtitle_format(subtitles[lang])
+                ext = fmt.get('ext') or determine_ext(fmt.get('url'), 'vtt')
+                name = f"{lang}.{ext}"
+                if self.place(video_id, name, f"{base}.{name}", lambda: self.download(fmt, info, cookies_file),
+                              summary, refresh):
+                    placed[lang] = name
+
+        thumbnail_name = False
+        if thumbnail:
+            thumb = best_thumbnail(info)
+            thumbnail_name = None
+            if thumb is not None:
+                ext = determine_ext(thumb['url'], 'jpg')
+                if ext not in ('jpg', 'jpeg', 'png', 'webp', 'gif'):
+                    ext = 'jpg'
+                name = f"thumbnail.{ext}"
+                if self.place(video_id, name, f"{base}.{ext}", lambda: self.download(thumb, info, cookies_file),
+                              summary, refresh):
+                    thumbnail_name = name
+
+        if video_id:
+            try:
+                self.cache.update_manifest(video_id, subtitles, placed, thumbnail_name)
+            except OSError:
+                pass
+        summary['seconds'] = time.monotonic() - started
+        return summary
+
+    def fetch_cached(self, video_id, base, langs=None, thumbnail=False):
+        """Serve a request from the cache alone, without the video's info.
+
+        Returns a summary dict, or None when anything requested isn't cached
+        (or the video was never fetched), in which case nothing is written.
+        """
+        manifest = self.cache.manifest(video_id) if video_id else None
+        if manifest is None:
+            return None
+        wanted = []
+        if langs:
+            try:
+                selected = select_languages(manifest.get('languages', []), langs)
+            except (ValueError, re.error):
+                return None
+            for lang in selected:
+                name = manifest['subtitles'].get(lang)
+                if name is None:
+                    return None
+                wanted.append((name, f"{base}.{name}"))
+        if thumbnail:
+            if 'thumbnail' not in manifest:
+                return None
+            name = manifest['thumbnail']
+            if name:
+                wanted.append((name, base + os.path.splitext(name)[1]))
+        if not all(self.cache.path_of(video_id, name) for name, _ in wanted):
+            return None
+
+        summary = new_summary()
+        for name, target in wanted:
+            self.place(video_id, name, target, None, summary)
+        return summary
+
+    def close(self, wait=True):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+        with self.lock:
+            instances, self.instances = self.instances, []
+        for ydl in instances:
+            ydl.close()
+
+
+def new_summary():
+    return {'fetched': 0, 'cached': 0, 'existing': 0, 'failed': [], 'seconds': 0.0}
@@ -0,0 +1,11 @@
+import pytest
+
+from fake_media_server import FakeMediaServer
+
+
+@pytest.fixture
+def server(request):
+    # A test module can throttle each connection by setting SERVER_RATE (bytes/second)
+    server = FakeMediaServer(rate=getattr(request.module, 'SERVER_RATE', 0)).start()
+    yield server
+    server.stop()
@@ -0,0 +1,124 @@
+import yt_dlp
+
+from downloader_core import get_format_selector
+from format_ranking import RankedYoutubeDL, choose_formats, estimated_size
+
+
+# Trimmed from real extractions: only the fields the ranking reads are kept
+YOUTUBE_FORMATS = [
+    {'format_id': '139', 'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a.40.5', 'abr': 48.8, 'filesize': 1178301},
+    {'format_id': '140', 'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a.40.2', 'abr': 129.5, 'filesize': 3127049},
+    {'format_id': '251', 'ext': 'webm', 'vcodec': 'none', 'acodec': 'opus', 'abr': 135.8, 'filesize': 3173893},
+    {'format_id': '18', 'ext': 'mp4', 'vcodec': 'avc1.42001E', 'acodec': 'mp4a.40.2', 'height': 360, 'width': 640,
+     'fps': 30, 'tbr': 462.1},
+    {'format_id': '134', 'ext': 'mp4', 'vcodec': 'avc1.4d401e', 'acodec': 'none', 'height': 360, 'width': 640,
+     'fps': 30, 'tbr': 322.3, 'filesize': 7782436},
+    {'format_id': '136', 'ext': 'mp4', 'vcodec': 'avc1.4d401f', 'acodec': 'none', 'height': 720, 'width': 1280,
+     'fps': 30, 'tbr': 1151.8, 'filesize': 27809152},
+    {'format_id': '247', 'ext': 'webm', 'vcodec': 'vp9', 'acodec': 'none', 'height': 720, 'width': 1280,
+     'fps': 30, 'tbr': 1023.4, 'filesize': 24708962},
+    {'format_id': '137', 'ext': 'mp4', 'vcodec': 'avc1.640028', 'acodec': 'none', 'height': 1080, 'width': 1920,
+     'fps': 30, 'tbr': 4394.5, 'filesize': 106099578},
+    {'format_id': '248', 'ext': 'webm', 'vcodec': 'vp9', 'acodec': 'none', 'height': 1080, 'width': 1920,
+     'fps': 30, 'tbr': 2606.1, 'filesize': 62922184},
+    {'format_id': 'sb0', 'ext': 'mhtml', 'vcodec': 'none', 'acodec': 'none', 'height': 45, 'width': 80},
+]
+
+# Progressive files up to 720p, with 1080p only as a video-only DASH stream
+VIMEO_FORMATS = [
+    {'format_id': 'http-360p', 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a', 'height': 360, 'width': 640,
+     'tbr': 700},
+    {'format_id': 'http-720p', 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a', 'height': 720, 'width': 1280,
+     'tbr': 2400},
+    {'format_id': 'dash-video-1080p', 'ext': 'mp4', 'vcodec': 'avc1.640028', 'acodec': 'none', 'height': 1080,
+     'width': 1920, 'tbr': 4800, 'protocol': 'http_dash_segments'},
+]
+
+# Audio only, with bitrates but no sizes
+SOUNDCLOUD_FORMATS = [
+    {'format_id': 'hls_mp3_128', 'ext': 'mp3', 'vcodec': 'none', 'acodec': 'mp3', 'abr': 128, 'protocol': 'm3u8_native'},
+    {'format_id': 'hls_opus_64', 'ext': 'opus', 'vcodec': 'none', 'acodec': 'opus', 'abr': 64, 'protocol': 'm3u8_native'},
+]
+
+
+def with_urls(formats):
+    return [dict(f, url=f"https://media.invalid/{f['format_id']}") for f in formats]
+
+
+def video_info(formats, duration=240):
+    return {
+        'id': 'video', 'title': 'video', 'extractor': 'test', 'extractor_key': 'Test',
+        'webpage_url': 'https://media.invalid/watch', 'duration': duration, 'formats': with_urls(formats),
+    }
+
+
+class Logger:
+    def __init__(self):
+        self.lines = []
+
+    def debug(self, msg):
+        self.lines.append(msg)
+
+    info = debug
+
+    def warning(self, msg):
+        self.lines.append(f"WARNING: {msg}")
+
+    def error(self, msg):
+        self.lines.append(f"ERROR: {msg}")
+
+
+def select(formats, quality, content_type, output_format, ydl_class=yt_dlp.YoutubeDL):
+    logger = Logger()
+    params = {'format': get_format_selector(quality, content_type, output_format), 'logger': logger}
+    if output_format in ('mp4', 'mkv', 'webm'):
+        params['merge_output_format'] = output_format
+    with ydl_class(params) as ydl:
+        return ydl.process_ie_result(video_info(formats), download=False), logger.lines
+
+
+def test_youtube_caps_height_and_matches_container():
+    choice = choose_formats(with_urls(YOUTUBE_FORMATS), 720, "Video+Audio", "mp4")
+    assert choice.format_spec == '136+140' and not choice.over_cap
+    choice = choose_formats(with_urls(YOUTUBE_FORMATS), 720, "Video+Audio", "webm")
+    assert choice.format_spec == '247+251'
+    choice = choose_formats(with_urls(YOUTUBE_FORMATS), None, "Video Only", "best")
+    assert choice.format_spec == '248'  # vp9 is smaller than avc1 at the same height
+    choice = choose_formats(with_urls(YOUTUBE_FORMATS), None, "Audio Only", "m4a")
+    assert choice.format_spec == '140'
+
+
+def test_callable_format_option_merges_through_plain_youtubedl():
+    info, _ = select(YOUTUBE_FORMATS, "720p", "Video+Audio", "mp4")
+    assert info['format_id'] == '136+140'
+    assert [f['format_id'] for f in info['requested_formats']] == ['136', '140']
+    assert info['ext'] == 'mp4'
+    assert info['height'] == 720 and info['acodec'] == 'mp4a.40.2'
+
+
+def test_video_only_prefers_muxed_within_cap_over_video_only_above_it():
+    choice = choose_formats(with_urls(VIMEO_FORMATS), 720, "Video Only", "mp4")
+    assert choice.format_spec == 'http-720p' and not choice.over_cap
+
+    info, lines = select(VIMEO_FORMATS, "720p", "Video Only", "mp4", RankedYoutubeDL)
+    assert info['format_id'] == 'http-720p'
+    assert not [line for line in lines if line.startswith("WARNING:")]
+
+
+def test_going_over_the_cap_is_a_logged_last_resort():
+    dash_only = [f for f in VIMEO_FORMATS if f['acodec'] == 'none']
+    choice = choose_formats(with_urls(dash_only), 720, "Video Only", "mp4")
+    assert choice.format_spec == 'dash-video-1080p' and choice.over_cap
+
+    info, lines = select(dash_only, "720p", "Video Only", "mp4", RankedYoutubeDL)
+    assert info['format_id'] == 'dash-video-1080p'
+    assert any(line.startswith("WARNING:") and "720p" in line for line in lines)
+
+
+def test_sizes_fall_back_to_abr():
+    assert estimated_size(SOUNDCLOUD_FORMATS[0], duration=100) == 128 * 1000 / 8 * 100
+    assert estimated_size(SOUNDCLOUD_FORMATS[0]) is None
+
+    info, lines = select(SOUNDCLOUD_FORMATS, "Best Available", "Audio Only", "opus", RankedYoutubeDL)
+    assert info['format_id'] == 'hls_opus_64'
+    assert any("[format] Selected hls_opus_64" in line and "about 1.8 MB" in line for line in lines)
@@ -0,0 +1,172 @@
+import pytest
+
+from download_settings import DownloadSettings
+from metadata_cache import MetadataCache, cache_key, normalize_url
+
+
+VIDEO_URL = "https://www.youtube.com/watch?v=aaaaaaaaaaa&utm_source=share"
+PLAYLIST_URL = "https://www.youtube.com/playlist?list=PLaaaaaaaaaaaaaaaa"
+SIZE = 256 * 1024
+
+
+@pytest.fixture
+def no_extraction(monkeypatch):
+    import yt_dlp
+
+    calls = []
+
+    def extract_info(self, url, *args, **kwargs):
+        calls.append(url)
+        raise AssertionError(f"extractor called for {url}")
+
+    monkeypatch.setattr(yt_dlp.YoutubeDL, 'extract_info', extract_info)
+    return calls
+
+
+class PlaylistExtractor:
+    # Stands in for a YoutubeDL whose extractor returns a flat playlist
+    def __init__(self, entries):
+        self.entries = entries
+        self.calls = 0
+
+    def extract_info(self, url, download=False, process=False, ie_key=None):
+        self.calls += 1
+        return {'_type': 'playlist', 'id': 'PL', 'title': 'playlist', 'entries': self.entries()}
+
+
+def flat_entries():
+    return [{'_type': 'url', 'url': f"https://www.youtube.com/watch?v={index:011d}"} for index in range(3)]
+
+
+def video_info(server):
+    return {
+        'id': 'aaaaaaaaaaa',
+        'title': 'seeded video',
+        'extractor': 'youtube',
+        'extractor_key': 'Youtube',
+        'webpage_url': 'https://www.youtube.com/watch?v=aaaaaaaaaaa',
+        'formats': [{
+            'format_id': '18',
+            'url': f"{server.base_url}/media/seeded.mp4?size={SIZE}",
+            'ext': 'mp4',
+            'protocol': 'http',
+            'vcodec': 'avc1.42001E',
+            'acodec': 'mp4a.40.2',
+            'height': 360,
+            'filesize': SIZE,
+        }],
+    }
+
+
+def test_cache_key_is_scoped_to_cookie_file(tmp_path):
+    plain = cache_key(VIDEO_URL)
+    assert plain == normalize_url(VIDEO_URL) == "youtube:video:aaaaaaaaaaa"
+    first = cache_key(VIDEO_URL, cookies_file=str(tmp_path / "a.txt"))
+    second = cache_key(VIDEO_URL, cookies_file=str(tmp_path / "b.txt"))
+    assert len({plain, first, second}) == 3
+    # Equivalent URLs still share a key under the same cookie file
+    assert first == cache_key("https://youtu.be/aaaaaaaaaaa", cookies_file=str(tmp_path / "a.txt"))
+
+
+def test_seeded_cache_downloads_without_extraction(tmp_path, server, no_extraction):
+    from downloader_core import DownloadJob
+
+    metadata_cache = MetadataCache(str(tmp_path / "cache"))
+    metadata_cache.set(cache_key(VIDEO_URL), video_info(server))
+    settings = DownloadSettings(metadata=False, skip_archived=False, link_duplicates=False)
+    output_dir = tmp_path / "out"
+
+    ok, message = DownloadJob(VIDEO_URL, settings, str(output_dir), metadata_cache=metadata_cache).run()
+
+    assert ok, message
+    assert no_extraction == []
+    assert [f.stat().st_size for f in output_dir.iterdir()] == [SIZE]
+
+
+def test_seed_under_other_cookies_is_not_used(tmp_path, server, no_extraction):
+    from downloader_core import DownloadJob
+
+    metadata_cache = MetadataCache(str(tmp_path / "cache"))
+    metadata_cache.set(cache_key(VIDEO_URL), video_info(server))
+    settings = DownloadSettings(cookies_file=str(tmp_path / "cookies.txt"))
+
+    with pytest.raises(AssertionError, match="extractor called"):
+        DownloadJob(VIDEO_URL, settings, str(tmp_path / "out"), metadata_cache=metadata_cache).run()
+
+    assert no_extraction == [VIDEO_URL]
+
+
+def test_batch_resolver_uses_seeded_cache(tmp_path, server, no_extraction):
+    from batch_intake import BatchResolver
+
+    metadata_cache = MetadataCache(str(tmp_path / "cache"))
+    metadata_cache.set(cache_key(VIDEO_URL), video_info(server))
+    resolved = []
+
+    BatchResolver(DownloadSettings(), metadata_cache).resolve(
+        [VIDEO_URL], lambda url, info: resolved.append(info['id'])
+    )
+
+    assert resolved == ['aaaaaaaaaaa']
+    assert no_extraction == []
+
+
+def test_listed_playlist_entries_are_cached(tmp_path):
+    from downloader_core import DownloadJob
+
+    metadata_cache = MetadataCache(str(tmp_path / "cache"))
+    job = DownloadJob(PLAYLIST_URL, DownloadSettings(is_playlist=True), str(tmp_path), metadata_cache=metadata_cache)
+    ydl = PlaylistExtractor(flat_entries)
+
+    assert job.open_playlist(ydl)['entries'] == flat_entries()
+    assert job.open_playlist(ydl)['entries'] == flat_entries()
+    assert ydl.calls == 1
+
+
+def test_generated_playlist_entries_are_cached_once_consumed(tmp_path):
+    from downloader_core import DownloadJob
+
+    metadata_cache = MetadataCache(str(tmp_path / "cache"))
+    job = DownloadJob(PLAYLIST_URL, DownloadSettings(is_playlist=True), str(tmp_path), metadata_cache=metadata_cache)
+    ydl = PlaylistExtractor(lambda: iter(flat_entries()))
+
+    entries = job.open_playlist(ydl)['entries']
+    assert metadata_cache.get(cache_key(PLAYLIST_URL, playlist=True)) is None
+    assert list(entries) == flat_entries()
+    assert job.open_playlist(ydl)['entries'] == flat_entries()
+    assert ydl.calls == 1
+
+
+def test_resolved_playlist_is_not_extracted_again(tmp_path, monkeypatch):
+    import yt_dlp
+    from batch_intake import BatchResolver
+    from downloader_core import DownloadJob
+
+    ydl = PlaylistExtractor(lambda: iter(flat_entries()))
+    monkeypatch.setattr(yt_dlp.YoutubeDL, 'extract_info', lambda self, url, **kwargs: ydl.extract_info(url, **kwargs))
+    metadata_cache = MetadataCache(str(tmp_path / "cache"))
+    settings = DownloadSettings(is_playlist=True)
+    resolved = {}
+
+    BatchResolver(settings, metadata_cache).resolve([PLAYLIST_URL], resolved.__setitem__)
+    job = DownloadJob(PLAYLIST_URL, settings, str(tmp_path), metadata_cache=metadata_cache,
+                      resolved_info=resolved[PLAYLIST_URL])
+
+    assert list(job.open_playlist(ydl)['entries']) == flat_entries()
+    assert ydl.calls == 1
+    # Listing the entries cached the playlist for later runs
+    assert metadata_cache.get(cache_key(PLAYLIST_URL, playlist=True))['entries'] == flat_entries()
+
+
+def test_failed_resolve_is_reported_for_queueing(tmp_path, no_extraction):
+    from batch_intake import BatchResolver
+
+    resolved, lines = [], []
+
+    counts = BatchResolver(DownloadSettings()).resolve(
+        [VIDEO_URL], lambda url, info: resolved.append((url, info)), lines.append
+    )
+
+    assert counts == (0, 1)
+    assert resolved == [(VIDEO_URL, None)]
+    assert len(lines) == 1 and lines[0].startswith(f"WARNING: could not resolve {VIDEO_URL}")
@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+
+from fake_media_server import synthetic_bytes
+from segmented_download import AcceleratedYoutubeDL
+
+
+SIZE = 1000 * 1000
+CHUNK_SIZE = 40 * 1000 + 1  # Not a multiple of the 256-byte pattern, so a misplaced chunk shows
+# Throttled per connection, so a download is still running when the hook pauses it
+SERVER_RATE = 400 * 1000
+
+
+class Paused(Exception):
+    pass
+
+
+def download(server, filename, hooks=(), connections=4):
+    params = {
+        'quiet': True,
+        'noprogress': True,
+        'segmented_connections': connections,
+        'segmented_chunk_size': CHUNK_SIZE,
+        'progress_hooks': list(hooks),
+    }
+    info = {'url': f"{server.base_url}/media/test.mp4?size={SIZE}", 'ext': 'mp4', 'http_headers': {}}
+    with AcceleratedYoutubeDL(params) as ydl:
+        return ydl.dl(filename, info)
+
+
+def expected_bytes():
+    return b"".join(synthetic_bytes(0, SIZE - 1))
+
+
+def test_segmented_download_is_byte_exact(tmp_path, server):
+    filename = str(tmp_path / "video.mp4")
+
+    assert download(server, filename)
+
+    with open(filename, 'rb') as f:
+        assert f.read() == expected_bytes()
+    assert not os.path.exists(filename + '.part.segments')
+    # The size probe, then one request per chunk
+    assert server.requests == 1 + -(-SIZE // CHUNK_SIZE)
+
+
+def test_pause_and_resume_from_segments(tmp_path, server):
+    filename = str(tmp_path / "video.mp4")
+    part, state = filename + '.part', filename + '.part.segments'
+
+    def pause(d):
+        if d['status'] == 'downloading' and d['downloaded_bytes'] >= SIZE // 3:
+            raise Paused()
+
+    with pytest.raises(Paused):
+        download(server, filename, [pause])
+
+    assert os.path.exists(part) and not os.path.exists(filename)
+    with open(state, encoding='utf-8') as f:
+        saved = json.load(f)
+    chunks = -(-SIZE // CHUNK_SIZE)
+    assert saved['total_bytes'] == SIZE
+    assert 0 < len(saved['done']) < chunks
+
+    requests_before = server.requests
+    resumed = []
+    assert download(server, filename, [lambda d: resumed.append(d['downloaded_bytes'])])
+
+    with open(filename, 'rb') as f:
+        assert f.read() == expected_bytes()
+    assert not os.path.exists(part) and not os.path.exists(state)
+    # Only the unfinished chunks were fetched again, counting on from the saved ones
+    assert server.requests - requests_before == 1 + chunks - len(saved['done'])
+    assert resumed[0] >= sum(min(CHUNK_SIZE, SIZE - index * CHUNK_SIZE) for index in saved['done'])
+    assert resumed[-1] == SIZE
+
+
+def test_single_connection_part_is_resumed_as_prefix(tmp_path, server):
+    filename = str(tmp_path / "video.mp4")
+    prefix = b"".join(synthetic_bytes(0, 3 * CHUNK_SIZE + 99))
+    with open(filename + '.part', 'wb') as f:
+        f.write(prefix)
+
+    assert download(server, filename)
+
+    with open(filename, 'rb') as f:
+        assert f.read() == expected_bytes()
+    # The three whole chunks in the prefix were kept
+    assert server.requests == 1 + -(-SIZE // CHUNK_SIZE) - 3
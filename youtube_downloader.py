@@ -1,84 +1,264 @@
 import os
 import sys
-import json
+import time
+
+# Taken before the Qt and project imports, so a cold start's timings include them,
+# as cli.py --gui does
+PROCESS_STARTED = time.perf_counter()
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QLabel, QLineEdit, QPushButton, QComboBox, QProgressBar,
-                             QFileDialog, QMessageBox, QGroupBox, QCheckBox, QTextEdit)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, pyqtSlot, QObject
+                             QFileDialog, QMessageBox, QGroupBox, QCheckBox, QPlainTextEdit,
+                             QSpinBox, QListWidget, QListWidgetItem, QDialog, QDialogButtonBox)
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal, pyqtSlot
 from PyQt5.QtGui import QPalette, QColor
-import yt_dlp
+
+from download_settings import (DownloadSettings, QUALITY_OPTIONS, CONTENT_TYPES, OUTPUT_FORMATS,
+                               get_format_extension)
+from metadata_cache import MetadataCache
+from progress_tracker import describe_progress, format_bytes
+from log_buffer import LogBuffer
+from metrics import MetricsRegistry, SnapshotWriter, StartupTimer, session_collector
+from download_archive import DownloadArchive
+from media_store import MediaStore
+from batch_intake import BatchResolver, parse_urls, dedupe_urls, describe_info
+from download_queue import (DownloadQueue, COMPLETED, FAILED, RUNNING, PAUSED, QUEUED, CANCELLED,
+                            partial_file_hook, resumable_bytes, discard_partial_files)
+
+
+LOG_FLUSH_INTERVAL_MS = 200
+LOG_MAX_LINES = 1000
+CLOSE_WAIT_MS = 5000
 
 
 class DownloadThread(QThread):
-    progress_signal = pyqtSignal(int, str)
+    progress_signal = pyqtSignal(dict)
     finished_signal = pyqtSignal(bool, str)
     error_signal = pyqtSignal(str)
-    playlist_info_signal = pyqtSignal(str, int)
+    playlist_info_signal = pyqtSignal(str, int, bool)
     log_signal = pyqtSignal(str)
+    interrupted_signal = pyqtSignal(str)
 
-    def __init__(self, url, options, is_playlist=False):
+    def __init__(self, url, settings, output_dir, metadata_cache=None, download_archive=None,
+                 job_id=None, progress_hooks=None, log_callback=None, postprocess_pool=None, governor=None,
+                 metrics=None, media_store=None, side_fetcher=None, resolved_info=None):
         super().__init__()
+        # Loaded by BackendLoader before the first job is dispatched, so this is cheap
+        from downloader_core import DownloadJob
+
         self.url = url
-        self.options = options
-        self.is_playlist = is_playlist
-        self.running = True
+        self.job_id = job_id
+        self.job = DownloadJob(
+            url, settings, output_dir,
+            metadata_cache=metadata_cache,
+            download_archive=download_archive,
+            on_progress=self.progress_signal.emit,
+            on_playlist_info=self.playlist_info_signal.emit,
+            on_log=log_callback or self.log_signal.emit,
+            progress_hooks=progress_hooks,
+            postprocess_pool=postprocess_pool,
+            governor=governor,
+            job_key=job_id,
+            metrics=metrics,
+            media_store=media_store,
+            side_fetcher=side_fetcher,
+            resolved_info=resolved_info
+        )
 
     def run(self):
+        from downloader_core import JobCancelled, JobPaused
+
         try:
-            with yt_dlp.YoutubeDL(self.options) as ydl:
-                if self.is_playlist:
-                    # Extract playlist info first
-                    info = ydl.extract_info(self.url, download=False)
-                    if 'entries' in info:
-                        playlist_title = info.get('title', 'playlist')
-                        num_entries = len(info['entries'])
-                        self.playlist_info_signal.emit(playlist_title, num_entries)
-                
-                ydl.download([self.url])
-            self.finished_signal.emit(True, "Download completed successfully!")
+            success, message = self.job.run()
+            self.finished_signal.emit(success, message)
+        except JobPaused:
+            self.interrupted_signal.emit(PAUSED)
+        except JobCancelled:
+            self.interrupted_signal.emit(CANCELLED)
         except Exception as e:
             self.error_signal.emit(str(e))
-        finally:
-            self.running = False
 
-    def stop(self):
-        self.running = False
+    def pause(self):
+        self.job.pause()
+
+    def cancel(self):
+        self.job.cancel()
 
 
-class YTDLLogger(QObject):
-    def __init__(self, log_signal):
+class BackendLoader(QThread):
+    """Imports yt-dlp and warms up its extractors after the window is shown.
+
+    Importing yt-dlp loads hundreds of modules and its first extraction
+    compiles every extractor's URL pattern; doing both here keeps them off
+    the window's startup path and out of the first job.
+    """
+    ready_signal = pyqtSignal(int)
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, startup):
         super().__init__()
-        self.log_signal = log_signal
+        self.startup = startup
 
-    def debug(self, msg):
-        if msg.startswith('[debug] '):
-            pass
-        else:
-            self.log_signal.emit(msg)
+    def run(self):
+        try:
+            import downloader_core  # Pulls in yt-dlp, the pipeline and the governor
+            self.startup.mark("ytdlp_imported")
+            extractors = downloader_core.warm_up()
+            self.startup.mark("extractors_warmed")
+        except Exception as e:
+            self.error_signal.emit(str(e))
+            return
+        self.ready_signal.emit(extractors)
 
-    def info(self, msg):
-        self.log_signal.emit(msg)
 
-    def warning(self, msg):
-        self.log_signal.emit(f"WARNING: {msg}")
+class BatchIntakeThread(QThread):
+    """Resolves a batch of URLs concurrently; each one is reported as soon as it resolves."""
+    resolved_signal = pyqtSignal(str, object)
+    log_signal = pyqtSignal(str)
+    done_signal = pyqtSignal(int, int)
+
+    def __init__(self, urls, settings, metadata_cache=None, governor=None):
+        super().__init__()
+        self.urls = urls
+        self.resolver = BatchResolver(settings, metadata_cache, governor=governor)
+
+    def run(self):
+        resolved, failed = self.resolver.resolve(self.urls, self.resolved_signal.emit, self.log_signal.emit)
+        self.done_signal.emit(resolved, failed)
 
-    def error(self, msg):
-        self.log_signal.emit(f"ERROR: {msg}")
+    def cancel(self):
+        self.resolver.cancel()
+
+
+class BatchDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Add URLs")
+        self.resize(600, 400)
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("One URL per line, or paste a CSV export. Duplicates are dropped."))
+        self.text_edit = QPlainTextEdit()
+        layout.addWidget(self.text_edit)
+
+        buttons_layout = QHBoxLayout()
+        paste_btn = QPushButton("Paste Clipboard")
+        paste_btn.clicked.connect(lambda: self.text_edit.appendPlainText(QApplication.clipboard().text()))
+        load_btn = QPushButton("Load File...")
+        load_btn.clicked.connect(self.load_file)
+        buttons_layout.addWidget(paste_btn)
+        buttons_layout.addWidget(load_btn)
+        buttons_layout.addStretch()
+        layout.addLayout(buttons_layout)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def load_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Select URL List", "", "URL lists (*.txt *.csv);;All files (*)")
+        if path:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                self.text_edit.appendPlainText(f.read())
+
+    def urls(self):
+        return parse_urls(self.text_edit.toPlainText())
 
 
 class YouTubeDownloader(QMainWindow):
-    def __init__(self):
+    def __init__(self, startup=None):
         super().__init__()
+        self.startup = startup or StartupTimer(PROCESS_STARTED)
+        self.startup.mark("imports")
         self.setWindowTitle("Advanced YouTube Downloader")
-        self.setGeometry(100, 100, 800, 650)  # Increased window size
+        self.setGeometry(100, 100, 800, 800)  # Room for the queue panel
         self.default_palette = QApplication.palette()
         self.cookies_file = None
+        self.metadata_cache = MetadataCache()
+        self.download_archive = DownloadArchive()
+        self.media_store = MediaStore()
+        self.download_queue = DownloadQueue()
+        # The post-processing pool and the governor need yt-dlp; BackendLoader
+        # creates them in the background once the window is up
+        self.postprocess_pool = None
+        self.governor = None
+        self.side_fetcher = None
+        self.backend_loader = None
+        self.backend_ready = False
+        self.pending_batches = []
+        # Session metrics, snapshotted to ~/.cache/youtube_downloader/metrics.json
+        self.metrics = MetricsRegistry()
+        self.metrics.add_collector(session_collector(self.download_queue))
+        self.metrics_writer = SnapshotWriter(self.metrics).start()
+        self.active_threads = {}
+        self.batch_threads = []
+        # Info from batch resolution, handed to each job when it starts
+        self.resolved_infos = {}
+        self.job_items = {}
+        self.queue_jobs = {}
+        self.session_failures = 0
+        self.session_completed = 0
+        self.closing = False
+        self.log_buffer = LogBuffer()
+        self.extras_panel = None
         self.init_ui()
-        self.download_thread = None
+        self.startup.mark("window_built")
+
+        # Log lines from workers are batched into the console on a timer
+        self.log_timer = QTimer(self)
+        self.log_timer.timeout.connect(self.flush_log)
+        self.log_timer.start(LOG_FLUSH_INTERVAL_MS)
         self.current_playlist_folder = ""
         self.current_download_count = 0
         self.total_playlist_items = 0
 
+        # Pick up jobs that were queued or interrupted in the last session;
+        # they start once the backend is ready
+        if self.download_queue.recovered_jobs:
+            self.log_message(f"Requeued {self.download_queue.recovered_jobs} interrupted job(s)")
+        pending = self.download_queue.pending_count()
+        if pending:
+            self.log_message(f"Resuming {pending} queued job(s) from the last session")
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.backend_loader is None:
+            self.startup.mark("window_shown")
+            self.backend_loader = BackendLoader(self.startup)
+            self.backend_loader.ready_signal.connect(self.on_backend_ready)
+            self.backend_loader.error_signal.connect(
+                lambda error: self.log_message(f"ERROR: could not load yt-dlp: {error}")
+            )
+            # Let the first frame paint before the loader competes for the GIL
+            QTimer.singleShot(0, self.backend_loader.start)
+
+    def on_backend_ready(self, extractors):
+        if self.closing:
+            return
+        from postprocess_pipeline import PostProcessPool
+        from bandwidth_governor import BandwidthGovernor
+        from side_assets import SideFetcher
+
+        # ffmpeg merges/tagging run here so download workers aren't held up
+        self.postprocess_pool = PostProcessPool()
+        # One set of bandwidth/request limits for every running job
+        self.governor = BandwidthGovernor()
+        self.update_limits()
+        # Subtitles and thumbnails are fetched here, beside the media downloads
+        self.side_fetcher = SideFetcher(governor=self.governor)
+        self.metrics.add_collector(session_collector(None, self.governor, self.postprocess_pool, self.side_fetcher))
+        self.backend_ready = True
+        self.startup.record(self.metrics)
+        self.log_message(
+            f"Startup: window shown in {self.startup.marks['window_shown']:.2f}s, downloader ready in "
+            f"{self.startup.marks['extractors_warmed']:.2f}s ({self.startup.describe()}; "
+            f"{extractors} extractors)"
+        )
+        pending_batches, self.pending_batches = self.pending_batches, []
+        for batch in pending_batches:
+            self.resolve_batch(*batch)
+        self.dispatch_jobs()
+
     def init_ui(self):
         main_widget = QWidget()
         main_layout = QVBoxLayout()
@@ -96,7 +276,13 @@ class YouTubeDownloader(QMainWindow):
         url_layout = QVBoxLayout()
         self.url_input = QLineEdit()
         self.url_input.setPlaceholderText("Enter YouTube video or playlist URL...")
-        url_layout.addWidget(self.url_input)
+        url_row = QHBoxLayout()
+        url_row.addWidget(self.url_input)
+        batch_btn = QPushButton("Batch...")
+        batch_btn.setToolTip("Add many URLs from a paste, the clipboard or a text/CSV file")
+        batch_btn.clicked.connect(self.open_batch_dialog)
+        url_row.addWidget(batch_btn)
+        url_layout.addLayout(url_row)
         
         # Playlist Options
         playlist_layout = QHBoxLayout()
@@ -109,6 +295,33 @@ class YouTubeDownloader(QMainWindow):
         playlist_layout.addWidget(self.playlist_check)
         playlist_layout.addWidget(self.playlist_range)
         url_layout.addLayout(playlist_layout)
+
+        # Playlist worker pool
+        workers_layout = QHBoxLayout()
+        workers_label = QLabel("Parallel Downloads:")
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, 16)
+        self.workers_spin.setValue(3)
+        retries_label = QLabel("Retries per Item:")
+        self.retries_spin = QSpinBox()
+        self.retries_spin.setRange(0, 10)
+        self.retries_spin.setValue(3)
+        self.workers_spin.setEnabled(False)
+        self.retries_spin.setEnabled(False)
+        self.playlist_check.stateChanged.connect(lambda: self.workers_spin.setEnabled(self.playlist_check.isChecked()))
+        self.playlist_check.stateChanged.connect(lambda: self.retries_spin.setEnabled(self.playlist_check.isChecked()))
+
+        workers_layout.addWidget(workers_label)
+        workers_layout.addWidget(self.workers_spin)
+        workers_layout.addWidget(retries_label)
+        workers_layout.addWidget(self.retries_spin)
+        self.skip_archived_check = QCheckBox("Skip Already Downloaded")
+        self.skip_archived_check.setChecked(True)
+        self.skip_archived_check.setEnabled(False)
+        self.playlist_check.stateChanged.connect(lambda: self.skip_archived_check.setEnabled(self.playlist_check.isChecked()))
+        workers_layout.addWidget(self.skip_archived_check)
+        workers_layout.addStretch()
+        url_layout.addLayout(workers_layout)
         url_group.setLayout(url_layout)
 
         # Download Options Section
@@ -119,7 +332,7 @@ class YouTubeDownloader(QMainWindow):
         quality_layout = QHBoxLayout()
         quality_label = QLabel("Resolution:")
         self.quality_combo = QComboBox()
-        self.quality_combo.addItems(["Best Available", "8K", "4K", "2K", "1080p", "720p", "480p", "360p"])
+        self.quality_combo.addItems(QUALITY_OPTIONS)
         quality_layout.addWidget(quality_label)
         quality_layout.addWidget(self.quality_combo)
         options_layout.addLayout(quality_layout)
@@ -128,7 +341,7 @@ class YouTubeDownloader(QMainWindow):
         format_layout = QHBoxLayout()
         format_label = QLabel("Content Type:")
         self.format_combo = QComboBox()
-        self.format_combo.addItems(["Video+Audio", "Video Only", "Audio Only"])
+        self.format_combo.addItems(CONTENT_TYPES)
         format_layout.addWidget(format_label)
         format_layout.addWidget(self.format_combo)
         options_layout.addLayout(format_layout)
@@ -137,43 +350,41 @@ class YouTubeDownloader(QMainWindow):
         output_format_layout = QHBoxLayout()
         output_format_label = QLabel("Output Format:")
         self.output_format_combo = QComboBox()
-        self.output_format_combo.addItems(["MP4", "MKV", "WEBM", "AAC", "MP3", "Best Available"])
+        self.output_format_combo.addItems(OUTPUT_FORMATS["Video+Audio"])
         output_format_layout.addWidget(output_format_label)
         output_format_layout.addWidget(self.output_format_combo)
         options_layout.addLayout(output_format_layout)
 
-        # Additional Options
-        options_row1 = QHBoxLayout()
-        self.subtitles_check = QCheckBox("Download Subtitles")
-        self.thumbnail_check = QCheckBox("Download Thumbnail")
-        options_row1.addWidget(self.subtitles_check)
-        options_row1.addWidget(self.thumbnail_check)
-        options_layout.addLayout(options_row1)
+        # Segmented downloading
+        connections_layout = QHBoxLayout()
+        connections_label = QLabel("Connections per File:")
+        self.connections_spin = QSpinBox()
+        self.connections_spin.setRange(1, 16)
+        self.connections_spin.setValue(1)
+        chunk_size_label = QLabel("Chunk Size (MB):")
+        self.chunk_size_spin = QSpinBox()
+        self.chunk_size_spin.setRange(1, 64)
+        self.chunk_size_spin.setValue(4)
+        self.chunk_size_spin.setEnabled(False)
+        self.connections_spin.valueChanged.connect(lambda value: self.chunk_size_spin.setEnabled(value > 1))
+        connections_layout.addWidget(connections_label)
+        connections_layout.addWidget(self.connections_spin)
+        connections_layout.addWidget(chunk_size_label)
+        connections_layout.addWidget(self.chunk_size_spin)
+        connections_layout.addStretch()
+        options_layout.addLayout(connections_layout)
+
+        # Subtitles, thumbnails, metadata and cookies are rarely changed;
+        # their widgets are only built the first time this is expanded
+        self.extras_btn = QPushButton("More Options...")
+        self.extras_btn.setCheckable(True)
+        self.extras_btn.toggled.connect(self.toggle_extras_panel)
+        extras_layout = QHBoxLayout()
+        extras_layout.addWidget(self.extras_btn)
+        extras_layout.addStretch()
+        options_layout.addLayout(extras_layout)
+        self.options_layout = options_layout
 
-        options_row2 = QHBoxLayout()
-        self.metadata_check = QCheckBox("Add Metadata")
-        self.metadata_check.setChecked(True)
-        self.embed_thumbnail_check = QCheckBox("Embed Thumbnail")
-        options_row2.addWidget(self.metadata_check)
-        options_row2.addWidget(self.embed_thumbnail_check)
-        options_layout.addLayout(options_row2)
-        
-        # Cookie support
-        cookie_layout = QHBoxLayout()
-        self.cookie_check = QCheckBox("Use Cookies")
-        self.cookie_check.stateChanged.connect(self.toggle_cookie_ui)
-        self.cookie_path = QLineEdit()
-        self.cookie_path.setPlaceholderText("Path to cookies file (Netscape format or browser)")
-        self.cookie_path.setEnabled(False)
-        self.browse_cookie_btn = QPushButton("Browse")
-        self.browse_cookie_btn.setEnabled(False)
-        self.browse_cookie_btn.clicked.connect(self.select_cookie_file)
-        
-        cookie_layout.addWidget(self.cookie_check)
-        cookie_layout.addWidget(self.cookie_path)
-        cookie_layout.addWidget(self.browse_cookie_btn)
-        options_layout.addLayout(cookie_layout)
-        
         options_group.setLayout(options_layout)
 
         # Output Location
@@ -197,12 +408,72 @@ class YouTubeDownloader(QMainWindow):
         self.status_label.setAlignment(Qt.AlignCenter)
         self.status_label.setStyleSheet("font-weight: bold;")
 
+        self.transfer_label = QLabel("")
+        self.transfer_label.setAlignment(Qt.AlignCenter)
+
         # Log Console
-        self.log_console = QTextEdit()
+        self.log_console = QPlainTextEdit()
         self.log_console.setReadOnly(True)
         self.log_console.setMaximumHeight(150)  # Increased height
+        self.log_console.setMaximumBlockCount(LOG_MAX_LINES)
         self.log_console.setPlaceholderText("Download logs will appear here...")
 
+        # Job Queue
+        queue_group = QGroupBox("Download Queue")
+        queue_layout = QVBoxLayout()
+        self.queue_list = QListWidget()
+        self.queue_list.setMaximumHeight(110)
+        queue_layout.addWidget(self.queue_list)
+
+        queue_controls = QHBoxLayout()
+        priority_label = QLabel("Priority:")
+        self.priority_spin = QSpinBox()
+        self.priority_spin.setRange(-10, 10)
+        jobs_label = QLabel("Concurrent Jobs:")
+        self.jobs_spin = QSpinBox()
+        self.jobs_spin.setRange(1, 8)
+        self.jobs_spin.setValue(2)
+        self.jobs_spin.valueChanged.connect(self.dispatch_jobs)
+        bandwidth_label = QLabel("Max KB/s:")
+        self.bandwidth_spin = QSpinBox()
+        self.bandwidth_spin.setRange(0, 1000000)
+        self.bandwidth_spin.setSingleStep(100)
+        self.bandwidth_spin.setSpecialValueText("Unlimited")
+        self.bandwidth_spin.valueChanged.connect(self.update_limits)
+        requests_label = QLabel("Max Requests/s:")
+        self.requests_spin = QSpinBox()
+        self.requests_spin.setRange(0, 100)
+        self.requests_spin.setSpecialValueText("Unlimited")
+        self.requests_spin.valueChanged.connect(self.update_limits)
+        remove_job_btn = QPushButton("Remove Selected")
+        remove_job_btn.clicked.connect(self.remove_selected_job)
+        clear_jobs_btn = QPushButton("Clear Finished")
+        clear_jobs_btn.clicked.connect(self.clear_finished_jobs)
+
+        queue_controls.addWidget(priority_label)
+        queue_controls.addWidget(self.priority_spin)
+        queue_controls.addWidget(jobs_label)
+        queue_controls.addWidget(self.jobs_spin)
+        queue_controls.addWidget(bandwidth_label)
+        queue_controls.addWidget(self.bandwidth_spin)
+        queue_controls.addWidget(requests_label)
+        queue_controls.addWidget(self.requests_spin)
+        pause_job_btn = QPushButton("Pause")
+        pause_job_btn.clicked.connect(self.pause_selected_job)
+        resume_job_btn = QPushButton("Resume")
+        resume_job_btn.clicked.connect(self.resume_selected_job)
+        cancel_job_btn = QPushButton("Cancel")
+        cancel_job_btn.clicked.connect(self.cancel_selected_job)
+
+        queue_controls.addStretch()
+        queue_controls.addWidget(pause_job_btn)
+        queue_controls.addWidget(resume_job_btn)
+        queue_controls.addWidget(cancel_job_btn)
+        queue_controls.addWidget(remove_job_btn)
+        queue_controls.addWidget(clear_jobs_btn)
+        queue_layout.addLayout(queue_controls)
+        queue_group.setLayout(queue_layout)
+
         # Download Button
         self.download_btn = QPushButton("Download")
         self.download_btn.clicked.connect(self.start_download)
@@ -211,8 +482,10 @@ class YouTubeDownloader(QMainWindow):
         main_layout.addWidget(url_group)
         main_layout.addWidget(options_group)
         main_layout.addWidget(output_group)
+        main_layout.addWidget(queue_group)
         main_layout.addWidget(self.progress_bar)
         main_layout.addWidget(self.status_label)
+        main_layout.addWidget(self.transfer_label)
         main_layout.addWidget(self.log_console)
         main_layout.addWidget(self.download_btn)
 
@@ -222,6 +495,80 @@ class YouTubeDownloader(QMainWindow):
         # Connect format combo change to update output formats
         self.format_combo.currentTextChanged.connect(self.update_output_formats)
         self.update_output_formats()
+        self.refresh_queue_list()
+
+    def toggle_extras_panel(self, expanded):
+        if self.extras_panel is None:
+            self.build_extras_panel()
+        self.extras_panel.setVisible(expanded)
+
+    def build_extras_panel(self):
+        self.extras_panel = QWidget()
+        extras_layout = QVBoxLayout()
+        extras_layout.setContentsMargins(0, 0, 0, 0)
+        options_row1 = QHBoxLayout()
+        self.subtitles_check = QCheckBox("Download Subtitles")
+        self.subtitle_langs_input = QLineEdit(DownloadSettings.subtitle_langs)
+        self.subtitle_langs_input.setToolTip("Languages to fetch: comma-separated patterns such as en.*,de; 'all' for every language")
+        self.subtitle_langs_input.setEnabled(False)
+        self.subtitles_check.stateChanged.connect(
+            lambda: self.subtitle_langs_input.setEnabled(self.subtitles_check.isChecked())
+        )
+        self.thumbnail_check = QCheckBox("Download Thumbnail")
+        options_row1.addWidget(self.subtitles_check)
+        options_row1.addWidget(self.subtitle_langs_input)
+        options_row1.addWidget(self.thumbnail_check)
+        extras_layout.addLayout(options_row1)
+
+        assets_row = QHBoxLayout()
+        self.assets_only_check = QCheckBox("Only Subtitles/Thumbnails (Skip the Media)")
+        self.assets_only_check.setToolTip(
+            "Fetch just the subtitles and thumbnails of a video or playlist, e.g. to add languages to earlier downloads"
+        )
+        assets_row.addWidget(self.assets_only_check)
+        self.refresh_assets_check = QCheckBox("Refetch Cached Subtitles/Thumbnails")
+        self.refresh_assets_check.setToolTip(
+            "Fetch them again instead of copying them from the cache, e.g. after captions were corrected"
+        )
+        assets_row.addWidget(self.refresh_assets_check)
+        extras_layout.addLayout(assets_row)
+
+        options_row2 = QHBoxLayout()
+        self.metadata_check = QCheckBox("Add Metadata")
+        self.metadata_check.setChecked(True)
+        self.embed_thumbnail_check = QCheckBox("Embed Thumbnail")
+        options_row2.addWidget(self.metadata_check)
+        options_row2.addWidget(self.embed_thumbnail_check)
+        extras_layout.addLayout(options_row2)
+
+        options_row3 = QHBoxLayout()
+        self.link_duplicates_check = QCheckBox("Link Copies Already Downloaded Elsewhere")
+        self.link_duplicates_check.setChecked(True)
+        self.link_duplicates_check.setToolTip(
+            "Hardlink a video already downloaded in the same format into another folder instead of downloading it again"
+        )
+        options_row3.addWidget(self.link_duplicates_check)
+        extras_layout.addLayout(options_row3)
+        
+        # Cookie support
+        cookie_layout = QHBoxLayout()
+        self.cookie_check = QCheckBox("Use Cookies")
+        self.cookie_check.stateChanged.connect(self.toggle_cookie_ui)
+        self.cookie_path = QLineEdit()
+        self.cookie_path.setPlaceholderText("Path to cookies file (Netscape format or browser)")
+        self.cookie_path.setEnabled(False)
+        self.browse_cookie_btn = QPushButton("Browse")
+        self.browse_cookie_btn.setEnabled(False)
+        self.browse_cookie_btn.clicked.connect(self.select_cookie_file)
+        
+        cookie_layout.addWidget(self.cookie_check)
+        cookie_layout.addWidget(self.cookie_path)
+        cookie_layout.addWidget(self.browse_cookie_btn)
+        extras_layout.addLayout(cookie_layout)
+
+        self.extras_panel.setLayout(extras_layout)
+        self.options_layout.addWidget(self.extras_panel)
+        self.embed_thumbnail_check.setEnabled(self.format_combo.currentText() != "Audio Only")
 
     def toggle_cookie_ui(self, state):
         enabled = state == Qt.Checked
@@ -243,15 +590,11 @@ class YouTubeDownloader(QMainWindow):
         current_format = self.format_combo.currentText()
         self.output_format_combo.clear()
         
-        if current_format == "Video+Audio":
-            self.output_format_combo.addItems(["MP4", "MKV", "WEBM", "Best Available"])
-        elif current_format == "Video Only":
-            self.output_format_combo.addItems(["MP4", "MKV", "WEBM", "Best Available"])
-        elif current_format == "Audio Only":
-            self.output_format_combo.addItems(["MP3", "AAC", "M4A", "OPUS", "Best Available"])
+        self.output_format_combo.addItems(OUTPUT_FORMATS.get(current_format, []))
         
         # Enable/disable thumbnail embedding based on format
-        self.embed_thumbnail_check.setEnabled(current_format != "Audio Only")
+        if self.extras_panel is not None:
+            self.embed_thumbnail_check.setEnabled(current_format != "Audio Only")
 
     def toggle_theme(self, state):
         if state == Qt.Checked:
@@ -280,31 +623,43 @@ class YouTubeDownloader(QMainWindow):
         if directory:
             self.output_input.setText(directory)
 
-    def get_quality_options(self, quality):
-        quality_map = {
-            "Best Available": "best",
-            "8K": "4320",
-            "4K": "2160",
-            "2K": "1440",
-            "1080p": "1080",
-            "720p": "720",
-            "480p": "480",
-            "360p": "360"
-        }
-        return quality_map.get(quality, "best")
-
-    def get_format_extension(self):
-        format_map = {
-            "MP4": "mp4",
-            "MKV": "mkv",
-            "WEBM": "webm",
-            "MP3": "mp3",
-            "AAC": "aac",
-            "M4A": "m4a",
-            "OPUS": "opus",
-            "Best Available": "best"
-        }
-        return format_map.get(self.output_format_combo.currentText(), "best")
+    def get_settings(self):
+        is_playlist = self.playlist_check.isChecked()
+        # Until the extras panel is opened its options keep their defaults
+        extras = DownloadSettings()
+        if self.extras_panel is not None:
+            extras = DownloadSettings(
+                subtitles=self.subtitles_check.isChecked(),
+                subtitle_langs=self.subtitle_langs_input.text().strip(),
+                thumbnail=self.thumbnail_check.isChecked(),
+                metadata=self.metadata_check.isChecked(),
+                embed_thumbnail=self.embed_thumbnail_check.isChecked(),
+                cookies_file=self.cookie_path.text() if self.cookie_check.isChecked() else "",
+                link_duplicates=self.link_duplicates_check.isChecked(),
+                assets_only=self.assets_only_check.isChecked(),
+                refresh_assets=self.refresh_assets_check.isChecked()
+            )
+        return DownloadSettings(
+            quality=self.quality_combo.currentText(),
+            content_type=self.format_combo.currentText(),
+            output_format=get_format_extension(self.output_format_combo.currentText()),
+            subtitles=extras.subtitles,
+            subtitle_langs=extras.subtitle_langs,
+            thumbnail=extras.thumbnail,
+            metadata=extras.metadata,
+            embed_thumbnail=extras.embed_thumbnail,
+            cookies_file=extras.cookies_file,
+            is_playlist=is_playlist,
+            playlist_items=self.playlist_range.text().strip() if is_playlist else "",
+            max_workers=self.workers_spin.value(),
+            retries=self.retries_spin.value(),
+            skip_archived=self.skip_archived_check.isChecked(),
+            link_duplicates=extras.link_duplicates,
+            connections=self.connections_spin.value(),
+            chunk_size_mb=self.chunk_size_spin.value(),
+            assets_only=extras.assets_only,
+            refresh_assets=extras.refresh_assets
+        )
 
     def start_download(self):
         url = self.url_input.text().strip()
@@ -316,186 +671,354 @@ class YouTubeDownloader(QMainWindow):
             QMessageBox.warning(self, "Error", "Please select an output directory")
             return
 
-        is_playlist = self.playlist_check.isChecked()
-        output_path = self.output_input.text()
-        
-        # For playlists, create a subfolder
-        if is_playlist:
-            # Temporarily set output to main directory to extract playlist info
-            temp_output = os.path.join(output_path, "temp_playlist_folder")
-            options = {
-                'outtmpl': os.path.join(temp_output, '%(title)s.%(ext)s'),
-                'quiet': True,
-                'no_warnings': True,
-                'extract_flat': True
-            }
-            
-            # First extract playlist info to get the title
-            try:
-                with yt_dlp.YoutubeDL(options) as ydl:
-                    info = ydl.extract_info(url, download=False)
-                    if 'entries' in info:
-                        playlist_title = info.get('title', 'playlist')
-                        # Clean the playlist title to make it filesystem-safe
-                        playlist_title = "".join(c if c.isalnum() or c in (' ', '_') else '_' for c in playlist_title)
-                        self.current_playlist_folder = os.path.join(output_path, playlist_title)
-                        os.makedirs(self.current_playlist_folder, exist_ok=True)
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"Couldn't get playlist info: {str(e)}")
-                return
-
-            output_path = self.current_playlist_folder
+        if not self.check_assets_only():
+            return
+
+        urls = parse_urls(url)
+        if len(urls) > 1:
+            # Several URLs pasted into the line edit (newlines become spaces)
+            self.url_input.clear()
+            self.start_batch(urls)
+            return
+
+        settings = self.get_settings()
+        job_id = self.download_queue.add(url, settings, self.output_input.text(), self.priority_spin.value())
+        self.url_input.clear()
+        self.log_message(f"Queued job #{job_id}: {url}")
+        self.refresh_queue_list()
+        self.dispatch_jobs()
+
+    def check_assets_only(self):
+        settings = self.get_settings()
+        if settings.assets_only and not (settings.subtitles or settings.thumbnail):
+            QMessageBox.warning(self, "Error", "Check Download Subtitles and/or Download Thumbnail to fetch only those")
+            return False
+        return True
+
+    def open_batch_dialog(self):
+        if not self.output_input.text():
+            QMessageBox.warning(self, "Error", "Please select an output directory")
+            return
+        if not self.check_assets_only():
+            return
+        dialog = BatchDialog(self)
+        if dialog.exec_() == QDialog.Accepted:
+            self.start_batch(dialog.urls())
+
+    def start_batch(self, urls):
+        settings = self.get_settings()
+        output_dir = self.output_input.text()
+        priority = self.priority_spin.value()
+        known = [job.url for job in self.download_queue.jobs(include_finished=False)]
+        unique = dedupe_urls(urls, settings.is_playlist, known)
+        if len(unique) < len(urls):
+            self.log_message(f"Ignoring {len(urls) - len(unique)} duplicate or already queued URL(s)")
+        if not unique:
+            return
+        if not self.backend_ready:
+            self.log_message(f"{len(unique)} URL(s) will be resolved once the downloader has loaded")
+            self.pending_batches.append((unique, settings, output_dir, priority))
+            return
+        self.resolve_batch(unique, settings, output_dir, priority)
+
+    def resolve_batch(self, unique, settings, output_dir, priority):
+        self.log_message(f"Resolving {len(unique)} URL(s); each is queued as soon as it resolves")
+        thread = BatchIntakeThread(unique, settings, self.metadata_cache, self.governor)
+        thread.resolved_signal.connect(
+            lambda url, info: self.batch_resolved(url, info, settings, output_dir, priority)
+        )
+        thread.log_signal.connect(self.log_message)
+        thread.done_signal.connect(
+            lambda resolved, failed: self.log_message(
+                f"Batch resolved: {resolved} queued" + (f", {failed} queued unresolved" if failed else "")
+            )
+        )
+        thread.finished.connect(lambda: self.batch_threads.remove(thread))
+        self.batch_threads.append(thread)
+        thread.start()
+
+    def batch_resolved(self, url, info, settings, output_dir, priority):
+        # info is None for a URL that failed to resolve; the job extracts it itself
+        if self.closing:
+            return
+        job_id = self.download_queue.add(url, settings, output_dir, priority)
+        if info is not None:
+            self.resolved_infos[job_id] = info
+        self.log_message(f"Queued job #{job_id}: {describe_info(info) if info is not None else url}")
+        self.refresh_queue_list()
+        self.dispatch_jobs()
+
+    def dispatch_jobs(self):
+        if self.closing:
+            return
+        self.metrics.set_capacity(self.jobs_spin.value())
+        if not self.backend_ready:
+            # Queued jobs wait in the list; on_backend_ready dispatches them
+            self.refresh_queue_list()
+            return
+        while len(self.active_threads) < self.jobs_spin.value():
+            job = self.download_queue.next_job()
+            if job is None:
+                break
+            self.start_job(job)
+        self.refresh_queue_list()
+
+    def start_job(self, job):
+        partial_bytes = resumable_bytes(job)
+        if partial_bytes:
+            self.log_message(
+                f"Resuming job #{job.job_id} from {len(job.partial_files)} partial file(s) "
+                f"({partial_bytes / 1024 / 1024:.1f} MB already downloaded)"
+            )
+        if job.settings.is_playlist:
+            self.current_playlist_folder = ""
             self.current_download_count = 0
-            self.status_label.setText(f"Preparing to download playlist: {playlist_title}")
-
-        # Prepare final download options
-        final_output = os.path.join(output_path, '%(title)s.%(ext)s')
-        quality = self.quality_combo.currentText()
-        format_choice = self.format_combo.currentText()
-        output_format = self.get_format_extension()
-
-        options = {
-            'outtmpl': final_output,
-            'progress_hooks': [self.progress_hook],
-            'quiet': False,
-            'no_warnings': False,
-            'restrictfilenames': True,
-            'writesubtitles': self.subtitles_check.isChecked(),
-            'writeautomaticsub': self.subtitles_check.isChecked(),
-            'writethumbnail': self.thumbnail_check.isChecked(),
-            'addmetadata': self.metadata_check.isChecked(),
-            'format': self.get_format_string(quality, format_choice, output_format),
-            'postprocessors': [],
-            'cookiefile': self.cookie_path.text() if self.cookie_check.isChecked() and self.cookie_path.text() else None
-        }
-
-        # Set output format options
-        if output_format in ["mp4", "mkv", "webm"] and output_format != "best":
-            options['merge_output_format'] = output_format
-
-        # Add thumbnail embedding if requested
-        if self.embed_thumbnail_check.isChecked() and format_choice != "Audio Only":
-            options['postprocessors'].append({
-                'key': 'EmbedThumbnail',
-                'already_have_thumbnail': False
-            })
-
-        # Add metadata postprocessor for audio files
-        if format_choice == "Audio Only" and self.metadata_check.isChecked():
-            options['postprocessors'].append({
-                'key': 'FFmpegMetadata'
-            })
-
-        if is_playlist:
-            playlist_range = self.playlist_range.text().strip()
-            if playlist_range:
-                options['playlist_items'] = playlist_range
-
-        self.download_btn.setEnabled(False)
-        self.progress_bar.setValue(0)
-        self.log_console.clear()
-
-        self.download_thread = DownloadThread(url, options, is_playlist)
-        self.download_thread.progress_signal.connect(self.update_progress)
-        self.download_thread.finished_signal.connect(self.download_finished)
-        self.download_thread.error_signal.connect(self.show_error)
-        self.download_thread.playlist_info_signal.connect(self.update_playlist_info)
-        self.download_thread.log_signal.connect(self.log_message)
-        
-        # Create logger and pass it the log signal
-        options['logger'] = YTDLLogger(self.download_thread.log_signal)
-        
-        self.download_thread.start()
+            self.status_label.setText("Fetching playlist info...")
+        if not self.active_threads:
+            self.progress_bar.setValue(0)
+
+        thread = DownloadThread(
+            job.url, job.settings, job.output_dir,
+            metadata_cache=self.metadata_cache,
+            download_archive=self.download_archive,
+            job_id=job.job_id,
+            progress_hooks=[partial_file_hook(self.download_queue, job.job_id)],
+            log_callback=self.log_buffer.append,
+            postprocess_pool=self.postprocess_pool,
+            governor=self.governor,
+            metrics=self.metrics,
+            media_store=self.media_store,
+            side_fetcher=self.side_fetcher,
+            resolved_info=self.resolved_infos.pop(job.job_id, None)
+        )
+        job_id = job.job_id
+        thread.progress_signal.connect(lambda snapshot: self.update_job_progress(job_id, snapshot))
+        thread.finished_signal.connect(lambda success, message: self.job_finished(job_id, success, message))
+        thread.error_signal.connect(lambda error_msg: self.job_finished(job_id, False, f"Download failed: {error_msg}"))
+        thread.interrupted_signal.connect(lambda state: self.job_interrupted(job_id, state))
+        thread.playlist_info_signal.connect(
+            lambda title, total, final: self.update_playlist_info(title, total, thread.job.playlist_folder, final)
+        )
+        thread.finished.connect(lambda: self.thread_done(job_id))
+        self.active_threads[job_id] = thread
+        thread.start()
+
+    def update_job_progress(self, job_id, snapshot):
+        # Snapshots arrive already rate-limited by the job's ProgressTracker
+        self.update_progress(snapshot)
+        throughput = self.governor.throughput()
+        if len(throughput['jobs']) > 1:
+            self.transfer_label.setText(
+                f"{self.transfer_label.text()} | all jobs {format_bytes(throughput['total'])}/s"
+            )
+        item = self.job_items.get(job_id)
+        if item is not None:
+            item.setText(self.format_job(self.queue_jobs[job_id], snapshot['percent'],
+                                         throughput['jobs'].get(job_id)))
+
+    def update_limits(self):
+        if self.governor is None:
+            return  # Applied by on_backend_ready
+        self.governor.set_limits(self.bandwidth_spin.value() * 1024, self.requests_spin.value())
+
+    def job_finished(self, job_id, success, message):
+        self.download_queue.set_state(job_id, COMPLETED if success else FAILED, message)
+        self.log_message(f"Job #{job_id}: {message}")
+        if success:
+            self.session_completed += 1
+        else:
+            self.session_failures += 1
+
+    def job_interrupted(self, job_id, state):
+        if self.closing:
+            # Paused for shutdown; closeEvent already put the job back in the queue
+            return
+        if state == CANCELLED:
+            job = self.download_queue.get(job_id)
+            if job is not None:
+                discard_partial_files(job)
+            self.log_message(f"Job #{job_id}: cancelled")
+        else:
+            self.log_message(f"Job #{job_id}: paused, partial files kept")
+        self.download_queue.set_state(job_id, state)
+
+    def thread_done(self, job_id):
+        self.active_threads.pop(job_id, None)
+        if self.closing:
+            return
+        self.dispatch_jobs()
+        if not self.active_threads and not self.download_queue.pending_count():
+            failures, self.session_failures = self.session_failures, 0
+            completed, self.session_completed = self.session_completed, 0
+            if not failures and not completed:
+                # Everything was paused or cancelled
+                self.refresh_queue_list()
+                self.progress_bar.setValue(0)
+                self.status_label.setText("Ready to download")
+            elif failures:
+                self.download_finished(False, f"{failures} job(s) failed, see the log for details")
+            else:
+                self.download_finished(True, "Download completed successfully!")
+
+    def format_job(self, job, percent=None, rate=None):
+        text = f"#{job.job_id} [{job.state}] "
+        if job.priority:
+            text += f"(priority {job.priority}) "
+        text += job.url
+        if percent is not None and job.state == RUNNING:
+            text += f"  {percent}%"
+            if rate:
+                text += f" at {format_bytes(rate)}/s"
+        elif job.message and job.state == FAILED:
+            text += f"  - {job.message}"
+        return text
+
+    def refresh_queue_list(self):
+        self.queue_list.clear()
+        self.job_items = {}
+        self.queue_jobs = {}
+        for job in self.download_queue.jobs():
+            self.queue_jobs[job.job_id] = job
+            item = QListWidgetItem(self.format_job(job))
+            item.setData(Qt.UserRole, job.job_id)
+            self.queue_list.addItem(item)
+            self.job_items[job.job_id] = item
+
+    def selected_job_id(self):
+        item = self.queue_list.currentItem()
+        return item.data(Qt.UserRole) if item is not None else None
+
+    def remove_selected_job(self):
+        job_id = self.selected_job_id()
+        if job_id is None:
+            return
+        if job_id in self.active_threads:
+            QMessageBox.warning(self, "Error", "Can't remove a job while it is downloading, cancel it first")
+            return
+        self.download_queue.remove(job_id)
+        self.refresh_queue_list()
+
+    def pause_selected_job(self):
+        job_id = self.selected_job_id()
+        if job_id is None:
+            return
+        if job_id in self.active_threads:
+            self.active_threads[job_id].pause()
+            self.log_message(f"Pausing job #{job_id}...")
+        elif self.queue_jobs[job_id].state == QUEUED:
+            self.download_queue.set_state(job_id, PAUSED)
+            self.refresh_queue_list()
+
+    def resume_selected_job(self):
+        job_id = self.selected_job_id()
+        if job_id is None or job_id in self.active_threads:
+            return
+        if self.queue_jobs[job_id].state in (PAUSED, FAILED):
+            self.download_queue.requeue(job_id)
+            self.dispatch_jobs()
+
+    def cancel_selected_job(self):
+        job_id = self.selected_job_id()
+        if job_id is None:
+            return
+        if job_id in self.active_threads:
+            self.active_threads[job_id].cancel()
+            self.log_message(f"Cancelling job #{job_id}...")
+        elif self.queue_jobs[job_id].state in (QUEUED, PAUSED, FAILED):
+            discard_partial_files(self.download_queue.get(job_id))
+            self.download_queue.set_state(job_id, CANCELLED)
+            self.refresh_queue_list()
+
+    def clear_finished_jobs(self):
+        self.download_queue.clear_finished()
+        self.refresh_queue_list()
 
     @pyqtSlot(str)
     def log_message(self, msg):
-        self.log_console.append(msg.strip())
+        self.log_buffer.append(msg)
+
+    def flush_log(self):
+        batch, dropped = self.log_buffer.drain()
+        if not batch:
+            return
+        if dropped:
+            batch.insert(0, f"... {dropped} line(s) skipped, full log in {self.log_buffer.log_path}")
+        self.log_console.appendPlainText("\n".join(batch))
         # Auto-scroll to bottom
         scroll_bar = self.log_console.verticalScrollBar()
         scroll_bar.setValue(scroll_bar.maximum())
 
-    def update_playlist_info(self, playlist_title, total_items):
+    def update_playlist_info(self, playlist_title, total_items, playlist_folder="", final=True):
+        first_report = not self.current_playlist_folder
         self.total_playlist_items = total_items
-        self.status_label.setText(f"Downloading playlist: {playlist_title} (0/{total_items})")
+        self.current_playlist_folder = playlist_folder
+        if first_report:
+            # Later counts show up in the progress status as the list grows
+            self.status_label.setText(
+                f"Downloading playlist: {playlist_title} (0/{total_items}{'' if final else '+'})"
+            )
 
-    def get_format_string(self, quality, format_choice, output_format):
-        quality_code = self.get_quality_options(quality)
-        
-        if format_choice == "Video+Audio":
-            if quality == "Best Available":
-                if output_format == "best":
-                    return "bestvideo+bestaudio"
-                else:
-                    return f"bestvideo[ext={output_format}]+bestaudio[ext={output_format}]/bestvideo+bestaudio"
-            else:
-                return f"bestvideo[height<={quality_code}][ext={output_format}]+bestaudio[ext={output_format}]/best[height<={quality_code}]"
-        elif format_choice == "Video Only":
-            if quality == "Best Available":
-                if output_format == "best":
-                    return "bestvideo"
-                else:
-                    return f"bestvideo[ext={output_format}]"
-            else:
-                return f"bestvideo[height<={quality_code}][ext={output_format}]"
-        elif format_choice == "Audio Only":
-            if output_format == "best":
-                return "bestaudio"
-            else:
-                return f"bestaudio[ext={output_format}]"
-        return "best"
-
-    def progress_hook(self, d):
-        if d['status'] == 'downloading':
-            total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
-            if total_bytes:
-                percent = int(d['downloaded_bytes'] / total_bytes * 100)
-                filename = os.path.basename(d.get('filename', ''))
-                self.download_thread.progress_signal.emit(percent, filename)
-        elif d['status'] == 'finished':
-            self.download_thread.progress_signal.emit(100, "Download complete")
-            if self.playlist_check.isChecked():
-                self.current_download_count += 1
-                self.status_label.setText(
-                    f"Downloading playlist item {self.current_download_count}/{self.total_playlist_items}"
-                )
-
-    @pyqtSlot(int, str)
-    def update_progress(self, percent, status):
-        self.progress_bar.setValue(percent)
-        if status:
-            self.status_label.setText(status)
+    @pyqtSlot(dict)
+    def update_progress(self, snapshot):
+        self.progress_bar.setValue(snapshot['percent'])
+        if snapshot['status']:
+            self.status_label.setText(snapshot['status'])
+        self.transfer_label.setText(describe_progress(snapshot))
 
     @pyqtSlot(bool, str)
     def download_finished(self, success, message):
-        self.download_btn.setEnabled(True)
+        self.refresh_queue_list()
         if success:
             QMessageBox.information(self, "Success", message)
             self.status_label.setText("Ready to download")
+            self.transfer_label.setText("")
             self.progress_bar.setValue(0)
         else:
             QMessageBox.warning(self, "Error", message)
 
-    @pyqtSlot(str)
-    def show_error(self, error_msg):
-        self.download_btn.setEnabled(True)
-        QMessageBox.critical(self, "Error", f"Download failed: {error_msg}")
-        self.status_label.setText("Download failed")
-
     def closeEvent(self, event):
-        if self.download_thread and self.download_thread.isRunning():
+        if any(thread.isRunning() for thread in self.active_threads.values()):
             reply = QMessageBox.question(
                 self, 'Download in Progress',
-                "A download is in progress. Are you sure you want to quit?",
+                "A download is in progress. Are you sure you want to quit?\n"
+                "Unfinished jobs will resume next time the downloader starts.",
                 QMessageBox.Yes | QMessageBox.No, QMessageBox.No
             )
             if reply == QMessageBox.Yes:
-                self.download_thread.stop()
-                self.download_thread.quit()
+                self.closing = True
+                # Pause keeps .part files; jobs go back to the queue and resume on next launch
+                threads = list(self.active_threads.items())
+                for job_id, thread in threads:
+                    thread.pause()
+                for job_id, thread in threads:
+                    if not thread.wait(CLOSE_WAIT_MS):
+                        # Stuck outside a progress hook (a slow extraction or post-processor)
+                        self.log_message(f"Job #{job_id} did not pause in time; stopping it")
+                        thread.terminate()
+                        thread.wait()
+                # Delivers the results of jobs that finished during the wait, so they aren't requeued
+                QApplication.processEvents()
+                for job_id, thread in threads:
+                    job = self.download_queue.get(job_id)
+                    if job is not None and job.state in (PAUSED, RUNNING):
+                        self.download_queue.requeue(job_id)
                 event.accept()
             else:
                 event.ignore()
         else:
             event.accept()
+        if event.isAccepted():
+            self.closing = True
+            if self.backend_loader is not None:
+                self.backend_loader.wait(CLOSE_WAIT_MS)
+            for thread in list(self.batch_threads):
+                thread.cancel()
+                thread.wait(CLOSE_WAIT_MS)
+            if self.postprocess_pool is not None:
+                self.postprocess_pool.close(wait=False)
+                self.side_fetcher.close(wait=False)
+            self.metrics_writer.close()
+            self.download_queue.close()
 
 
 if __name__ == "__main__":